@@ -1,11 +1,13 @@
 // IELTS Speaking Practice JavaScript
 
 let currentPrompt = null;
+let currentTranscriptId = null;  // lets /evaluate use the server's fluency analysis
 let currentQuestions = [];
 let currentQuestionIndex = 0;
 let mediaRecorder = null;
 let audioChunks = [];
 let recordedBlob = null;
+let streamingTranscriber = null;
 let timerInterval = null;
 let timeLeft = 0;
 let isRecording = false;
@@ -154,8 +156,13 @@ document.getElementById('startRecording').addEventListener('click', async () =>
         mediaRecorder = new MediaRecorder(stream);
         audioChunks = [];
 
+        // Transcribe while recording so the transcript is ready when recording stops
+        streamingTranscriber = new StreamingTranscriber('liveTranscript', 'speaking');
+        streamingTranscriber.start();
+
         mediaRecorder.addEventListener('dataavailable', event => {
             audioChunks.push(event.data);
+            streamingTranscriber.push(event.data);
         });
 
         mediaRecorder.addEventListener('stop', () => {
@@ -165,7 +172,7 @@ document.getElementById('startRecording').addEventListener('click', async () =>
             isRecording = false;
         });
 
-        mediaRecorder.start();
+        mediaRecorder.start(1000); // Emit a chunk every second for streaming transcription
         isRecording = true;
         document.getElementById('startRecording').disabled = true;
         document.getElementById('stopRecording').disabled = false;
@@ -218,15 +225,21 @@ document.getElementById('getTranscript').addEventListener('click', async () => {
     document.getElementById('getTranscript').textContent = 'Transcribing...';
 
     try {
-        const formData = new FormData();
-        formData.append('audio', recordedBlob, 'recording.webm');
+        // Use the streamed transcript if available, otherwise upload the whole recording
+        let data = streamingTranscriber ? await streamingTranscriber.finish() : null;
 
-        const response = await fetch('/transcribe', {
-            method: 'POST',
-            body: formData
-        });
+        if (!data) {
+            const formData = new FormData();
+            formData.append('audio', recordedBlob, 'recording.webm');
+            formData.append('task', 'speaking');
 
-        const data = await response.json();
+            const response = await fetch('/transcribe', {
+                method: 'POST',
+                body: formData
+            });
+
+            data = await response.json();
+        }
 
         if (data.error) {
             alert('Error: ' + data.error);
@@ -234,6 +247,7 @@ document.getElementById('getTranscript').addEventListener('click', async () => {
             document.getElementById('transcriptionContainer').style.display = 'block';
             document.getElementById('transcriptionText').textContent = data.transcript;
             document.getElementById('wordCount').textContent = data.word_count;
+            currentTranscriptId = data.transcript_id || null;
             document.getElementById('getEvaluation').style.display = 'inline-block';
         }
     } catch (error) {
@@ -267,27 +281,31 @@ document.getElementById('getEvaluation').addEventListener('click', async () => {
     document.getElementById('getEvaluation').textContent = 'Evaluating...';
 
     try {
-        const response = await fetch('/evaluate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                api_key: apiKey,
-                task_type: 'speaking',
-                part: currentPrompt.part,
-                question: questionText,
-                transcript: transcript,
-                word_count: wordCount,
-                speaking_time: 120 // approximate
-            })
+        // Sections are shown as soon as they have been streamed
+        const feedbackContainer = document.getElementById('feedbackContainer');
+        const feedbackContent = document.getElementById('feedbackContent');
+        feedbackContent.innerHTML = '';
+
+        const data = await streamEvaluation('/evaluate/stream', {
+            api_key: apiKey,
+            task_type: 'speaking',
+            part: currentPrompt.part,
+            prompt_id: currentPrompt.id,
+            question: questionText,
+            transcript: transcript,
+            word_count: wordCount,
+            speaking_time: 120, // approximate, only used without transcript_id
+            transcript_id: currentTranscriptId
+        }, section => {
+            feedbackContainer.style.display = 'block';
+            feedbackContent.insertAdjacentHTML('beforeend', section);
         });
 
-        const data = await response.json();
-
         if (data.error) {
             alert('Error: ' + data.error);
         } else {
-            document.getElementById('feedbackContainer').style.display = 'block';
-            document.getElementById('feedbackContent').innerHTML = data.feedback;
+            feedbackContainer.style.display = 'block';
+            feedbackContent.innerHTML = data.feedback;
             document.getElementById('addToVocab').style.display = 'inline-block';
             document.getElementById('newQuestion').style.display = 'inline-block';
         }
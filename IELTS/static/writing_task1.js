@@ -153,25 +153,27 @@ document.getElementById('getEvaluation').addEventListener('click', async () => {
     document.getElementById('getEvaluation').textContent = 'Evaluating...';
 
     try {
-        const response = await fetch('/evaluate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                api_key: apiKey,
-                task_type: 'writing_task1',
-                text: text,
-                word_count: wordCount,
-                diagram_description: currentPrompt.diagram_description || 'Visual information'
-            })
+        // Sections are shown as soon as they have been streamed
+        const feedbackContainer = document.getElementById('feedbackContainer');
+        const feedbackContent = document.getElementById('feedbackContent');
+        feedbackContent.innerHTML = '';
+
+        const data = await streamEvaluation('/evaluate/stream', {
+            api_key: apiKey,
+            task_type: 'writing_task1',
+            text: text,
+            word_count: wordCount,
+            diagram_description: currentPrompt.diagram_description || 'Visual information'
+        }, section => {
+            feedbackContainer.style.display = 'block';
+            feedbackContent.insertAdjacentHTML('beforeend', section);
         });
 
-        const data = await response.json();
-
         if (data.error) {
             alert('Error: ' + data.error);
         } else {
-            document.getElementById('feedbackContainer').style.display = 'block';
-            document.getElementById('feedbackContent').innerHTML = data.feedback;
+            feedbackContainer.style.display = 'block';
+            feedbackContent.innerHTML = data.feedback;
             document.getElementById('addToVocab').style.display = 'inline-block';
         }
     } catch (error) {
@@ -6,18 +6,29 @@ Adapted by Le Guillouzic Maël from : Lennart Rikk
 Available for personal and educational use only.
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from gtts import gTTS
-import whisper
 import io
 import os
-import base64
 import tempfile
 import subprocess
 import warnings
 import platform
 import sys
 import json
+import re
+import time
+import hashlib
+import heapq
+import math
+import sqlite3
+import uuid
+import queue
+import random
+import threading
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
 from pathlib import Path
 from shutil import which
 
@@ -205,10 +216,224 @@ def check_ffmpeg_installed():
 
         return False
 
-# Initialize Whisper model
-print("Loading Whisper model (this may take a minute)...")
-whisper_model = whisper.load_model("base")
-print("Whisper model loaded!")
+# ============================================================================
+# Whisper models (registry of checkpoints loaded on demand; the default
+# profile's model is loaded in the background so pages are served immediately)
+# ============================================================================
+
+# Decoding profiles: which checkpoint to use and how hard to search.
+# 'fast' suits practice sessions, 'accurate' suits grading a full test.
+# config.json 'whisper_profiles' can override these or declare new ones.
+WHISPER_PROFILES = {
+    'default': {'model': 'base', 'beam_size': None, 'temperature_fallback': True},
+    'fast': {'model': 'tiny', 'beam_size': None, 'temperature_fallback': False},
+    'accurate': {'model': 'small', 'beam_size': 5, 'temperature_fallback': True}
+}
+DEFAULT_WHISPER_PROFILE = 'default'
+DEFAULT_WHISPER_MEMORY_LIMIT_MB = 2048
+
+# CPU inference modes a profile (or config 'whisper_quantization') can switch to
+WHISPER_QUANTIZATION_MODES = ('int8',)
+
+whisper_ready = threading.Event()
+whisper_load_error = None
+_whisper_loader_thread = None
+
+def warm_up_whisper(model):
+    """Run a short dummy transcription so the first real request doesn't pay for allocator/kernel setup"""
+    import numpy as np
+    from whisper.audio import SAMPLE_RATE
+
+    dummy_audio = np.zeros(2 * SAMPLE_RATE, dtype=np.float32)  # 2 seconds of silence
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
+        model.transcribe(dummy_audio, verbose=None, language="en", task="transcribe", temperature=0.0)
+
+def quantize_whisper_model(model):
+    """
+    Dynamic int8 quantization of the Linear layers (attention projections and
+    MLPs, where most of the CPU time goes). Weights are stored as int8 and
+    activations are quantized on the fly; convolutions and embeddings stay fp32.
+    """
+    import torch
+    import whisper.model
+
+    # Whisper's Linear subclass only casts weights to the input dtype, but
+    # quantize_dynamic only converts modules whose type is exactly nn.Linear
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        warnings.filterwarnings("ignore", message="torch.quantize_per_tensor")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def model_size_mb(model):
+    """Memory held by a model's weights and buffers (int8 packed weights included), in MB"""
+    import torch
+
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            tensors.append(module.weight())
+            if module.bias() is not None:
+                tensors.append(module.bias())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors) / (1024 * 1024)
+
+class WhisperModelRegistry:
+    """
+    Whisper checkpoints by name (and quantization mode), loaded and warmed up
+    on first use and kept in LRU order. Once the resident models exceed the memory limit from config
+    'whisper_memory_limit_mb', the least recently used ones are dropped; the
+    model that was just requested always stays.
+    """
+
+    def __init__(self):
+        self.models = OrderedDict()  # 'name' or 'name:quantization' -> (model, size in MB)
+        self.loading = {}            # same keys -> Event, so concurrent requests share one load
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, model_name, quantization=None):
+        """Return the model called `model_name`, loading it if it is not resident"""
+        if quantization and quantization not in WHISPER_QUANTIZATION_MODES:
+            raise ValueError(f"Unknown Whisper quantization '{quantization}' (available: {', '.join(WHISPER_QUANTIZATION_MODES)})")
+        name = f"{model_name}:{quantization}" if quantization else model_name
+
+        with self.lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                self.hits += 1
+                return self.models[name][0]
+            loaded = self.loading.get(name)
+            owner = loaded is None
+            if owner:
+                loaded = self.loading[name] = threading.Event()
+
+        if not owner:
+            loaded.wait()
+            with self.lock:
+                if name not in self.models:
+                    raise RuntimeError(f"Whisper model '{name}' failed to load")
+                self.models.move_to_end(name)
+                self.hits += 1
+                return self.models[name][0]
+
+        try:
+            import whisper
+            print(f"Loading Whisper model '{name}'...")
+            if quantization:
+                # Quantized kernels only run on CPU
+                model = quantize_whisper_model(whisper.load_model(model_name, device='cpu'))
+            else:
+                model = whisper.load_model(model_name)
+            warm_up_whisper(model)
+            with self.lock:
+                self.models[name] = (model, model_size_mb(model))
+                self.loads += 1
+                self._evict()
+            print(f"Whisper model '{name}' ready")
+            return model
+        finally:
+            with self.lock:
+                del self.loading[name]
+            loaded.set()
+
+    def _evict(self):
+        limit = float(load_config().get('whisper_memory_limit_mb', DEFAULT_WHISPER_MEMORY_LIMIT_MB))
+        while len(self.models) > 1 and self._resident_mb() > limit:
+            name, _ = self.models.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted Whisper model '{name}' (memory limit {limit:.0f} MB)")
+
+    def _resident_mb(self):
+        return sum(size for _, size in self.models.values())
+
+    def is_loaded(self, name):
+        with self.lock:
+            return name in self.models
+
+    def stats(self):
+        with self.lock:
+            return {
+                'loaded': {name: round(size, 1) for name, (_, size) in self.models.items()},
+                'resident_mb': round(self._resident_mb(), 1),
+                'loads': self.loads,
+                'hits': self.hits,
+                'evictions': self.evictions
+            }
+
+whisper_models = WhisperModelRegistry()
+
+def whisper_profiles(config=None):
+    """Built-in decoding profiles merged with config.json 'whisper_profiles'"""
+    config = load_config() if config is None else config
+    profiles = {name: dict(profile) for name, profile in WHISPER_PROFILES.items()}
+    for name, overrides in config.get('whisper_profiles', {}).items():
+        profiles.setdefault(name, dict(WHISPER_PROFILES[DEFAULT_WHISPER_PROFILE])).update(overrides)
+    return profiles
+
+def resolve_whisper_profile(profile_name=None, task=None):
+    """
+    Pick the decoding profile for a request: an explicit profile name first,
+    then the task's entry in config.json 'transcription_profiles', then
+    'default_whisper_profile'. Returns (name, profile).
+    """
+    config = load_config()
+    profiles = whisper_profiles(config)
+    name = (profile_name
+            or config.get('transcription_profiles', {}).get(task)
+            or config.get('default_whisper_profile', DEFAULT_WHISPER_PROFILE))
+    if name not in profiles:
+        raise ValueError(f"Unknown transcription profile '{name}' (available: {', '.join(sorted(profiles))})")
+    profile = profiles[name]
+    profile.setdefault('quantization', config.get('whisper_quantization'))
+    return name, profile
+
+def profile_model(profile):
+    """The (possibly quantized) model a decoding profile runs on"""
+    return whisper_models.get(profile['model'], profile.get('quantization'))
+
+def load_whisper_model():
+    """Load and warm up the default profile's model (runs on a background thread)"""
+    global whisper_load_error
+
+    try:
+        print("Loading Whisper model in the background (this may take a minute)...")
+        _, profile = resolve_whisper_profile()
+        profile_model(profile)
+        whisper_ready.set()
+        print("Whisper model ready!")
+    except Exception as e:
+        whisper_load_error = str(e)
+        print(f"Error loading Whisper model: {e}")
+
+def is_serving_process():
+    """True in the process that serves requests (not the debug reloader watcher or a worker process)"""
+    if multiprocessing.current_process().name != 'MainProcess':
+        return False
+    # With app.run(debug=True), the first process only watches files and restarts the real server
+    if __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return False
+    return True
+
+def start_whisper_loader():
+    """Start loading the Whisper model on a background thread (only once)"""
+    global _whisper_loader_thread
+    if _whisper_loader_thread is None:
+        _whisper_loader_thread = threading.Thread(target=load_whisper_model, name='whisper-loader', daemon=True)
+        _whisper_loader_thread.start()
+
+def whisper_status():
+    """Return the current state of the Whisper model: 'ready', 'warming' or 'error'"""
+    if whisper_ready.is_set():
+        return 'ready'
+    if whisper_load_error:
+        return 'error'
+    return 'warming'
 
 # Check ffmpeg availability
 FFMPEG_AVAILABLE = check_ffmpeg_installed()
@@ -264,6 +489,10 @@ def save_config(config):
         print(f"Error saving config: {e}")
         return False
 
+# The default model's loader reads config.json, so it starts once the config helpers exist
+if is_serving_process():
+    start_whisper_loader()
+
 @app.route('/')
 def index():
     """Render the main page (Complete Test)"""
@@ -383,6 +612,7 @@ def add_vocabulary_card():
         cards.append(new_card)
 
         if save_vocabulary_cards(cards):
+            vocabulary_index.card_added(cards)
             return jsonify({'success': True, 'message': 'Vocabulary card saved!'})
         else:
             return jsonify({'success': False, 'error': 'Failed to save'}), 500
@@ -402,6 +632,7 @@ def update_vocabulary_card(index):
                 cards[index]['content'] = data['content']
 
             if save_vocabulary_cards(cards):
+                vocabulary_index.card_updated(cards, index)
                 return jsonify({'success': True, 'message': 'Card updated!'})
             else:
                 return jsonify({'success': False, 'error': 'Failed to save'}), 500
@@ -410,147 +641,3450 @@ def update_vocabulary_card(index):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/vocabulary_cards/<int:index>', methods=['DELETE'])
-def delete_vocabulary_card(index):
-    """Delete a vocabulary card by index"""
-    try:
-        cards = load_vocabulary_cards()
+@app.route('/api/vocabulary_cards/<int:index>', methods=['DELETE'])
+def delete_vocabulary_card(index):
+    """Delete a vocabulary card by index"""
+    try:
+        cards = load_vocabulary_cards()
+
+        if 0 <= index < len(cards):
+            cards.pop(index)
+            if save_vocabulary_cards(cards):
+                vocabulary_index.card_removed(cards, index)
+                return jsonify({'success': True, 'message': 'Card deleted!'})
+            else:
+                return jsonify({'success': False, 'error': 'Failed to save'}), 500
+        else:
+            return jsonify({'error': 'Invalid index'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/create_audio', methods=['GET', 'POST'])
+def create_audio():
+    """
+    Create audio from text using gTTS and stream it as audio/mpeg.
+    POST takes {"text": ...}; GET takes ?text=... so that an <audio> element
+    can start playing while the rest is still being synthesized.
+    """
+    try:
+        if request.method == 'POST':
+            text = (request.get_json(silent=True) or {}).get('text', '')
+        else:
+            text = request.args.get('text', '')
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+
+        # gTTS synthesizes the text in pieces; each one is sent as soon as it arrives.
+        # The first piece is fetched here so that errors still come back as JSON.
+        mp3_chunks = gTTS(text=text, lang='en').stream()
+        first_chunk = next(mp3_chunks, b'')
+
+        def generate():
+            yield first_chunk
+            yield from mp3_chunks
+
+        return Response(generate(), mimetype='audio/mpeg')
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/healthz')
+def healthz():
+    """Liveness check: the web server is up"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness check: the Whisper model is loaded and warmed up"""
+    status = whisper_status()
+    body = {'status': status}
+    try:
+        body['profile'], profile = resolve_whisper_profile()
+        body['model'] = profile['model']
+        body['quantization'] = profile['quantization']
+    except ValueError as e:
+        body['error'] = str(e)
+    if status == 'error':
+        body['error'] = whisper_load_error
+    return jsonify(body), (200 if status == 'ready' else 503)
+
+@app.route('/metrics')
+def metrics():
+    """Runtime counters (caches, queues) as JSON"""
+    cache = get_transcript_cache()
+    evaluations = get_evaluation_cache()
+    return jsonify({
+        'transcript_cache': cache.stats() if cache is not None else None,
+        'whisper_models': whisper_models.stats(),
+        'vad': {name: round(value, 1) for name, value in vad_stats.items()},
+        'reference_index': dict(reference_index.stats, entries=len(reference_index.entries), queued=len(reference_index.queued)),
+        'artifacts': artifact_store.stats(),
+        'ffmpeg': ffmpeg_pool.snapshot(),
+        'stream_decoders': stream_decoder_pool.snapshot(),
+        'openai_clients': openai_clients.snapshot(),
+        'openai_calls': openai_calls.snapshot(),
+        'rate_limiter': rate_limiter.snapshot(),
+        'structured_evaluations': dict(structured_evaluation_stats),
+        'evaluation_cache': evaluations.stats() if evaluations is not None else None,
+        'vocabulary_index': vocabulary_index.snapshot()
+    })
+
+def model_warming_response():
+    """503 response returned while the Whisper model is still loading"""
+    if whisper_load_error:
+        return jsonify({'error': f'Transcription model failed to load: {whisper_load_error}', 'status': 'error'}), 503
+    response = jsonify({
+        'error': 'Transcription model is warming up, please try again in a few seconds.',
+        'status': 'warming'
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+# ============================================================================
+# ffmpeg pool (bounded number of concurrent encoders, bounded wait queue)
+# ============================================================================
+
+DEFAULT_FFMPEG_WORKERS = 4
+DEFAULT_FFMPEG_QUEUE_SIZE = 16
+DEFAULT_FFMPEG_QUEUE_TIMEOUT_SECONDS = 30
+
+class FFmpegBusyError(Exception):
+    """The ffmpeg pool cannot take more work right now (routes answer with Retry-After)"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class FFmpegPool:
+    """
+    Every ffmpeg process runs inside a slot of this pool (`with ffmpeg_pool:`).
+    At most `ffmpeg_workers` run at once; further callers wait in a queue of
+    `ffmpeg_queue_size` places. When the queue is full they are rejected at
+    once (429), and a caller that waited `ffmpeg_queue_timeout_seconds`
+    without getting a slot is rejected too (503).
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.average_seconds = 1.0
+        self.started_at = threading.local()
+        self.stats = {'started': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0, 'peak_waiting': 0, 'wait_seconds': 0.0}
+
+    @staticmethod
+    def settings():
+        config = load_config()
+        workers = max(1, int(config.get('ffmpeg_workers', DEFAULT_FFMPEG_WORKERS)))
+        queue_size = max(0, int(config.get('ffmpeg_queue_size', DEFAULT_FFMPEG_QUEUE_SIZE)))
+        timeout = float(config.get('ffmpeg_queue_timeout_seconds', DEFAULT_FFMPEG_QUEUE_TIMEOUT_SECONDS))
+        return workers, queue_size, timeout
+
+    def retry_after(self, workers):
+        """Seconds until a slot is likely free, from the average time a slot is held"""
+        return max(1, round(self.average_seconds * (self.waiting + 1) / workers))
+
+    def acquire(self):
+        workers, queue_size, timeout = self.settings()
+        start = time.time()
+        with self.condition:
+            if self.running >= workers:
+                if self.waiting >= queue_size:
+                    self.stats['rejected'] += 1
+                    raise FFmpegBusyError('Too many audio conversions in progress, please try again in a few seconds.',
+                                          429, self.retry_after(workers))
+                self.waiting += 1
+                self.stats['queued'] += 1
+                self.stats['peak_waiting'] = max(self.stats['peak_waiting'], self.waiting)
+                try:
+                    acquired = self.condition.wait_for(lambda: self.running < workers, timeout)
+                finally:
+                    self.waiting -= 1
+                if not acquired:
+                    self.stats['timeouts'] += 1
+                    raise FFmpegBusyError('The audio conversion queue is too long, please try again in a few seconds.',
+                                          503, self.retry_after(workers))
+            self.running += 1
+            self.stats['started'] += 1
+            self.stats['wait_seconds'] += time.time() - start
+        return time.time()
+
+    def release(self, started):
+        with self.condition:
+            self.running -= 1
+            # Moving average of how long a slot is held, for Retry-After
+            self.average_seconds = 0.8 * self.average_seconds + 0.2 * (time.time() - started)
+            self.condition.notify()
+
+    def __enter__(self):
+        self.started_at.value = self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release(self.started_at.value)
+
+    def snapshot(self):
+        workers, queue_size, _ = self.settings()
+        with self.condition:
+            return dict(self.stats, running=self.running, waiting=self.waiting, workers=workers,
+                        queue_size=queue_size, wait_seconds=round(self.stats['wait_seconds'], 1),
+                        average_seconds=round(self.average_seconds, 2))
+
+ffmpeg_pool = FFmpegPool()
+
+def ffmpeg_busy_response(error):
+    """429/503 response returned when the ffmpeg pool is saturated"""
+    response = jsonify({'error': str(error), 'status': 'busy'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
+
+# ============================================================================
+# In-memory audio pipeline (ffmpeg reads stdin and writes stdout, no temp files)
+# ============================================================================
+
+WHISPER_SAMPLE_RATE = 16000
+
+# MP4-family containers may keep their index (moov atom) after the audio, which
+# ffmpeg only reaches by seeking. Read from a pipe they fail with these errors,
+# sometimes with exit status 0 and an empty (or header-only) output.
+SEEKABLE_INPUT_SUFFIXES = ('.mp4', '.m4a', '.mov', '.3gp')
+SEEKABLE_INPUT_ERRORS = ('moov atom', 'partial file', 'Invalid data found')
+
+def _needs_seekable_input(suffix, stderr):
+    """Whether ffmpeg failed to read a pipe because the container needs seeking (worth a temp-file retry)"""
+    stderr = stderr.decode(errors='ignore')
+    return suffix.lower() in SEEKABLE_INPUT_SUFFIXES and any(error in stderr for error in SEEKABLE_INPUT_ERRORS)
+
+def run_ffmpeg_pipe(audio_bytes, output_args, suffix='.webm'):
+    """
+    Pipe audio bytes through ffmpeg and return what it writes to stdout.
+    MP4-family containers that cannot be read from a pipe (index at the end of
+    the file) are retried from a temporary file; any other failure is raised.
+    """
+    ffmpeg = FFMPEG_PATH or 'ffmpeg'
+    with ffmpeg_pool:
+        command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', 'pipe:0'] + output_args + ['pipe:1']
+        process = subprocess.run(command, input=audio_bytes, capture_output=True)
+
+        if _needs_seekable_input(suffix, process.stderr):
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_audio:
+                temp_audio.write(audio_bytes)
+                temp_path = temp_audio.name
+            try:
+                command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', temp_path] + output_args + ['pipe:1']
+                process = subprocess.run(command, capture_output=True)
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {process.stderr.decode(errors='ignore').strip()}")
+    return process.stdout
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _feed_ffmpeg(process, audio_bytes):
+    """Write the input to ffmpeg's stdin from a thread while the caller reads stdout"""
+    try:
+        process.stdin.write(audio_bytes)
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass  # ffmpeg stopped reading (error or not pipeable); its exit status tells why
+
+def _start_ffmpeg(command, audio_bytes=None):
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if audio_bytes is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if audio_bytes is not None:
+        threading.Thread(target=_feed_ffmpeg, args=(process, audio_bytes), daemon=True).start()
+    return process
+
+def _finish_ffmpeg(process):
+    """Wait for an ffmpeg started by _start_ffmpeg and return its stderr"""
+    stderr = process.stderr.read()
+    process.wait()
+    process.stdout.close()
+    process.stderr.close()
+    return stderr
+
+class FFmpegStream:
+    """
+    Iterator over the output of a running ffmpeg. Each chunk is sent once the
+    next one has been read, and the last one once ffmpeg has exited: if it
+    fails halfway, the iterator raises instead, so the server aborts the
+    response rather than ending a truncated file with success. close() (called
+    by the WSGI server once the response is sent or the client goes away, even
+    before the first chunk) stops the process, logs a failed exit and gives
+    its pool slot back.
+    """
+
+    def __init__(self, process, first_chunk, chunk_size, slot_started, temp_path=None):
+        self.process = process
+        self.pending = first_chunk
+        self.chunk_size = chunk_size
+        self.slot_started = slot_started
+        self.temp_path = temp_path
+        self.stderr = ''
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed or self.pending is None:
+            raise StopIteration
+        chunk = self.pending
+        self.pending = self.process.stdout.read(self.chunk_size) or None
+        if self.pending is None:
+            # ffmpeg closed its output: wait for its exit status before sending the last chunk
+            self.close(kill=False)
+            if self.process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {self.stderr}")
+        return chunk
+
+    def close(self, kill=True):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            killed = kill and self.process.poll() is None
+            if killed:
+                self.process.kill()
+            self.stderr = _finish_ffmpeg(self.process).decode(errors='ignore').strip()
+            if self.process.returncode != 0 and not killed:
+                print(f"[FFMPEG] Exited with status {self.process.returncode} while streaming: {self.stderr}")
+            if self.temp_path and os.path.exists(self.temp_path):
+                os.unlink(self.temp_path)
+        finally:
+            ffmpeg_pool.release(self.slot_started)
+
+def stream_ffmpeg_pipe(audio_bytes, output_args, suffix='.webm', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Like run_ffmpeg_pipe, but return an iterator over ffmpeg's output chunks as
+    they are produced instead of the whole output. The first chunk is read
+    before returning, so ffmpeg errors are raised here rather than halfway
+    through a streamed response (an output shorter than one chunk is checked
+    in full). The pool slot is held until the iterator is closed.
+    """
+    ffmpeg = FFMPEG_PATH or 'ffmpeg'
+    slot_started = ffmpeg_pool.acquire()
+    try:
+        command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', 'pipe:0'] + output_args + ['pipe:1']
+        process = _start_ffmpeg(command, audio_bytes)
+        first_chunk = process.stdout.read(chunk_size)
+        if len(first_chunk) == chunk_size:
+            return FFmpegStream(process, first_chunk, chunk_size, slot_started)
+        # ffmpeg has closed its output already: a short output, or it could not read the input
+        stderr = _finish_ffmpeg(process)
+
+        if _needs_seekable_input(suffix, stderr):
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_audio:
+                temp_audio.write(audio_bytes)
+                temp_path = temp_audio.name
+            command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', temp_path] + output_args + ['pipe:1']
+            process = _start_ffmpeg(command)
+            first_chunk = process.stdout.read(chunk_size)
+            if len(first_chunk) == chunk_size:
+                return FFmpegStream(process, first_chunk, chunk_size, slot_started, temp_path)
+
+            stderr = _finish_ffmpeg(process)
+            os.unlink(temp_path)
+    except BaseException:
+        ffmpeg_pool.release(slot_started)
+        raise
+    ffmpeg_pool.release(slot_started)
+    if process.returncode != 0 or not first_chunk:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='ignore').strip()}")
+    return iter([first_chunk])
+
+PCM_OUTPUT_ARGS = ['-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(WHISPER_SAMPLE_RATE)]
+
+def decode_pcm_bytes(audio_bytes, suffix='.webm'):
+    """Decode audio bytes to 16 kHz mono signed 16-bit PCM"""
+    return run_ffmpeg_pipe(audio_bytes, PCM_OUTPUT_ARGS, suffix)
+
+def pcm_to_audio(pcm):
+    """16-bit PCM bytes to the float32 array Whisper expects"""
+    import numpy as np
+
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+def decode_audio_bytes(audio_bytes, suffix='.webm'):
+    """Decode audio bytes to the 16 kHz mono float32 array Whisper expects"""
+    return pcm_to_audio(decode_pcm_bytes(audio_bytes, suffix))
+
+MP3_OUTPUT_ARGS = ['-codec:a', 'libmp3lame', '-qscale:a', '2', '-f', 'mp3']
+
+def encode_mp3_bytes(audio_bytes, suffix='.webm'):
+    """Encode audio bytes to MP3 entirely in memory"""
+    return run_ffmpeg_pipe(audio_bytes, MP3_OUTPUT_ARGS, suffix)
+
+def stream_mp3(audio_bytes, suffix='.webm'):
+    """Encode audio bytes to MP3, yielding the output as ffmpeg writes it"""
+    return stream_ffmpeg_pipe(audio_bytes, MP3_OUTPUT_ARGS, suffix)
+
+def encode_pcm_mp3(pcm, sample_rate=WHISPER_SAMPLE_RATE):
+    """Encode already decoded 16-bit mono PCM to MP3 (raw input: nothing to demux or decode)"""
+    ffmpeg = FFMPEG_PATH or 'ffmpeg'
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0']
+    command += MP3_OUTPUT_ARGS + ['pipe:1']
+    with ffmpeg_pool:
+        process = subprocess.run(command, input=pcm, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {process.stderr.decode(errors='ignore').strip()}")
+    return process.stdout
+
+# ============================================================================
+# Voice activity detection (silent lead-ins and long pauses are cut before decoding)
+# ============================================================================
+
+VAD_FRAME_SECONDS = 0.03
+VAD_PADDING_SECONDS = 0.3       # kept around each speech region so word onsets aren't clipped
+VAD_ABSOLUTE_FLOOR_DB = -60     # frames quieter than this (dBFS) are never speech
+DEFAULT_VAD_THRESHOLD_DB = -35  # relative to the loudest frames of the recording
+DEFAULT_VAD_MIN_SILENCE_SECONDS = 1.5
+
+vad_stats = {'requests': 0, 'audio_seconds': 0.0, 'skipped_seconds': 0.0}
+vad_stats_lock = threading.Lock()
+
+def vad_settings():
+    """VAD parameters from config.json, or None when 'vad_enabled' is false"""
+    config = load_config()
+    if not config.get('vad_enabled', True):
+        return None
+    return {
+        'threshold_db': float(config.get('vad_threshold_db', DEFAULT_VAD_THRESHOLD_DB)),
+        'min_silence': float(config.get('vad_min_silence_seconds', DEFAULT_VAD_MIN_SILENCE_SECONDS))
+    }
+
+def detect_speech(audio, threshold_db=DEFAULT_VAD_THRESHOLD_DB, min_silence=DEFAULT_VAD_MIN_SILENCE_SECONDS):
+    """
+    Sample ranges [(start, end)] that contain speech. A 30 ms frame is voiced
+    when its energy is within threshold_db of the loudest frames; silences
+    shorter than min_silence stay inside the surrounding region.
+    """
+    import numpy as np
+
+    frame = int(VAD_FRAME_SECONDS * WHISPER_SAMPLE_RATE)
+    frames = len(audio) // frame
+    if frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    energy = np.square(audio[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    energy_db = 10 * np.log10(energy + 1e-10)
+    threshold = max(np.percentile(energy_db, 99) + threshold_db, VAD_ABSOLUTE_FLOOR_DB)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if len(voiced) == 0:
+        return []
+
+    # Group voiced frames into regions, bridging gaps shorter than min_silence
+    breaks = np.flatnonzero(np.diff(voiced) > min_silence / VAD_FRAME_SECONDS)
+    starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+
+    padding = int(VAD_PADDING_SECONDS * WHISPER_SAMPLE_RATE)
+    regions = []
+    for start, end in zip(starts, ends):
+        start = max(0, int(start) * frame - padding)
+        end = min(len(audio), int(end) * frame + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+class SpeechTimeline:
+    """Maps times in the trimmed (speech only) audio back onto the original recording"""
+
+    def __init__(self, regions, total_samples):
+        self.regions = []  # (start in trimmed audio, start in original audio, length), in seconds
+        trimmed = 0
+        for start, end in regions:
+            self.regions.append((trimmed / WHISPER_SAMPLE_RATE, start / WHISPER_SAMPLE_RATE, (end - start) / WHISPER_SAMPLE_RATE))
+            trimmed += end - start
+        self.total_seconds = total_samples / WHISPER_SAMPLE_RATE
+        self.skipped_seconds = (total_samples - trimmed) / WHISPER_SAMPLE_RATE
+
+    def to_original(self, t, is_start=False):
+        """
+        Original time of trimmed time t. At the junction of two regions a start
+        belongs to the next region and an end to the previous one.
+        """
+        if not self.regions:
+            return t
+        for trimmed_start, original_start, length in self.regions:
+            boundary = trimmed_start + length
+            if t < boundary or (t == boundary and not is_start):
+                return original_start + max(0.0, t - trimmed_start)
+        _, original_start, length = self.regions[-1]
+        return original_start + length
+
+    def restore(self, result):
+        """Put a Whisper result's segment timestamps back on the original timeline"""
+        for segment in result['segments']:
+            for item in [segment] + segment.get('words', []):
+                item['start'] = round(self.to_original(item['start'], is_start=True), 2)
+                item['end'] = round(self.to_original(item['end']), 2)
+        return result
+
+def trim_silence(audio, vad):
+    """Keep only the speech regions of a 16 kHz array; returns (speech audio, SpeechTimeline)"""
+    import numpy as np
+
+    regions = detect_speech(audio, vad['threshold_db'], vad['min_silence'])
+    timeline = SpeechTimeline(regions, len(audio))
+    if len(regions) == 1:
+        return audio[regions[0][0]:regions[0][1]], timeline
+    if not regions:
+        return audio[:0], timeline
+    return np.concatenate([audio[start:end] for start, end in regions]), timeline
+
+def transcribe_speech(audio, vad, transcribe):
+    """
+    Run `transcribe` (array -> Whisper result) on the speech regions only, or on
+    all of the audio when vad is None. Returns (result on the original
+    timeline, seconds of silence skipped).
+    """
+    if vad is None:
+        return transcribe(audio), 0.0
+
+    speech, timeline = trim_silence(audio, vad)
+    if len(speech) == 0:
+        result = {'text': '', 'segments': [], 'language': 'en'}
+    else:
+        result = timeline.restore(transcribe(speech))
+
+    with vad_stats_lock:
+        vad_stats['requests'] += 1
+        vad_stats['audio_seconds'] += timeline.total_seconds
+        vad_stats['skipped_seconds'] += timeline.skipped_seconds
+    return result, timeline.skipped_seconds
+
+# ============================================================================
+# Transcript cache (persistent, keyed by audio hash + model/decoding settings)
+# ============================================================================
+
+TRANSCRIPT_CACHE_FILE = DATA_DIR / 'transcript_cache.db'
+DEFAULT_TRANSCRIPT_CACHE_MAX_ENTRIES = 2000
+
+class TranscriptCache:
+    """SQLite-backed LRU cache of transcription results with hit/miss counters"""
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS transcripts ('
+            'key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used)')
+        self.connection.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT result FROM transcripts WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute('UPDATE transcripts SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.connection.commit()
+            return json.loads(row[0])
+
+    def peek(self, key):
+        """Like get(), without counting a hit or miss or refreshing the entry"""
+        with self.lock:
+            row = self.connection.execute('SELECT result FROM transcripts WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key, result):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO transcripts (key, result, created, last_used) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            # Evict the least recently used entries beyond the size bound
+            count = self.connection.execute('SELECT COUNT(*) FROM transcripts').fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self.connection.execute(
+                    'DELETE FROM transcripts WHERE key IN '
+                    '(SELECT key FROM transcripts ORDER BY last_used ASC LIMIT ?)', (excess,)
+                )
+                self.evictions += excess
+            self.connection.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM transcripts').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+transcript_cache = None
+_transcript_cache_lock = threading.Lock()
+
+def get_transcript_cache():
+    """Open the cache on first use; None when 'transcript_cache_max_entries' is 0"""
+    global transcript_cache
+    with _transcript_cache_lock:
+        if transcript_cache is None:
+            max_entries = int(load_config().get('transcript_cache_max_entries', DEFAULT_TRANSCRIPT_CACHE_MAX_ENTRIES))
+            if max_entries <= 0:
+                return None
+            transcript_cache = TranscriptCache(TRANSCRIPT_CACHE_FILE, max_entries)
+        return transcript_cache
+
+def transcription_settings(mode, profile, vad=None):
+    """Model, decoding and VAD settings that affect the transcript ('direct', 'batched' or 'stream' decoding)"""
+    return {
+        'model': profile['model'],
+        'beam_size': profile.get('beam_size'),
+        'temperature_fallback': profile.get('temperature_fallback', True),
+        'quantization': profile.get('quantization'),
+        'vad': vad,
+        'word_timestamps': True,
+        'language': 'en',
+        'task': 'transcribe',
+        'mode': mode
+    }
+
+def transcript_cache_key(audio_bytes, settings):
+    """Hash of the audio bytes plus the settings used to transcribe them"""
+    digest = hashlib.sha256(audio_bytes)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def cached_transcript(audio_bytes, settings):
+    """Return (cache key, cached result or None); the key is also the transcript_id, cache or not"""
+    key = transcript_cache_key(audio_bytes, settings)
+    cache = get_transcript_cache()
+    return key, (cache.get(key) if cache is not None else None)
+
+# Fluency measures of recent transcripts by transcript_id, for /evaluate (kept
+# even when the transcript cache is disabled)
+TRANSCRIPT_FLUENCY_MAX_ENTRIES = 500
+transcript_fluencies = OrderedDict()
+transcript_fluencies_lock = threading.Lock()
+
+def store_transcript(key, result):
+    if key is None:
+        return
+    if result.get('fluency') is not None:
+        with transcript_fluencies_lock:
+            transcript_fluencies[key] = result['fluency']
+            transcript_fluencies.move_to_end(key)
+            while len(transcript_fluencies) > TRANSCRIPT_FLUENCY_MAX_ENTRIES:
+                transcript_fluencies.popitem(last=False)
+    cache = get_transcript_cache()
+    if cache is not None:
+        cache.put(key, result)
+
+def run_whisper(model, audio, profile):
+    """Run Whisper on an audio file path (or array) with a profile's decoding settings"""
+    options = {}
+    if profile.get('beam_size'):
+        options['beam_size'] = profile['beam_size']
+    if not profile.get('temperature_fallback', True):
+        options['temperature'] = 0.0
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
+        return model.transcribe(
+            audio,
+            verbose=False,
+            language="en",
+            task="transcribe",
+            word_timestamps=True,
+            **options
+        )
+
+def format_transcript(result):
+    """Format Whisper segments as '[start]s text' lines and count the words"""
+    formatted_transcript = ""
+    word_count = 0
+
+    for segment in result["segments"]:
+        start_time = segment["start"]
+        text = segment["text"].strip()
+        word_count += len(text.split())
+        formatted_transcript += f"[{start_time:.1f}s] {text}\n"
+
+    return formatted_transcript, word_count
+
+# ============================================================================
+# Fluency analytics (computed from Whisper's word timestamps)
+# ============================================================================
+
+PAUSE_MIN_SECONDS = 0.25  # shorter gaps between words are part of normal articulation
+PAUSE_HISTOGRAM_EDGES = (0.25, 0.5, 1.0, 2.0)
+PAUSE_HISTOGRAM_LABELS = ('0.25-0.5s', '0.5-1s', '1-2s', '2s+')
+FILLER_WORDS = ('um', 'uh', 'er', 'erm', 'ah', 'uhm', 'hmm', 'mm', 'mhm')
+
+def transcript_words(result):
+    """Words of a Whisper result as {'word', 'start', 'end'} dicts (punctuation-only tokens dropped)"""
+    return [
+        {'word': word['word'].strip(), 'start': word['start'], 'end': word['end']}
+        for segment in result['segments']
+        for word in segment.get('words', [])
+        if any(character.isalnum() for character in word['word'])
+    ]
+
+def compute_fluency(words):
+    """
+    Fluency measures from word timings. Pauses are silent gaps of at least
+    PAUSE_MIN_SECONDS between two words; speech_duration is the time from the
+    first to the last word minus those pauses. Rates are words per minute:
+    speaking_rate over the whole answer, articulation_rate over speech only.
+    filler_rate is per 100 words.
+    """
+    import numpy as np
+
+    fluency = {
+        'word_count': len(words),
+        'speech_duration': 0.0,
+        'total_duration': 0.0,
+        'speaking_rate_wpm': 0.0,
+        'articulation_rate_wpm': 0.0,
+        'pause_count': 0,
+        'pause_total': 0.0,
+        'pause_mean': 0.0,
+        'pause_median': 0.0,
+        'pause_longest': 0.0,
+        'pause_histogram': dict.fromkeys(PAUSE_HISTOGRAM_LABELS, 0),
+        'filler_count': 0,
+        'filler_rate': 0.0
+    }
+    if not words:
+        return fluency
+
+    starts = np.array([word['start'] for word in words], dtype=np.float64)
+    ends = np.array([word['end'] for word in words], dtype=np.float64)
+    gaps = starts[1:] - ends[:-1]
+    pauses = gaps[gaps >= PAUSE_MIN_SECONDS]
+    total_duration = float(ends[-1] - starts[0])
+    speech_duration = max(total_duration - float(pauses.sum()), 0.0)
+
+    tokens = np.array([word['word'].strip('.,!?;:"\'()-').lower() for word in words])
+    filler_count = int(np.isin(tokens, FILLER_WORDS).sum())
+
+    fluency.update({
+        'speech_duration': round(speech_duration, 2),
+        'total_duration': round(total_duration, 2),
+        'speaking_rate_wpm': round(len(words) / total_duration * 60, 1) if total_duration > 0 else 0.0,
+        'articulation_rate_wpm': round(len(words) / speech_duration * 60, 1) if speech_duration > 0 else 0.0,
+        'filler_count': filler_count,
+        'filler_rate': round(filler_count / len(words) * 100, 1)
+    })
+    if len(pauses):
+        histogram, _ = np.histogram(pauses, bins=PAUSE_HISTOGRAM_EDGES + (np.inf,))
+        fluency.update({
+            'pause_count': int(len(pauses)),
+            'pause_total': round(float(pauses.sum()), 2),
+            'pause_mean': round(float(pauses.mean()), 2),
+            'pause_median': round(float(np.median(pauses)), 2),
+            'pause_longest': round(float(pauses.max()), 2),
+            'pause_histogram': dict(zip(PAUSE_HISTOGRAM_LABELS, histogram.tolist()))
+        })
+    return fluency
+
+def transcription_response(result):
+    """Body returned for a finished transcription: formatted transcript, timed words and fluency measures"""
+    formatted_transcript, word_count = format_transcript(result)
+    words = transcript_words(result)
+    return {
+        'transcript': formatted_transcript,
+        'word_count': len(words) if words else word_count,
+        'words': words,
+        'fluency': compute_fluency(words)
+    }
+
+def transcript_fluency(transcript_id):
+    """Fluency measures of a transcript returned earlier (None if the ID is unknown)"""
+    if not transcript_id:
+        return None
+    with transcript_fluencies_lock:
+        fluency = transcript_fluencies.get(transcript_id)
+    if fluency is not None:
+        return fluency
+    # Transcribed before a restart, or served from the cache since: not counted as a cache lookup
+    cache = get_transcript_cache()
+    cached = cache.peek(transcript_id) if cache is not None else None
+    return cached.get('fluency') if cached else None
+
+def fluency_statistics(fluency):
+    """Extra '**Statistics:**' lines for an evaluation prompt"""
+    histogram = ', '.join(f"{label}: {count}" for label, count in fluency['pause_histogram'].items())
+    return (
+        f"\n- Speech duration: {fluency['speech_duration']:.1f}s (pauses excluded)"
+        f"\n- Articulation rate: {fluency['articulation_rate_wpm']:.1f} words per minute of actual speech"
+        f"\n- Pauses of {PAUSE_MIN_SECONDS}s or more: {fluency['pause_count']} "
+        f"(mean {fluency['pause_mean']:.2f}s, longest {fluency['pause_longest']:.2f}s; {histogram})"
+        f"\n- Filler words (um, uh...): {fluency['filler_count']} ({fluency['filler_rate']:.1f} per 100 words)"
+    )
+
+# Whisper installs per-call hooks on the model while decoding, so the shared
+# in-process models must not be used by two request threads at the same time
+whisper_lock = threading.Lock()
+
+# ============================================================================
+# Micro-batched transcription (concurrent /transcribe calls share one decode)
+# ============================================================================
+
+DEFAULT_BATCH_MAX_SIZE = 1  # Opt-in: 'transcription_batch_size' > 1 enables batching
+DEFAULT_BATCH_MAX_WAIT_MS = 150
+
+# Whisper's fallback thresholds (same defaults as whisper.transcribe)
+FALLBACK_TEMPERATURES = (0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+class _BatchRequest:
+    """One /transcribe call: its mel, and how far whisper.transcribe's loop over it has got"""
+
+    def __init__(self, mel, content_frames):
+        self.mel = mel
+        self.content_frames = content_frames
+        self.seek = 0
+        self.segments = []
+        self.tokens = []  # every segment's tokens, the source of the next window's prompt
+        self.prompt_reset_since = 0
+        self.last_speech_timestamp = 0.0
+        self.error = None
+        self.done = threading.Event()
+
+    def window(self):
+        """(mel, offset in seconds, frames of audio) of the 30-second window starting at seek"""
+        import whisper
+        from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE
+
+        frames = min(N_FRAMES, self.content_frames - self.seek)
+        mel = whisper.pad_or_trim(self.mel[:, self.seek:self.seek + frames], N_FRAMES)
+        return mel, self.seek * HOP_LENGTH / SAMPLE_RATE, frames
+
+    def prompt(self):
+        return self.tokens[self.prompt_reset_since:]
+
+class TranscriptionBatcher:
+    """
+    Scheduler in front of one decoding profile, running whisper.transcribe's
+    window loop for every request at once: each round takes the next 30-second
+    window of up to max_batch_size requests (waiting at most max_wait seconds
+    to fill the batch), encodes them in one pass, then moves every request's
+    seek and prompt on as transcribe does, and queues it again until its audio
+    is done. The decoder only takes one prompt per call, so windows share a
+    decoder pass when their prompts match (first windows, mostly) and are
+    decoded one by one otherwise. The model is looked up in the registry for
+    every batch, so it can be evicted between batches.
+    """
+
+    def __init__(self, profile, max_batch_size=DEFAULT_BATCH_MAX_SIZE, max_wait=DEFAULT_BATCH_MAX_WAIT_MS / 1000):
+        import whisper
+
+        self.profile = profile
+        model = profile_model(profile)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        tokenizer_kwargs = {'num_languages': model.num_languages} if hasattr(model, 'num_languages') else {}
+        self.tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual, language="en", task="transcribe", **tokenizer_kwargs
+        )
+        self.pending = []
+        self.condition = threading.Condition()
+        self.stats = {'batches': 0, 'windows': 0, 'requests': 0}
+        self.thread = threading.Thread(target=self._run, name=f"whisper-batcher-{profile['model']}", daemon=True)
+        self.thread.start()
+
+    def transcribe(self, audio):
+        """Transcribe a 16 kHz float32 array; returns a dict shaped like whisper's transcribe() result"""
+        import whisper
+        from whisper.audio import N_FRAMES, N_SAMPLES
+
+        # Compute the mel on the caller's thread so the batch thread only decodes.
+        # As in whisper.transcribe, it is padded with 30 s of silence in the audio domain.
+        n_mels = profile_model(self.profile).dims.n_mels
+        mel = whisper.log_mel_spectrogram(audio, n_mels=n_mels, padding=N_SAMPLES)
+        batch_request = _BatchRequest(mel, mel.shape[-1] - N_FRAMES)
+
+        with self.condition:
+            self.stats['requests'] += 1
+            if batch_request.content_frames > 0:
+                self.pending.append(batch_request)
+                self.condition.notify()
+            else:
+                batch_request.done.set()
+
+        batch_request.done.wait()
+        if batch_request.error is not None:
+            raise batch_request.error
+        segments = batch_request.segments
+        for i, segment in enumerate(segments):
+            segment['id'] = i
+        return {
+            'text': self.tokenizer.decode(batch_request.tokens),
+            'segments': segments,
+            'language': 'en'
+        }
+
+    def _next_batch(self):
+        """Wait for pending requests, then give stragglers up to max_wait to join the batch"""
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch = self.pending[:self.max_batch_size]
+            del self.pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                model = profile_model(self.profile)
+                windows = [batch_request.window() for batch_request in batch]
+                with whisper_lock:
+                    results = self._decode_batch(model, windows, [batch_request.prompt() for batch_request in batch])
+                    for batch_request, result, window in zip(batch, results, windows):
+                        self._advance(model, batch_request, result, window)
+            except Exception as e:
+                for batch_request in batch:
+                    batch_request.error = e
+                    batch_request.done.set()
+                continue
+
+            with self.condition:
+                self.stats['batches'] += 1
+                self.stats['windows'] += len(batch)
+                for batch_request in batch:
+                    if batch_request.seek < batch_request.content_frames:
+                        self.pending.append(batch_request)  # its next window goes in a later batch
+                    else:
+                        batch_request.done.set()
+
+    def _decode_options(self, model, temperature, prompt):
+        import whisper
+        return whisper.DecodingOptions(
+            task="transcribe",
+            language="en",
+            temperature=temperature,
+            beam_size=self.profile.get('beam_size') if temperature == 0 else None,
+            best_of=5 if temperature > 0 else None,
+            prompt=prompt,
+            fp16=model.device.type != 'cpu'
+        )
+
+    def _decode_batch(self, model, windows, prompts):
+        """
+        One batched encoder pass, one decoder pass per distinct prompt, then
+        per-window temperature fallback like whisper.transcribe
+        """
+        import torch
+        import whisper
+
+        mel = torch.stack([mel for mel, _, _ in windows]).to(model.device)
+        with torch.no_grad():
+            audio_features = model.embed_audio(mel.half() if model.device.type != 'cpu' else mel)
+
+        windows_by_prompt = {}
+        for i, prompt in enumerate(prompts):
+            windows_by_prompt.setdefault(tuple(prompt), []).append(i)
+        results = [None] * len(windows)
+        for prompt, indices in windows_by_prompt.items():
+            decoded = whisper.decode(model, audio_features[indices], self._decode_options(model, 0.0, list(prompt)))
+            for i, result in zip(indices, decoded):
+                results[i] = result
+        if not self.profile.get('temperature_fallback', True):
+            return results
+
+        for i, result in enumerate(results):
+            for temperature in FALLBACK_TEMPERATURES:
+                if not self._needs_fallback(result):
+                    break
+                result = whisper.decode(model, audio_features[i], self._decode_options(model, temperature, prompts[i]))
+            results[i] = result
+        return results
+
+    @staticmethod
+    def _is_silence(result):
+        return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+    def _needs_fallback(self, result):
+        if self._is_silence(result):
+            return False
+        return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+    def _advance(self, model, batch_request, result, window):
+        """
+        One turn of whisper.transcribe's loop (word_timestamps=True) for a decoded
+        window: split its tokens into segments at the timestamp tokens, align the
+        words, then seek to the end of the last complete segment or word
+        """
+        import whisper
+        from whisper.audio import FRAMES_PER_SECOND, HOP_LENGTH, N_FRAMES, SAMPLE_RATE
+        from whisper.utils import get_end
+
+        mel, time_offset, frames = window
+        if self._is_silence(result):
+            batch_request.seek += frames
+            return
+
+        input_stride = N_FRAMES // model.dims.n_audio_ctx  # mel frames per timestamp token
+        time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+        timestamp_begin = self.tokenizer.timestamp_begin
+        tokens = result.tokens
+        is_timestamp = [token >= timestamp_begin for token in tokens]
+        single_timestamp_ending = is_timestamp[-2:] == [False, True]
+        consecutive = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+
+        def new_segment(start, end, segment_tokens):
+            return {
+                'seek': batch_request.seek,
+                'start': start,
+                'end': end,
+                'text': self.tokenizer.decode([token for token in segment_tokens if token < self.tokenizer.eot]),
+                'tokens': list(segment_tokens),
+                'temperature': result.temperature,
+                'avg_logprob': result.avg_logprob,
+                'compression_ratio': result.compression_ratio,
+                'no_speech_prob': result.no_speech_prob
+            }
+
+        segments = []
+        if consecutive:
+            slices = consecutive + [len(tokens)] if single_timestamp_ending else consecutive
+            last_slice = 0
+            for current_slice in slices:
+                sliced = tokens[last_slice:current_slice]
+                segments.append(new_segment(
+                    time_offset + (sliced[0] - timestamp_begin) * time_precision,
+                    time_offset + (sliced[-1] - timestamp_begin) * time_precision,
+                    sliced
+                ))
+                last_slice = current_slice
+            if single_timestamp_ending:
+                batch_request.seek += frames
+            else:
+                # ignore the unfinished segment and seek to the last timestamp
+                batch_request.seek += (tokens[last_slice - 1] - timestamp_begin) * input_stride
+        else:
+            duration = frames * HOP_LENGTH / SAMPLE_RATE
+            timestamps = [token for token in tokens if token >= timestamp_begin]
+            if timestamps and timestamps[-1] != timestamp_begin:
+                duration = (timestamps[-1] - timestamp_begin) * time_precision
+            segments.append(new_segment(time_offset, time_offset + duration, tokens))
+            batch_request.seek += frames
+
+        whisper.timing.add_word_timestamps(
+            segments=segments,
+            model=model,
+            tokenizer=self.tokenizer,
+            mel=mel.to(model.device),
+            num_frames=frames,
+            last_speech_timestamp=batch_request.last_speech_timestamp
+        )
+        last_word_end = get_end(segments)
+        if not single_timestamp_ending and last_word_end is not None and last_word_end > time_offset:
+            batch_request.seek = round(last_word_end * FRAMES_PER_SECOND)
+        if last_word_end is not None:
+            batch_request.last_speech_timestamp = last_word_end
+
+        # an instantaneous segment or one without text is kept, emptied
+        for segment in segments:
+            if segment['start'] == segment['end'] or segment['text'].strip() == '':
+                segment['text'] = ''
+                segment['tokens'] = []
+                segment['words'] = []
+
+        batch_request.segments.extend(segments)
+        batch_request.tokens.extend(token for segment in segments for token in segment['tokens'])
+        if result.temperature > 0.5:
+            # do not feed the prompt tokens if a high temperature was used
+            batch_request.prompt_reset_since = len(batch_request.tokens)
+
+# One batcher per distinct decoding profile (windows decoded with different
+# models or options can't share a batch)
+transcription_batchers = {}
+_transcription_batcher_lock = threading.Lock()
+
+def get_transcription_batcher(profile):
+    """
+    Return the batcher for a decoding profile, or None when batching is disabled
+    ('transcription_batch_size' <= 1 in config.json)
+    """
+    batcher_key = json.dumps(profile, sort_keys=True)
+    with _transcription_batcher_lock:
+        batcher = transcription_batchers.get(batcher_key)
+        if batcher is None:
+            config = load_config()
+            max_batch_size = int(config.get('transcription_batch_size', DEFAULT_BATCH_MAX_SIZE))
+            if max_batch_size <= 1:
+                return None
+            max_wait = float(config.get('transcription_batch_wait_ms', DEFAULT_BATCH_MAX_WAIT_MS)) / 1000
+            batcher = transcription_batchers[batcher_key] = TranscriptionBatcher(profile, max_batch_size, max_wait)
+        return batcher
+
+def in_process_transcription_mode():
+    """'batched' when the micro-batcher is in front of the model, 'direct' otherwise"""
+    batch_size = int(load_config().get('transcription_batch_size', DEFAULT_BATCH_MAX_SIZE))
+    return 'batched' if batch_size > 1 else 'direct'
+
+def transcribe_audio(audio, profile):
+    """Transcribe a 16 kHz float32 array with an in-process model, through the batcher when enabled"""
+    batcher = get_transcription_batcher(profile)
+    if batcher is not None:
+        return batcher.transcribe(audio)
+    model = profile_model(profile)
+    with whisper_lock:
+        return run_whisper(model, audio, profile)
+
+def transcribe_recording(audio_bytes, suffix, profile, vad, cache_key):
+    """Decode and transcribe an uploaded recording; the result is cached and returned with its transcript_id"""
+    # Decode in memory (ffmpeg pipes) instead of going through a temp file
+    audio = decode_audio_bytes(audio_bytes, suffix)
+    result, skipped_seconds = transcribe_speech(audio, vad, lambda speech: transcribe_audio(speech, profile))
+
+    print(f"[TRANSCRIBE] Whisper result: {len(result.get('segments', []))} segments, {skipped_seconds:.1f}s of silence skipped")
+
+    response = transcription_response(result)
+    response['skipped_seconds'] = round(skipped_seconds, 1)
+    store_transcript(cache_key, response)
+
+    # The ID lets /evaluate look up the fluency measures instead of trusting client timings
+    return dict(response, transcript_id=cache_key)
+
+@app.route('/transcribe', methods=['POST'])
+def transcribe():
+    """Transcribe audio using Whisper"""
+    try:
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        try:
+            _, profile = resolve_whisper_profile(request.form.get('profile'), request.form.get('task'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        audio_file = request.files['audio']
+        audio_bytes = audio_file.read()
+
+        # Re-submitted recordings are answered from the cache, even while the model warms up
+        vad = vad_settings()
+        cache_key, cached = cached_transcript(audio_bytes, transcription_settings(in_process_transcription_mode(), profile, vad))
+        if cached is not None:
+            print(f"[TRANSCRIBE] Cache hit for {len(audio_bytes)} bytes")
+            return jsonify(dict(cached, transcript_id=cache_key))
+
+        if not whisper_ready.is_set():
+            return model_warming_response()
+
+        # Check file size
+        file_size = len(audio_bytes)
+        print(f"[TRANSCRIBE] Received audio file: {file_size} bytes")
+
+        if file_size < 1000:  # Less than 1KB is probably empty
+            print(f"[TRANSCRIBE] WARNING: Audio file is suspiciously small!")
+
+        suffix = os.path.splitext(audio_file.filename or '')[1] or '.webm'
+        return jsonify(transcribe_recording(audio_bytes, suffix, profile, vad, cache_key))
+
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# Recording export (one upload and one decode for both the transcript and the MP3)
+# ============================================================================
+
+ARTIFACT_TTL_SECONDS = 30 * 60
+DEFAULT_ARTIFACT_STORE_MB = 200
+EXPORT_WORKERS = 4
+
+class ArtifactStore:
+    """Generated files (MP3 exports) kept in memory for a while so the page can download them by ID"""
+
+    def __init__(self):
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, data, mimetype, filename):
+        """Store the bytes and return their download ID"""
+        artifact_id = uuid.uuid4().hex
+        limit = float(load_config().get('artifact_store_mb', DEFAULT_ARTIFACT_STORE_MB)) * 1024 * 1024
+        with self.lock:
+            self.items[artifact_id] = {'data': data, 'mimetype': mimetype, 'filename': filename, 'created': time.time()}
+            self._prune(limit)
+        return artifact_id
+
+    def get(self, artifact_id):
+        """The stored artifact dict, or None if it is unknown or expired"""
+        with self.lock:
+            item = self.items.get(artifact_id)
+            if item is None or item['created'] < time.time() - ARTIFACT_TTL_SECONDS:
+                return None
+            return item
+
+    def _prune(self, limit):
+        """Drop expired artifacts, then the oldest ones until the total fits in `limit` bytes"""
+        cutoff = time.time() - ARTIFACT_TTL_SECONDS
+        total = sum(len(item['data']) for item in self.items.values())
+        while len(self.items) > 1:
+            artifact_id, item = next(iter(self.items.items()))
+            if item['created'] >= cutoff and total <= limit:
+                break
+            total -= len(item['data'])
+            del self.items[artifact_id]
+
+    def stats(self):
+        with self.lock:
+            return {'count': len(self.items), 'bytes': sum(len(item['data']) for item in self.items.values())}
+
+artifact_store = ArtifactStore()
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+def get_export_executor():
+    """Thread pool that encodes MP3 exports while Whisper transcribes the same PCM"""
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='mp3-export')
+        return _export_executor
+
+@app.route('/transcribe_with_mp3', methods=['POST'])
+def transcribe_with_mp3():
+    """
+    Transcribe a recording and export it to MP3 from a single upload.
+    The upload is decoded once; the PCM goes to the MP3 encoder and to Whisper
+    in parallel, and the response carries the transcript plus a download URL.
+    """
+    try:
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        if not FFMPEG_AVAILABLE or not FFMPEG_PATH:
+            return jsonify({'error': 'FFmpeg not installed. Please install FFmpeg to enable MP3 conversion.'}), 400
+
+        try:
+            _, profile = resolve_whisper_profile(request.form.get('profile'), request.form.get('task'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        audio_file = request.files['audio']
+        audio_bytes = audio_file.read()
+
+        vad = vad_settings()
+        cache_key, cached = cached_transcript(audio_bytes, transcription_settings(in_process_transcription_mode(), profile, vad))
+        if cached is None and not whisper_ready.is_set():
+            return model_warming_response()
+
+        print(f"[TRANSCRIBE+MP3] Received audio file: {len(audio_bytes)} bytes")
+        pcm = decode_pcm_bytes(audio_bytes, os.path.splitext(audio_file.filename or '')[1] or '.webm')
+        mp3_future = get_export_executor().submit(encode_pcm_mp3, pcm)
+
+        if cached is not None:
+            response = cached
+        else:
+            result, skipped_seconds = transcribe_speech(pcm_to_audio(pcm), vad, lambda speech: transcribe_audio(speech, profile))
+            response = transcription_response(result)
+            response['skipped_seconds'] = round(skipped_seconds, 1)
+            store_transcript(cache_key, response)
+
+        artifact_id = artifact_store.add(mp3_future.result(), 'audio/mpeg', 'recording.mp3')
+        return jsonify(dict(response, transcript_id=cache_key, mp3_url=f'/artifacts/{artifact_id}'))
+
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/artifacts/<artifact_id>')
+def get_artifact(artifact_id):
+    """
+    Serve a generated file (e.g. the MP3 of a recording). Range requests are
+    supported, so an <audio> element can seek without downloading it all;
+    ?download=1 asks the browser to save it instead of playing it.
+    """
+    item = artifact_store.get(artifact_id)
+    if item is None:
+        return jsonify({'error': 'File not found or expired'}), 404
+    return send_file(io.BytesIO(item['data']), mimetype=item['mimetype'],
+                     as_attachment=request.args.get('download') == '1', download_name=item['filename'],
+                     max_age=ARTIFACT_TTL_SECONDS)
+
+# ============================================================================
+# Transcription jobs (asynchronous, transcribed by a pool of worker processes)
+# ============================================================================
+
+DEFAULT_TRANSCRIPTION_WORKERS = 2
+JOB_RETENTION_SECONDS = 60 * 60
+
+transcription_jobs = {}
+transcription_jobs_lock = threading.Lock()
+_transcription_executor = None
+
+def _init_transcription_worker(profile):
+    """Preload the default profile's model into the worker's own registry"""
+    profile_model(profile)
+
+def _run_transcription_job(pcm, profile, vad):
+    """Transcribe decoded audio (16-bit PCM) inside a worker process"""
+    audio = pcm_to_audio(pcm)
+    model = profile_model(profile)
+    result, skipped_seconds = transcribe_speech(audio, vad, lambda speech: run_whisper(model, speech, profile))
+    return dict(transcription_response(result), skipped_seconds=round(skipped_seconds, 1))
+
+def get_transcription_executor():
+    """Create the worker pool on first use (size from config 'transcription_workers')"""
+    global _transcription_executor
+    with transcription_jobs_lock:
+        if _transcription_executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            workers = int(load_config().get('transcription_workers', DEFAULT_TRANSCRIPTION_WORKERS))
+            workers = max(1, min(workers, os.cpu_count() or 1))
+            print(f"Starting {workers} transcription worker process(es)...")
+            # 'spawn' because forking a process that already runs torch threads is unsafe
+            _transcription_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_transcription_worker,
+                initargs=(resolve_whisper_profile()[1],)
+            )
+        return _transcription_executor
+
+def _reset_transcription_executor(executor):
+    """Drop a broken pool (e.g. a worker was killed) so the next job starts a new one"""
+    global _transcription_executor
+    with transcription_jobs_lock:
+        if _transcription_executor is executor:
+            _transcription_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _prune_transcription_jobs():
+    """Forget finished jobs older than JOB_RETENTION_SECONDS"""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with transcription_jobs_lock:
+        for job_id in [job_id for job_id, job in transcription_jobs.items()
+                       if job['future'].done() and job['created'] < cutoff]:
+            del transcription_jobs[job_id]
+
+def submit_transcription_job(audio_bytes, suffix='.webm', profile=None):
+    """Queue audio for transcription and return the new job ID"""
+    from concurrent.futures import Future
+
+    if profile is None:
+        _, profile = resolve_whisper_profile()
+    _prune_transcription_jobs()
+    vad = vad_settings()
+    cache_key, cached = cached_transcript(audio_bytes, transcription_settings('direct', profile, vad))
+    if cached is not None:
+        # Already transcribed: the job is done as soon as it is created
+        executor = None
+        future = Future()
+        future.set_result(cached)
+    else:
+        # Decoded here rather than in the workers, whose own ffmpeg_pool would not count the parent's ffmpegs
+        pcm = decode_pcm_bytes(audio_bytes, suffix)
+        executor = get_transcription_executor()
+        try:
+            future = executor.submit(_run_transcription_job, pcm, profile, vad)
+        except BrokenProcessPool:
+            _reset_transcription_executor(executor)
+            executor = get_transcription_executor()
+            future = executor.submit(_run_transcription_job, pcm, profile, vad)
+        future.add_done_callback(
+            lambda done: store_transcript(cache_key, done.result()) if not done.cancelled() and done.exception() is None else None
+        )
+
+    job_id = uuid.uuid4().hex
+    with transcription_jobs_lock:
+        transcription_jobs[job_id] = {'future': future, 'created': time.time(), 'executor': executor, 'cache_key': cache_key}
+    return job_id
+
+def transcription_job_status(job_id):
+    """Return the public status dict of a job, or None if the ID is unknown"""
+    with transcription_jobs_lock:
+        job = transcription_jobs.get(job_id)
+    if job is None:
+        return None
+
+    future = job['future']
+    status = {'job_id': job_id}
+    if not future.done():
+        status['status'] = 'running' if future.running() else 'queued'
+    elif future.cancelled():
+        status['status'] = 'error'
+        status['error'] = 'Job was cancelled'
+    elif future.exception() is not None:
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            _reset_transcription_executor(job['executor'])
+        status['status'] = 'error'
+        status['error'] = str(error) or error.__class__.__name__
+    else:
+        status['status'] = 'done'
+        status.update(future.result())
+        status['transcript_id'] = job['cache_key']
+    return status
+
+@app.route('/transcribe/jobs', methods=['POST'])
+def create_transcription_job():
+    """Queue a recording for transcription and return a job ID immediately"""
+    try:
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        try:
+            _, profile = resolve_whisper_profile(request.form.get('profile'), request.form.get('task'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        audio_file = request.files['audio']
+        audio_bytes = audio_file.read()
+        suffix = os.path.splitext(audio_file.filename or '')[1] or '.webm'
+        print(f"[TRANSCRIBE JOB] Received audio file: {len(audio_bytes)} bytes")
+
+        job_id = submit_transcription_job(audio_bytes, suffix, profile)
+        response = jsonify({'job_id': job_id, 'status': 'queued'})
+        response.headers['Location'] = f'/transcribe/jobs/{job_id}'
+        return response, 202
+
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/transcribe/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Get the status (and result once done) of a transcription job"""
+    status = transcription_job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+# ============================================================================
+# Streaming transcription (chunks are transcribed while the student records)
+# ============================================================================
+
+DEFAULT_STREAM_WINDOW_SECONDS = 10
+DEFAULT_STREAM_DECODERS = 16
+STREAM_SESSION_TTL_SECONDS = 2 * 60  # the recorder sends a chunk every second
+STREAM_REAPER_INTERVAL_SECONDS = 30
+STREAM_WORKERS = 4
+
+class StreamDecoderPool(FFmpegPool):
+    """
+    Slots of the long-lived ffmpeg of streaming sessions (`stream_decoders` at
+    once), apart from ffmpeg_pool so that recordings in progress cannot hold
+    every slot of the short conversions. There is no queue: a session over the
+    limit is refused at once (429) and the page uploads the whole recording.
+    """
+
+    @staticmethod
+    def settings():
+        workers = max(1, int(load_config().get('stream_decoders', DEFAULT_STREAM_DECODERS)))
+        return workers, 0, 0.0
+
+stream_decoder_pool = StreamDecoderPool()
+
+class StreamDecoder:
+    """
+    One ffmpeg for a streaming session, fed each chunk as it arrives, so every
+    byte is decoded once. A thread collects the PCM it writes; samples are
+    dropped from the buffer once they have been transcribed. It holds a slot
+    of stream_decoder_pool from creation to close() or kill().
+    """
+
+    def __init__(self):
+        ffmpeg = FFMPEG_PATH or 'ffmpeg'
+        self.slot_started = stream_decoder_pool.acquire()
+        try:
+            self.process = subprocess.Popen(
+                [ffmpeg, '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', 'pipe:0'] + PCM_OUTPUT_ARGS + ['pipe:1'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        except BaseException:
+            stream_decoder_pool.release(self.slot_started)
+            raise
+        self.pcm = bytearray()  # decoded, not transcribed yet
+        self.decoded_bytes = 0
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        while True:
+            data = self.process.stdout.read1(STREAM_CHUNK_SIZE)
+            if not data:
+                break
+            with self.lock:
+                self.pcm.extend(data)
+                self.decoded_bytes += len(data)
+
+    def feed(self, chunk):
+        try:
+            self.process.stdin.write(chunk)
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            pass  # ffmpeg stopped reading (error or not pipeable); close() tells
+
+    def pending(self):
+        """16-bit PCM of the whole samples decoded and not consumed yet"""
+        with self.lock:
+            return bytes(self.pcm[:len(self.pcm) - len(self.pcm) % 2])
+
+    def consume(self, samples):
+        with self.lock:
+            del self.pcm[:2 * samples]
+
+    def close(self):
+        """Decode the rest of the input; False if ffmpeg could not read it (or produced nothing)"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.reader.join()
+        self.process.stdout.close()
+        returncode = self.process.wait()
+        with self.lock:
+            slot_started, self.slot_started = self.slot_started, None
+        if slot_started is not None:
+            stream_decoder_pool.release(slot_started)
+        return returncode == 0 and self.decoded_bytes > 0
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.close()
+
+class StreamingSession:
+    """Audio received so far for one recording, and the segments already transcribed from it"""
+
+    def __init__(self, suffix, profile, vad, decoder):
+        self.suffix = suffix
+        self.profile = profile
+        self.vad = vad
+        self.audio_bytes = bytearray()
+        self.decoder = decoder
+        self.processed_samples = 0
+        self.skipped_seconds = 0.0
+        self.segments = []
+        self.error = None
+        self.pending = False
+        self.last_activity = time.time()
+        self.lock = threading.Lock()             # protects the fields above
+        self.processing_lock = threading.Lock()  # one transcription pass at a time
+
+streaming_sessions = {}
+streaming_sessions_lock = threading.Lock()
+_stream_executor = None
+_stream_reaper = None
+
+def get_stream_executor():
+    """Thread pool that transcribes completed windows in the background"""
+    global _stream_executor
+    with streaming_sessions_lock:
+        if _stream_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix='stream-transcriber')
+        return _stream_executor
+
+def _quietest_sample(audio, start, end, frame=320):
+    """Index of the quietest 20 ms frame in audio[start:end], to avoid cutting a window mid-word"""
+    import numpy as np
+
+    region = audio[start:end]
+    frames = len(region) // frame
+    if frames == 0:
+        return end
+    energy = np.square(region[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame
+
+def process_stream_session(session, final=False):
+    """
+    Transcribe every completed window of the audio decoded so far (only what
+    follows the windows already transcribed), leaving out its silences as
+    /transcribe does. With final=True the decoder is flushed and the
+    remaining tail is transcribed as well.
+    """
+    from whisper.audio import N_SAMPLES, SAMPLE_RATE
+
+    window = int(float(load_config().get('stream_window_seconds', DEFAULT_STREAM_WINDOW_SECONDS)) * SAMPLE_RATE)
+    window = min(window, N_SAMPLES - SAMPLE_RATE)
+
+    decoder = session.decoder
+    with session.processing_lock:
+        if final and not decoder.close() and session.audio_bytes:
+            # ffmpeg could not read the container from a pipe: decode the whole recording once
+            with session.lock:
+                audio_bytes = bytes(session.audio_bytes)
+            audio = decode_audio_bytes(audio_bytes, session.suffix)[session.processed_samples:]
+        else:
+            audio = pcm_to_audio(decoder.pending())
+
+        start = 0
+        while True:
+            available = len(audio) - start
+            if final:
+                if available < SAMPLE_RATE // 10:
+                    break
+                end = min(len(audio), start + N_SAMPLES)
+            else:
+                # Keep one second of look-ahead so the cut can fall in a pause
+                if available < window + SAMPLE_RATE:
+                    break
+                end = _quietest_sample(audio, start + window - SAMPLE_RATE, start + window + SAMPLE_RATE)
+
+            result, skipped_seconds = transcribe_speech(
+                audio[start:end], session.vad, lambda speech: transcribe_audio(speech, session.profile)
+            )
+            offset = session.processed_samples / SAMPLE_RATE
+            new_segments = []
+            for segment in result['segments']:
+                shifted = dict(segment)
+                shifted['start'] = round(segment['start'] + offset, 2)
+                shifted['end'] = round(segment['end'] + offset, 2)
+                shifted['words'] = [
+                    dict(word, start=round(word['start'] + offset, 2), end=round(word['end'] + offset, 2))
+                    for word in segment.get('words', [])
+                ]
+                new_segments.append(shifted)
+
+            decoder.consume(end - start)
+            with session.lock:
+                session.segments.extend(new_segments)
+                session.processed_samples += end - start
+                session.skipped_seconds += skipped_seconds
+            start = end
+
+def _process_stream_in_background(session):
+    with session.lock:
+        session.pending = False
+    try:
+        process_stream_session(session)
+    except Exception as e:
+        with session.lock:
+            session.error = str(e)
+
+def _prune_streaming_sessions():
+    """Drop sessions that have been idle for longer than STREAM_SESSION_TTL_SECONDS and stop their decoders"""
+    cutoff = time.time() - STREAM_SESSION_TTL_SECONDS
+    with streaming_sessions_lock:
+        expired = [streaming_sessions.pop(session_id) for session_id in
+                   [session_id for session_id, session in streaming_sessions.items() if session.last_activity < cutoff]]
+    for session in expired:
+        session.decoder.kill()
+
+def _reap_streaming_sessions():
+    while True:
+        time.sleep(STREAM_REAPER_INTERVAL_SECONDS)
+        _prune_streaming_sessions()
+
+def start_stream_reaper():
+    """Prune idle sessions on a timer, so that abandoned ones go away even when no request comes in"""
+    global _stream_reaper
+    with streaming_sessions_lock:
+        if _stream_reaper is None:
+            _stream_reaper = threading.Thread(target=_reap_streaming_sessions, name='stream-reaper', daemon=True)
+            _stream_reaper.start()
+
+def stream_session_state(session, since=0):
+    """Segments transcribed since index `since`, formatted like /transcribe lines"""
+    from whisper.audio import SAMPLE_RATE
+
+    with session.lock:
+        segments = session.segments[since:]
+        state = {
+            'segments': [f"[{segment['start']:.1f}s] {segment['text'].strip()}" for segment in segments],
+            'next': len(session.segments),
+            'processed_seconds': round(session.processed_samples / SAMPLE_RATE, 1)
+        }
+        if session.error:
+            state['error'] = session.error
+    return state
+
+@app.route('/transcribe/stream', methods=['POST'])
+def create_stream_session():
+    """Start a streaming transcription session for a recording in progress"""
+    if not whisper_ready.is_set():
+        return model_warming_response()
+
+    try:
+        _, profile = resolve_whisper_profile(request.args.get('profile'), request.args.get('task'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    _prune_streaming_sessions()
+    start_stream_reaper()
+    try:
+        # The decoder starts now, so that a server at its limit refuses the session before any upload
+        decoder = StreamDecoder()
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    suffix = request.args.get('suffix', '.webm')
+    session_id = uuid.uuid4().hex
+    with streaming_sessions_lock:
+        streaming_sessions[session_id] = StreamingSession(suffix, profile, vad_settings(), decoder)
+    return jsonify({'session_id': session_id}), 201
+
+@app.route('/transcribe/stream/<session_id>', methods=['GET'])
+def get_stream_session(session_id):
+    """Partial transcript of a streaming session (segments after ?since=N)"""
+    with streaming_sessions_lock:
+        session = streaming_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(stream_session_state(session, request.args.get('since', 0, type=int)))
+
+@app.route('/transcribe/stream/<session_id>', methods=['DELETE'])
+def cancel_stream_session(session_id):
+    """Drop a session the page no longer needs (it fell back to /transcribe or was left) and stop its decoder"""
+    with streaming_sessions_lock:
+        session = streaming_sessions.pop(session_id, None)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    session.decoder.kill()
+    return jsonify({'success': True})
+
+@app.route('/transcribe/stream/<session_id>/chunk', methods=['POST'])
+def add_stream_chunk(session_id):
+    """Append the next recorder chunk and return segments transcribed since ?since=N"""
+    with streaming_sessions_lock:
+        session = streaming_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+
+    try:
+        chunk = request.files['audio'].read() if 'audio' in request.files else request.get_data()
+        with session.lock:
+            session.decoder.feed(chunk)
+            session.audio_bytes.extend(chunk)
+            session.last_activity = time.time()
+            schedule = not session.pending
+            session.pending = True
+        if schedule:
+            get_stream_executor().submit(_process_stream_in_background, session)
+
+        return jsonify(stream_session_state(session, request.args.get('since', 0, type=int)))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/transcribe/stream/<session_id>/finish', methods=['POST'])
+def finish_stream_session(session_id):
+    """Transcribe the remaining audio and return the full transcript (same shape as /transcribe)"""
+    with streaming_sessions_lock:
+        session = streaming_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+
+    try:
+        process_stream_session(session, final=True)
+        with streaming_sessions_lock:
+            streaming_sessions.pop(session_id, None)
+
+        print(f"[TRANSCRIBE STREAM] {len(session.audio_bytes)} bytes, {len(session.segments)} segments")
+        response = transcription_response({'segments': session.segments})
+        response['skipped_seconds'] = round(session.skipped_seconds, 1)
+        cache_key = None
+        if session.error is None:
+            settings = transcription_settings('stream', session.profile, session.vad)
+            cache_key = transcript_cache_key(bytes(session.audio_bytes), settings)
+            store_transcript(cache_key, response)
+
+        return jsonify(dict(response, transcript_id=cache_key))
+
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# Prompt audio normalization (compact copies made once, when a file is uploaded)
+# ============================================================================
+
+NORMALIZED_DIR_NAME = '.normalized'
+DEFAULT_PLAYBACK_BITRATE = '32k'
+
+def normalized_paths(audio_path):
+    """Where the copies of a stored audio file live: <audio dir>/.normalized/<file name>.{flac,webm,json}"""
+    directory = audio_path.parent / NORMALIZED_DIR_NAME
+    return {
+        'flac': directory / f'{audio_path.name}.flac',
+        'playback': directory / f'{audio_path.name}.webm',
+        'meta': directory / f'{audio_path.name}.json'
+    }
+
+def normalized_metadata(audio_path):
+    """Sidecar metadata of a stored audio file, or None if it was never normalized or changed since"""
+    paths = normalized_paths(audio_path)
+    try:
+        with open(paths['meta'], 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        stat = audio_path.stat()
+    except (OSError, ValueError):
+        return None
+    if meta.get('source_mtime') != stat.st_mtime or meta.get('source_size') != stat.st_size:
+        return None
+    if not paths['flac'].exists() or not paths['playback'].exists():
+        return None
+    return meta
+
+def _dbfs(value):
+    import numpy as np
+
+    return round(float(20 * np.log10(value)), 1) if value > 0 else None
+
+def normalize_audio_file(audio_path):
+    """
+    Make the compact copies of a stored audio file in one ffmpeg run (a single
+    decode, three outputs): a 16 kHz mono FLAC for Whisper, a low-bitrate Opus
+    (WebM) for playback, and the PCM used here to measure duration and
+    loudness. The measures are written to a JSON sidecar and returned.
+    """
+    import numpy as np
+
+    paths = normalized_paths(audio_path)
+    paths['meta'].parent.mkdir(exist_ok=True)
+    stat = audio_path.stat()
+    bitrate = str(load_config().get('playback_bitrate', DEFAULT_PLAYBACK_BITRATE))
+
+    # Written under temporary names and renamed, so readers never see a partial file
+    tag = uuid.uuid4().hex[:8]
+    flac_temp = paths['flac'].with_name(f"{paths['flac'].name}.{tag}.tmp")
+    playback_temp = paths['playback'].with_name(f"{paths['playback'].name}.{tag}.tmp")
+    ffmpeg = FFMPEG_PATH or 'ffmpeg'
+    command = [
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-threads', '0', '-i', str(audio_path),
+        '-vn', '-ac', '1', '-ar', str(WHISPER_SAMPLE_RATE), '-c:a', 'flac', '-sample_fmt', 's16', '-f', 'flac', str(flac_temp),
+        '-vn', '-ac', '1', '-c:a', 'libopus', '-b:a', bitrate, '-application', 'voip', '-f', 'webm', str(playback_temp),
+        '-vn', '-ac', '1', '-ar', str(WHISPER_SAMPLE_RATE), '-acodec', 'pcm_s16le', '-f', 's16le', 'pipe:1'
+    ]
+    try:
+        with ffmpeg_pool:
+            process = subprocess.run(command, capture_output=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {process.stderr.decode(errors='ignore').strip()}")
+        os.replace(flac_temp, paths['flac'])
+        os.replace(playback_temp, paths['playback'])
+    finally:
+        for temp_path in (flac_temp, playback_temp):
+            if temp_path.exists():
+                temp_path.unlink()
+
+    audio = pcm_to_audio(process.stdout)
+    meta = {
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'duration': round(len(audio) / WHISPER_SAMPLE_RATE, 2),
+        'rms_dbfs': _dbfs(float(np.sqrt(np.mean(np.square(audio)))) if len(audio) else 0.0),
+        'peak_dbfs': _dbfs(float(np.max(np.abs(audio))) if len(audio) else 0.0),
+        'flac_size': paths['flac'].stat().st_size,
+        'playback_size': paths['playback'].stat().st_size,
+        'playback_bitrate': bitrate,
+        'normalized_at': time.time()
+    }
+    temp_meta = paths['meta'].with_name(f"{paths['meta'].name}.{tag}.tmp")
+    with open(temp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(temp_meta, paths['meta'])
+    return meta
+
+def ensure_normalized(audio_path):
+    """Metadata of a stored audio file, normalizing it first if needed"""
+    meta = normalized_metadata(audio_path)
+    return meta if meta is not None else normalize_audio_file(audio_path)
+
+def normalize_uploaded_audio(audio_path):
+    """Normalize a file right after upload; on failure the original is used until the indexer retries"""
+    try:
+        return normalize_audio_file(audio_path)
+    except Exception as e:
+        print(f"[NORMALIZE] Could not normalize {audio_path.name}: {e}")
+        return None
+
+def load_normalized_audio(audio_path):
+    """Whisper input for a stored audio file: its FLAC copy when up to date, otherwise the decoded original"""
+    if normalized_metadata(audio_path) is not None:
+        flac_path = normalized_paths(audio_path)['flac']
+        try:
+            import soundfile
+        except ImportError:
+            return decode_audio_bytes(flac_path.read_bytes(), '.flac')
+        audio, _ = soundfile.read(str(flac_path), dtype='float32')
+        return audio
+    return decode_audio_bytes(audio_path.read_bytes(), audio_path.suffix)
+
+def playback_audio_path(audio_path):
+    """The file to send to the browser: the Opus copy when up to date, otherwise the original"""
+    if normalized_metadata(audio_path) is not None:
+        return normalized_paths(audio_path)['playback']
+    return audio_path
+
+def send_stored_audio(audio_path):
+    """Serve a stored prompt audio file (?original=1 for the file as uploaded)"""
+    if request.args.get('original') == '1':
+        return send_file(audio_path)
+    playback_path = playback_audio_path(audio_path)
+    if playback_path != audio_path:
+        return send_file(playback_path, mimetype='audio/webm')
+    return send_file(audio_path)
+
+# ============================================================================
+# Reference transcripts (stored prompt audio is transcribed once, in the background)
+# ============================================================================
+
+REFERENCE_INDEX_FILE = DATA_DIR / 'reference_transcripts.json'
+REFERENCE_AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg', '.webm'}
+
+class ReferenceTranscriptIndex:
+    """
+    Transcripts of the audio files stored with the prompts, keyed by path
+    (relative to DATA_DIR) with the file's mtime, size and content hash.
+    Files whose mtime and size are unchanged are skipped, and a file whose
+    content hash is already indexed reuses that transcript instead of
+    running Whisper again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.errors = {}
+        self.queue = queue.Queue()
+        self.queued = set()
+        self.thread = None
+        self.stats = {'transcribed': 0, 'reused': 0, 'skipped': 0, 'errors': 0}
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading reference transcripts: {e}")
+        return {}
+
+    def _save(self):
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _key(audio_path):
+        return Path(audio_path).relative_to(DATA_DIR).as_posix()
+
+    def start(self, directories):
+        """Queue every audio file in `directories` and start the indexing thread"""
+        for directory in directories:
+            if directory.exists():
+                for audio_path in sorted(directory.iterdir()):
+                    if audio_path.is_file() and audio_path.suffix.lower() in REFERENCE_AUDIO_EXTENSIONS:
+                        self.enqueue(audio_path)
+        # Drop entries whose file was deleted while the app was stopped
+        with self.lock:
+            for key in [key for key in self.entries if not (DATA_DIR / key).exists()]:
+                del self.entries[key]
+
+    def enqueue(self, audio_path):
+        """(Re-)index one file in the background"""
+        key = self._key(audio_path)
+        with self.lock:
+            if key in self.queued:
+                return
+            self.queued.add(key)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='reference-indexer', daemon=True)
+                self.thread.start()
+        self.queue.put(Path(audio_path))
+
+    def _run(self):
+        # Indexing shares the in-process model, so it waits until the model is ready
+        whisper_ready.wait()
+        while True:
+            audio_path = self.queue.get()
+            key = self._key(audio_path)
+            try:
+                self.index_file(audio_path)
+            except FFmpegBusyError as e:
+                # Indexing gives way to the students' requests and tries again later
+                time.sleep(e.retry_after)
+                self.queue.put(audio_path)
+                continue
+            except Exception as e:
+                print(f"[REFERENCE] Error indexing {key}: {e}")
+                with self.lock:
+                    self.errors[key] = str(e)
+                    self.stats['errors'] += 1
+            with self.lock:
+                self.queued.discard(key)
+
+    def index_file(self, audio_path):
+        key = self._key(audio_path)
+        if not audio_path.exists():
+            with self.lock:
+                self.entries.pop(key, None)
+                self._save()
+            return
+
+        # Files stored before normalization existed (or whose upload-time pass failed) are done here
+        try:
+            ensure_normalized(audio_path)
+        except FFmpegBusyError:
+            raise
+        except Exception as e:
+            print(f"[NORMALIZE] Could not normalize {key}: {e}")
+
+        stat = audio_path.stat()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            self.stats['skipped'] += 1
+            return
+
+        audio_bytes = audio_path.read_bytes()
+        digest = hashlib.sha256(audio_bytes).hexdigest()
+        with self.lock:
+            known = next((other for other in self.entries.values() if other['sha256'] == digest), None)
+
+        if known is not None:
+            transcript, word_count = known['transcript'], known['word_count']
+            self.stats['reused'] += 1
+        else:
+            start = time.time()
+            _, profile = resolve_whisper_profile(task='reference')
+            audio = load_normalized_audio(audio_path)
+            result, _ = transcribe_speech(audio, vad_settings(), lambda speech: transcribe_audio(speech, profile))
+            transcript, word_count = format_transcript(result)
+            self.stats['transcribed'] += 1
+            print(f"[REFERENCE] Indexed {key} in {time.time() - start:.1f}s")
+
+        with self.lock:
+            self.entries[key] = {
+                'sha256': digest,
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'transcript': transcript,
+                'word_count': word_count,
+                'indexed_at': time.time()
+            }
+            self.errors.pop(key, None)
+            self._save()
+
+    def lookup(self, audio_path):
+        """Reference transcript of a file: {'status': 'ready', 'transcript', 'word_count'} or the indexing status"""
+        key = self._key(audio_path)
+        if not audio_path.exists():
+            return {'status': 'missing'}
+        with self.lock:
+            entry = self.entries.get(key)
+            if key in self.errors:
+                return {'status': 'error', 'error': self.errors[key]}
+            if entry is None or key in self.queued:
+                return {'status': 'pending'}
+            return {'status': 'ready', 'transcript': entry['transcript'], 'word_count': entry['word_count']}
+
+reference_index = ReferenceTranscriptIndex(REFERENCE_INDEX_FILE)
+
+def reference_audio_dirs():
+    """Directories of the listening material that gets indexed (Tasks 2-5)"""
+    return [get_audio_dir(task_num) for task_num in (2, 3, 4, 5)]
+
+def add_reference_transcripts(task_num, prompts):
+    """Attach the indexed transcript of each prompt's audio file as 'reference_transcript'"""
+    audio_dir = get_audio_dir(task_num)
+    for prompt in prompts:
+        if audio_dir and prompt.get('audio_file'):
+            prompt['reference_transcript'] = reference_index.lookup(audio_dir / prompt['audio_file'])
+    return prompts
+
+def prompt_reference_transcript(task_num, prompt_id):
+    """Transcript of a prompt's audio if it is already indexed, '' otherwise (never transcribes)"""
+    audio_dir = get_audio_dir(task_num)
+    if not audio_dir or prompt_id is None:
+        return ''
+    for prompt in load_task_prompts(task_num).get('prompts', []):
+        if prompt['id'] == prompt_id and prompt.get('audio_file'):
+            reference = reference_index.lookup(audio_dir / prompt['audio_file'])
+            return reference.get('transcript', '')
+    return ''
+
+if is_serving_process():
+    reference_index.start(reference_audio_dirs())
+
+# ============================================================================
+# OpenAI clients (one pooled client per API key, connections kept alive)
+# ============================================================================
+
+DEFAULT_OPENAI_TIMEOUT_SECONDS = 60
+DEFAULT_OPENAI_CONNECT_TIMEOUT_SECONDS = 10
+DEFAULT_OPENAI_MAX_CLIENTS = 32
+DEFAULT_OPENAI_IDLE_SECONDS = 15 * 60
+OPENAI_KEEPALIVE_SECONDS = 120
+OPENAI_MAX_CONNECTIONS_PER_CLIENT = 10
+
+class OpenAIClientPool:
+    """
+    One OpenAI client per API key, so that its HTTP connection pool (and the
+    TLS sessions in it) survives from one evaluation to the next. Beyond
+    `openai_max_clients` keys the least recently used client is dropped, and
+    clients unused for `openai_idle_seconds` are closed. Keys are stored as
+    SHA-256 digests.
+    """
+
+    def __init__(self):
+        self.clients = OrderedDict()  # key digest -> {'client', 'last_used'}
+        self.lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0, 'evicted': 0, 'requests': 0, 'new_connections': 0}
+
+    def _trace(self, event, info):
+        # Emitted once per TCP connection opened; requests without it reused a kept-alive one
+        if event == 'connection.connect_tcp.complete':
+            with self.lock:
+                self.stats['new_connections'] += 1
+
+    def _on_request(self, request):
+        request.extensions['trace'] = self._trace
+        with self.lock:
+            self.stats['requests'] += 1
+
+    def _create(self, api_key, config):
+        # Timeout and Limits come through the openai package: httpx is its dependency, not ours
+        from openai import OpenAI, DefaultHttpxClient, Timeout, DEFAULT_CONNECTION_LIMITS
+
+        timeout = Timeout(
+            float(config.get('openai_timeout_seconds', DEFAULT_OPENAI_TIMEOUT_SECONDS)),
+            connect=float(config.get('openai_connect_timeout_seconds', DEFAULT_OPENAI_CONNECT_TIMEOUT_SECONDS))
+        )
+        http_client = DefaultHttpxClient(
+            timeout=timeout,
+            limits=type(DEFAULT_CONNECTION_LIMITS)(
+                max_connections=OPENAI_MAX_CONNECTIONS_PER_CLIENT,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS_PER_CLIENT,
+                keepalive_expiry=OPENAI_KEEPALIVE_SECONDS
+            ),
+            event_hooks={'request': [self._on_request]}
+        )
+        # 'openai_base_url' points the app at another OpenAI-compatible server (e.g. bench/stand_ins.py);
+        # retries are left to openai_calls, which shares one deadline between them
+        return OpenAI(api_key=api_key, base_url=config.get('openai_base_url') or None,
+                      timeout=timeout, http_client=http_client, max_retries=0)
+
+    def _evict(self, config, now):
+        idle_limit = float(config.get('openai_idle_seconds', DEFAULT_OPENAI_IDLE_SECONDS))
+        max_clients = max(1, int(config.get('openai_max_clients', DEFAULT_OPENAI_MAX_CLIENTS)))
+        for digest in [digest for digest, entry in self.clients.items() if now - entry['last_used'] > idle_limit]:
+            self.clients.pop(digest)['client'].close()
+            self.stats['evicted'] += 1
+        while len(self.clients) > max_clients:
+            # Not closed here: another request may still be using it; it is closed once garbage collected
+            self.clients.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def get(self, api_key):
+        """The client for this API key, created on first use"""
+        config = load_config()
+        digest = hashlib.sha256(f"{config.get('openai_base_url') or ''}\n{api_key}".encode()).hexdigest()
+        now = time.time()
+        with self.lock:
+            self._evict(config, now)
+            entry = self.clients.get(digest)
+            if entry is not None:
+                self.clients.move_to_end(digest)
+                self.stats['reused'] += 1
+            else:
+                entry = self.clients[digest] = {'client': self._create(api_key, config), 'last_used': now}
+                self.stats['created'] += 1
+                self._evict(config, now)
+            entry['last_used'] = now
+            return entry['client']
+
+    def snapshot(self):
+        with self.lock:
+            requests = self.stats['requests']
+            reused_connections = max(0, requests - self.stats['new_connections'])
+            return dict(self.stats, clients=len(self.clients), reused_connections=reused_connections,
+                        connection_reuse_rate=round(reused_connections / requests, 3) if requests else None)
+
+openai_clients = OpenAIClientPool()
+
+# ============================================================================
+# OpenAI calls (deadline, jittered retries, optional hedging, circuit breaker)
+# ============================================================================
+
+DEFAULT_OPENAI_DEADLINE_SECONDS = 90
+DEFAULT_OPENAI_MAX_RETRIES = 2
+DEFAULT_OPENAI_HEDGE_DELAY_SECONDS = 10  # Until enough latencies were measured for a p95
+DEFAULT_OPENAI_BREAKER_THRESHOLD = 5
+DEFAULT_OPENAI_BREAKER_RESET_SECONDS = 30
+OPENAI_RETRY_BASE_SECONDS = 0.5
+OPENAI_RETRY_MAX_SECONDS = 8
+OPENAI_HEDGE_MIN_SAMPLES = 20
+OPENAI_LATENCY_WINDOW = 200
+
+class OpenAIUnavailableError(Exception):
+    """The circuit breaker is open: OpenAI calls fail fast (routes answer 503 with Retry-After)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures of the upstream (timeouts,
+    connection errors, 5xx). While open, calls are rejected at once; after
+    `reset_seconds` one trial call is let through and its outcome closes or
+    reopens the breaker.
+    """
+
+    def __init__(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+
+    def allow(self, reset_seconds, now):
+        """None if a call may go ahead, else the seconds until the next trial"""
+        if self.state == 'closed':
+            return None
+        if self.state == 'open' and now - self.opened_at >= reset_seconds:
+            self.state = 'half-open'
+        if self.state == 'half-open' and not self.trial_running:
+            self.trial_running = True
+            return None
+        return max(1, int(reset_seconds - (now - self.opened_at)) + 1)
+
+    def success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.trial_running = False
+
+    def failure(self, threshold, now):
+        """Record a failure; True if it opened the breaker"""
+        self.failures += 1
+        self.trial_running = False
+        if self.state == 'half-open' or (self.state == 'closed' and self.failures >= threshold):
+            self.state = 'open'
+            self.opened_at = now
+            return True
+        return False
+
+class OpenAICalls:
+    """
+    Every chat completion goes through here. A call has a deadline
+    (`openai_deadline_seconds`) shared by all its attempts; transient errors
+    (timeouts, connection errors, 429, 5xx) are retried with jittered
+    exponential backoff, or after Retry-After. With `openai_hedge`, a second
+    identical request is sent when the first has not answered after the p95
+    latency, and the first response wins. A circuit breaker per upstream
+    makes calls fail fast while it is degraded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.breakers = {}  # base URL -> CircuitBreaker
+        self.latencies = {False: deque(maxlen=OPENAI_LATENCY_WINDOW), True: deque(maxlen=OPENAI_LATENCY_WINDOW)}
+        self.executor = None
+        self.stats = {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+            'failures': 0, 'deadline_exceeded': 0, 'rejected': 0, 'breaker_opened': 0
+        }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def _breaker(self, upstream):
+        with self.lock:
+            return self.breakers.setdefault(upstream, CircuitBreaker())
+
+    def _hedge_delay(self, stream):
+        with self.lock:
+            samples = sorted(self.latencies[stream])
+        if len(samples) < OPENAI_HEDGE_MIN_SAMPLES:
+            return DEFAULT_OPENAI_HEDGE_DELAY_SECONDS
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='openai-hedge')
+            return self.executor
+
+    @staticmethod
+    def _is_upstream_failure(error):
+        # Timeouts (APITimeoutError is an APIConnectionError), connection errors and 5xx answers
+        import openai
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    @classmethod
+    def _is_retryable(cls, error):
+        import openai
+        if cls._is_upstream_failure(error):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code == 429
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, 'response', None)
+        try:
+            return float(response.headers.get('retry-after')) if response is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _discard(future):
+        # The hedged request that lost: a stream it opened is closed, a plain response dropped
+        if not future.cancelled() and future.exception() is None and hasattr(future.result(), 'close'):
+            future.result().close()
+
+    def _attempt(self, client, request, timeout, hedge_delay):
+        """One attempt, duplicated after hedge_delay seconds if hedging is on"""
+        if hedge_delay is None:
+            return client.chat.completions.create(timeout=timeout, **request)
+
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        executor = self._get_executor()
+        primary = executor.submit(client.chat.completions.create, timeout=timeout, **request)
+        pending = {primary}
+        done, _ = wait(pending, timeout=hedge_delay)
+        if not done:
+            self.count('hedges')
+            print(f"[OPENAI] No answer after {hedge_delay:.1f}s, sending a hedged request")
+            pending.add(executor.submit(client.chat.completions.create, timeout=timeout, **request))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.count('hedge_wins')
+                    for loser in pending:
+                        loser.add_done_callback(self._discard)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def completion(self, api_key, deadline=None, **request):
+        """
+        client.chat.completions.create(**request) for this API key, within
+        `deadline` (a time.monotonic() value; default: openai_deadline_seconds
+        from now). Returns the response, or the stream when request['stream'].
+        """
+        from openai import Timeout
+
+        config = load_config()
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.deadline_seconds(config)
+        max_retries = max(0, int(config.get('openai_max_retries', DEFAULT_OPENAI_MAX_RETRIES)))
+        threshold = max(1, int(config.get('openai_breaker_threshold', DEFAULT_OPENAI_BREAKER_THRESHOLD)))
+        reset_seconds = float(config.get('openai_breaker_reset_seconds', DEFAULT_OPENAI_BREAKER_RESET_SECONDS))
+        read_timeout = float(config.get('openai_timeout_seconds', DEFAULT_OPENAI_TIMEOUT_SECONDS))
+        connect_timeout = float(config.get('openai_connect_timeout_seconds', DEFAULT_OPENAI_CONNECT_TIMEOUT_SECONDS))
+        stream = bool(request.get('stream'))
+        upstream = config.get('openai_base_url') or 'https://api.openai.com/v1'
+        breaker = self._breaker(upstream)
+        client = openai_clients.get(api_key)
+        self.count('calls')
+
+        attempt = 0
+        while True:
+            with self.lock:
+                wait_seconds = breaker.allow(reset_seconds, time.time())
+            if wait_seconds is not None:
+                self.count('rejected')
+                raise OpenAIUnavailableError(
+                    f'The AI evaluation service is unavailable, please try again in {wait_seconds}s', wait_seconds
+                )
+
+            remaining = deadline - time.monotonic()
+            timeout = Timeout(max(0.1, min(read_timeout, remaining)), connect=max(0.1, min(connect_timeout, remaining)))
+            hedge_delay = self._hedge_delay(stream) if config.get('openai_hedge') else None
+            started = time.monotonic()
+            self.count('attempts')
+            try:
+                response = self._attempt(client, request, timeout, hedge_delay)
+            except Exception as e:
+                with self.lock:
+                    if self._is_upstream_failure(e):
+                        opened = breaker.failure(threshold, time.time())
+                    else:
+                        # The upstream answered (e.g. 400, 401, 429): it is not degraded
+                        breaker.success()
+                        opened = False
+                if opened:
+                    self.count('breaker_opened')
+                    print(f"[OPENAI] Circuit breaker opened for {upstream} after {breaker.failures} consecutive failure(s)")
+
+                delay = random.uniform(0, min(OPENAI_RETRY_MAX_SECONDS, OPENAI_RETRY_BASE_SECONDS * 2 ** attempt))
+                retry_after = self._retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if not self._is_retryable(e) or attempt >= max_retries:
+                    self.count('failures')
+                    raise
+                if time.monotonic() + delay >= deadline:
+                    self.count('failures')
+                    self.count('deadline_exceeded')
+                    print(f"[OPENAI] Deadline reached, giving up after {attempt + 1} attempt(s): {e}")
+                    raise
+                attempt += 1
+                self.count('retries')
+                print(f"[OPENAI] Retry {attempt}/{max_retries} in {delay:.1f}s after: {e}")
+                time.sleep(delay)
+                continue
+
+            with self.lock:
+                breaker.success()
+                self.latencies[stream].append(time.monotonic() - started)
+            return response
+
+    @staticmethod
+    def deadline_seconds(config=None):
+        config = load_config() if config is None else config
+        return float(config.get('openai_deadline_seconds', DEFAULT_OPENAI_DEADLINE_SECONDS))
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            breakers = {upstream: breaker.state for upstream, breaker in self.breakers.items()}
+            latencies = {'completion': sorted(self.latencies[False]), 'stream': sorted(self.latencies[True])}
+        for kind, samples in latencies.items():
+            stats[f'{kind}_latency_p50'] = round(samples[len(samples) // 2], 3) if samples else None
+            stats[f'{kind}_latency_p95'] = round(samples[max(0, int(len(samples) * 0.95) - 1)], 3) if samples else None
+        stats['breakers'] = breakers
+        return stats
+
+openai_calls = OpenAICalls()
+
+def openai_unavailable_response(error):
+    """503 response returned while the circuit breaker is open"""
+    response = jsonify({'error': str(error), 'status': 'unavailable'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+# ============================================================================
+# Rate limiting (token buckets and calls in flight, per API key and overall)
+# ============================================================================
+
+DEFAULT_RATE_LIMIT_PER_MINUTE = 30
+DEFAULT_RATE_LIMIT_BURST = 10
+DEFAULT_RATE_LIMIT_CONCURRENCY = 8
+DEFAULT_RATE_LIMIT_GLOBAL_PER_MINUTE = 120
+DEFAULT_RATE_LIMIT_GLOBAL_BURST = 30
+DEFAULT_RATE_LIMIT_GLOBAL_CONCURRENCY = 16
+DEFAULT_RATE_LIMIT_MAX_WAIT_SECONDS = 10
+RATE_LIMIT_MAX_KEYS = 1000  # Idle keys are forgotten beyond this
+RATE_LIMIT_WAIT_WINDOW = 200
+
+class RateLimitedError(Exception):
+    """An API key or the whole server is over its limits (routes answer 429 with Retry-After)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Requests per minute with bursts (a limit of 0 disables it), and the calls in flight"""
+
+    def __init__(self, now):
+        self.tokens = None  # Full until first refilled
+        self.updated = now
+        self.in_flight = 0
+        self.waiting = 0
+
+    def refill(self, per_minute, burst, now):
+        if self.tokens is None:
+            self.tokens = burst
+        self.tokens = min(burst, self.tokens + (now - self.updated) * per_minute / 60)
+        self.updated = now
+
+    def delay(self, per_minute, burst, concurrency, now):
+        """0 if a call may start now, else the seconds until it may (None: when a call in flight ends)"""
+        if concurrency and self.in_flight >= concurrency:
+            return None
+        if not per_minute:
+            return 0
+        self.refill(per_minute, burst, now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) * 60 / per_minute
+
+    def take(self, per_minute):
+        if per_minute:
+            self.tokens -= 1
+        self.in_flight += 1
+
+    def idle(self, per_minute, burst, now):
+        if self.in_flight or self.waiting:
+            return False
+        if per_minute:
+            self.refill(per_minute, burst, now)
+            return self.tokens >= burst
+        return True
+
+class RateLimitSlot:
+    """An admitted call; release() (or the end of a with block) frees its place in flight"""
+
+    def __init__(self, limiter, bucket):
+        self.limiter = limiter
+        self.bucket = bucket
+        self.released = False
+
+    def release(self):
+        self.limiter._release(self)
+
+    def __enter__(self):
+        return self
 
-        if 0 <= index < len(cards):
-            cards.pop(index)
-            if save_vocabulary_cards(cards):
-                return jsonify({'success': True, 'message': 'Card deleted!'})
-            else:
-                return jsonify({'success': False, 'error': 'Failed to save'}), 500
-        else:
-            return jsonify({'error': 'Invalid index'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    def __exit__(self, *exc_info):
+        self.release()
 
-@app.route('/create_audio', methods=['POST'])
-def create_audio():
-    """Create audio from text using gTTS"""
-    try:
-        data = request.get_json()
-        text = data.get('text', '')
+class RateLimiter:
+    """
+    Admission of LLM calls: a token bucket and a limit of calls in flight
+    per API key (kept as a hash) and for the whole server. A call over a
+    limit waits up to `rate_limit_max_wait_seconds` (or its deadline) for
+    its turn; when it is known to need longer it is rejected at once with
+    the time after which it would pass.
+    """
 
-        if not text:
-            return jsonify({'error': 'No text provided'}), 400
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)
+        self.buckets = {}  # API key hash -> TokenBucket
+        self.overall = TokenBucket(time.monotonic())
+        self.waits = deque(maxlen=RATE_LIMIT_WAIT_WINDOW)
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'rejected_overall': 0, 'wait_seconds': 0.0}
+
+    @staticmethod
+    def _limits(config):
+        def limit(name, default):
+            return max(0.0, float(config.get(name, default)))
+
+        per_key = (
+            limit('rate_limit_per_minute', DEFAULT_RATE_LIMIT_PER_MINUTE),
+            max(1.0, limit('rate_limit_burst', DEFAULT_RATE_LIMIT_BURST)),
+            int(limit('rate_limit_concurrency', DEFAULT_RATE_LIMIT_CONCURRENCY))
+        )
+        overall = (
+            limit('rate_limit_global_per_minute', DEFAULT_RATE_LIMIT_GLOBAL_PER_MINUTE),
+            max(1.0, limit('rate_limit_global_burst', DEFAULT_RATE_LIMIT_GLOBAL_BURST)),
+            int(limit('rate_limit_global_concurrency', DEFAULT_RATE_LIMIT_GLOBAL_CONCURRENCY))
+        )
+        return per_key, overall, limit('rate_limit_max_wait_seconds', DEFAULT_RATE_LIMIT_MAX_WAIT_SECONDS)
+
+    def _bucket(self, key, per_key, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= RATE_LIMIT_MAX_KEYS:
+                for idle_key in [k for k, b in self.buckets.items() if b.idle(per_key[0], per_key[1], now)]:
+                    del self.buckets[idle_key]
+            bucket = self.buckets[key] = TokenBucket(now)
+        return bucket
+
+    def acquire(self, api_key, deadline=None):
+        """
+        A RateLimitSlot for one call with this API key, to release when the
+        call is over. Raises RateLimitedError if it cannot start in time.
+        """
+        per_key, overall, max_wait = self._limits(load_config())
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        started = time.monotonic()
+        give_up = started + max_wait if deadline is None else min(started + max_wait, deadline)
+
+        with self.lock:
+            bucket = self._bucket(key, per_key, started)
+            bucket.waiting += 1
+            queued = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    key_delay = bucket.delay(*per_key, now)
+                    overall_delay = self.overall.delay(*overall, now)
+                    if key_delay == 0 and overall_delay == 0:
+                        bucket.take(per_key[0])
+                        self.overall.take(overall[0])
+                        waited = now - started
+                        self.stats['admitted'] += 1
+                        self.stats['wait_seconds'] += waited
+                        self.waits.append(waited)
+                        return RateLimitSlot(self, bucket)
+
+                    delay = None if None in (key_delay, overall_delay) else max(key_delay, overall_delay)
+                    if now >= give_up or (delay is not None and now + delay > give_up):
+                        self.stats['rejected'] += 1
+                        retry_after = max(1, math.ceil(delay or 1))
+                        if key_delay == 0:
+                            self.stats['rejected_overall'] += 1
+                            raise RateLimitedError(
+                                f'The server is busy with other evaluations, please try again in {retry_after}s', retry_after
+                            )
+                        raise RateLimitedError(
+                            f'Too many evaluations for this API key, please try again in {retry_after}s', retry_after
+                        )
+
+                    if not queued:
+                        queued = True
+                        self.stats['queued'] += 1
+                    # Woken when a call in flight ends; tokens are refilled on a timer
+                    self.released.wait(give_up - now if delay is None else min(delay, give_up - now))
+            finally:
+                bucket.waiting -= 1
+
+    def _release(self, slot):
+        with self.lock:
+            if slot.released:
+                return
+            slot.released = True
+            slot.bucket.in_flight -= 1
+            self.overall.in_flight -= 1
+            self.released.notify_all()
+
+    def snapshot(self):
+        per_key, overall, _ = self._limits(load_config())
+        now = time.monotonic()
+        with self.lock:
+            stats = dict(self.stats, wait_seconds=round(self.stats['wait_seconds'], 3))
+            waits = sorted(self.waits)
+            if overall[0]:
+                self.overall.refill(overall[0], overall[1], now)
+            stats['in_flight'] = self.overall.in_flight
+            stats['waiting'] = sum(bucket.waiting for bucket in self.buckets.values())
+            stats['tokens'] = round(self.overall.tokens, 1) if overall[0] else None
+            stats['keys'] = len(self.buckets)
+            active = {}
+            for key, bucket in self.buckets.items():
+                if bucket.in_flight or bucket.waiting:
+                    if per_key[0]:
+                        bucket.refill(per_key[0], per_key[1], now)
+                    active[key[:8]] = {
+                        'in_flight': bucket.in_flight,
+                        'waiting': bucket.waiting,
+                        'tokens': round(bucket.tokens, 1) if per_key[0] else None
+                    }
+        stats['wait_p50'] = round(waits[len(waits) // 2], 3) if waits else None
+        stats['wait_p95'] = round(waits[max(0, int(len(waits) * 0.95) - 1)], 3) if waits else None
+        stats['active_keys'] = active
+        return stats
+
+rate_limiter = RateLimiter()
+
+def rate_limited_response(error):
+    """429 response for a call over the rate limits"""
+    response = jsonify({'error': str(error), 'status': 'rate_limited'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
 
-        # Create audio
-        tts = gTTS(text=text, lang='en')
-        mp3_fp = io.BytesIO()
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
+# ============================================================================
+# Evaluation cache (persistent, keyed by prompt + model settings, single-flight)
+# ============================================================================
 
-        # Convert to base64
-        audio_b64 = base64.b64encode(mp3_fp.read()).decode()
+EVALUATION_CACHE_FILE = DATA_DIR / 'evaluation_cache.db'
+DEFAULT_EVALUATION_CACHE_MAX_ENTRIES = 500
+DEFAULT_EVALUATION_CACHE_TTL_HOURS = 7 * 24
 
-        return jsonify({'audio': audio_b64})
+class EvaluationCache:
+    """
+    SQLite-backed LRU cache of AI feedback. Entries expire after
+    `evaluation_cache_ttl_hours`. While an evaluation is running, identical
+    requests wait for its result instead of calling OpenAI again.
+    """
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    def __init__(self, path, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> Future of the running evaluation
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.expired = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS evaluations ('
+            'key TEXT PRIMARY KEY, feedback TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)')
+        self.connection.commit()
+
+    def _get(self, key):
+        now = time.time()
+        row = self.connection.execute('SELECT feedback, created FROM evaluations WHERE key = ?', (key,)).fetchone()
+        if row is not None and now - row[1] > self.ttl_seconds:
+            self.connection.execute('DELETE FROM evaluations WHERE key = ?', (key,))
+            self.connection.commit()
+            self.expired += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE evaluations SET last_used = ? WHERE key = ?', (now, key))
+        self.connection.commit()
+        return row[0]
+
+    def _put(self, key, feedback):
+        now = time.time()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO evaluations (key, feedback, created, last_used) VALUES (?, ?, ?, ?)',
+            (key, feedback, now, now)
+        )
+        self.expired += self.connection.execute(
+            'DELETE FROM evaluations WHERE created < ?', (now - self.ttl_seconds,)
+        ).rowcount
+        # Evict the least recently used entries beyond the size bound
+        count = self.connection.execute('SELECT COUNT(*) FROM evaluations').fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries
+            self.connection.execute(
+                'DELETE FROM evaluations WHERE key IN '
+                '(SELECT key FROM evaluations ORDER BY last_used ASC LIMIT ?)', (excess,)
+            )
+            self.evictions += excess
+        self.connection.commit()
+
+    def claim(self, key):
+        """
+        Return (feedback, future): the cached feedback, or the future of the
+        identical evaluation already running, or (None, None) when the caller
+        has to run it and then call resolve() or reject()
+        """
+        from concurrent.futures import Future
+
+        with self.lock:
+            feedback = self._get(key)
+            if feedback is not None:
+                return feedback, None
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                return None, future
+            self.in_flight[key] = Future()
+            return None, None
+
+    def resolve(self, key, feedback):
+        with self.lock:
+            self._put(key, feedback)
+            future = self.in_flight.pop(key)
+        future.set_result(feedback)
+
+    def reject(self, key, error):
+        with self.lock:
+            future = self.in_flight.pop(key)
+        future.set_exception(error)
+
+    def get_or_compute(self, key, compute):
+        """The cached feedback, or compute() run once for all concurrent callers"""
+        feedback, future = self.claim(key)
+        if feedback is not None:
+            return feedback
+        if future is not None:
+            return future.result()
+        try:
+            feedback = compute()
+        except Exception as e:
+            self.reject(key, e)
+            raise
+        self.resolve(key, feedback)
+        return feedback
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM evaluations').fetchone()[0]
+            in_flight = len(self.in_flight)
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_hours': round(self.ttl_seconds / 3600, 1),
+            'in_flight': in_flight,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
 
-@app.route('/transcribe', methods=['POST'])
-def transcribe():
-    """Transcribe audio using Whisper"""
-    try:
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
+evaluation_cache = None
+_evaluation_cache_lock = threading.Lock()
+
+def get_evaluation_cache():
+    """Open the cache on first use; None when 'evaluation_cache_max_entries' is 0"""
+    global evaluation_cache
+    with _evaluation_cache_lock:
+        if evaluation_cache is None:
+            config = load_config()
+            max_entries = int(config.get('evaluation_cache_max_entries', DEFAULT_EVALUATION_CACHE_MAX_ENTRIES))
+            if max_entries <= 0:
+                return None
+            ttl_hours = float(config.get('evaluation_cache_ttl_hours', DEFAULT_EVALUATION_CACHE_TTL_HOURS))
+            evaluation_cache = EvaluationCache(EVALUATION_CACHE_FILE, max_entries, ttl_hours * 3600)
+        return evaluation_cache
 
-        audio_file = request.files['audio']
+# ============================================================================
+# Vocabulary suggestion index (terms already covered by the vocabulary cards)
+# ============================================================================
+
+VOCABULARY_INDEX_FILE = DATA_DIR / 'vocabulary_index.json'
+VOCABULARY_INDEX_RANKED = 100  # Length of the ranking kept ready for the prompts
+VOCABULARY_CONTEXT_TERMS = 15
+SUGGESTION_PATTERN = re.compile(r'Instead of ["\']([^"\']+)["\']')
+
+def card_suggestions(card):
+    """The terms a card proposes alternatives for ('Instead of "x", suggest: ...'), once each"""
+    terms = []
+    for match in SUGGESTION_PATTERN.findall(card.get('content') or ''):
+        term = ' '.join(match.split()).lower()
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+class VocabularySuggestionIndex:
+    """
+    How many vocabulary cards suggested alternatives for each term, and how
+    recently. The vocabulary API updates it card by card, so evaluations read
+    a ranking kept ready (most cards first, then most recent) instead of
+    parsing every card. The cards file's mtime and size are stored with it:
+    when the file was changed some other way, the index is rebuilt.
+    """
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_audio:
-            audio_file.save(temp_audio.name)
-            temp_path = temp_audio.name
+    def __init__(self, path, cards_path):
+        self.path = path
+        self.cards_path = cards_path
+        self.lock = threading.Lock()
+        self.terms = {}       # term -> {'count': cards suggesting it, 'last_seen': clock of the latest}
+        self.card_terms = []  # Terms of each card, in the order of the cards file
+        self.clock = 0
+        self.source = None
+        self.ranked = []
+        self.loaded = False
+        self.stats = {'added': 0, 'updated': 0, 'removed': 0, 'rebuilds': 0}
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading vocabulary index: {e}")
+        return {}
+
+    def _save(self):
+        state = {
+            'source': self.source,
+            'clock': self.clock,
+            'terms': self.terms,
+            'cards': self.card_terms
+        }
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
 
-        # Check file size
-        file_size = os.path.getsize(temp_path)
-        print(f"[TRANSCRIBE] Received audio file: {file_size} bytes")
+    def _source(self):
+        try:
+            stat = self.cards_path.stat()
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _add(self, terms):
+        self.clock += 1
+        for term in terms:
+            entry = self.terms.setdefault(term, {'count': 0, 'last_seen': 0})
+            entry['count'] += 1
+            entry['last_seen'] = self.clock
+        return terms
+
+    def _remove(self, terms):
+        for term in terms:
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            entry['count'] -= 1
+            if entry['count'] <= 0:
+                del self.terms[term]
+
+    def _rank(self):
+        self.ranked = heapq.nsmallest(
+            VOCABULARY_INDEX_RANKED, self.terms,
+            key=lambda term: (-self.terms[term]['count'], -self.terms[term]['last_seen'])
+        )
 
-        if file_size < 1000:  # Less than 1KB is probably empty
-            print(f"[TRANSCRIBE] WARNING: Audio file is suspiciously small!")
+    def _rebuild(self, cards):
+        self.terms = {}
+        self.clock = 0
+        self.card_terms = [self._add(card_suggestions(card)) for card in cards]
+        self.stats['rebuilds'] += 1
 
+    def _commit(self):
+        self.source = self._source()
+        self._rank()
         try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
-                result = whisper_model.transcribe(
-                    temp_path,
-                    verbose=False,
-                    language="en",
-                    task="transcribe"
-                )
+            self._save()
+        except Exception as e:
+            print(f"Error saving vocabulary index: {e}")
+
+    def _sync(self):
+        """Load the stored index, or rebuild it if the cards file no longer matches"""
+        if self.loaded and self.source == self._source():
+            return
+        if not self.loaded:
+            state = self._load()
+            if state and state.get('source') == self._source():
+                self.source = state['source']
+                self.clock = state.get('clock', 0)
+                self.terms = state.get('terms', {})
+                self.card_terms = state.get('cards', [])
+                self.loaded = True
+                self._rank()
+                return
+        self._rebuild(load_vocabulary_cards())
+        self.loaded = True
+        self._commit()
+
+    def _apply(self, cards, previous_count, change):
+        """Apply a change just saved by the vocabulary API; `cards` is the saved list"""
+        with self.lock:
+            # Before the first read, or if cards were changed elsewhere, the saved list is the reference
+            if self.loaded and len(self.card_terms) == previous_count:
+                change()
+            else:
+                self._rebuild(cards)
+                self.loaded = True
+            self._commit()
+
+    def card_added(self, cards):
+        """The last card of `cards` was just appended"""
+        def change():
+            self.card_terms.append(self._add(card_suggestions(cards[-1])))
+            self.stats['added'] += 1
+        self._apply(cards, len(cards) - 1, change)
+
+    def card_updated(self, cards, index):
+        """The card at `index` of `cards` was just edited"""
+        def change():
+            self._remove(self.card_terms[index])
+            self.card_terms[index] = self._add(card_suggestions(cards[index]))
+            self.stats['updated'] += 1
+        self._apply(cards, len(cards), change)
+
+    def card_removed(self, cards, index):
+        """The card at `index` was just deleted from `cards`"""
+        def change():
+            self._remove(self.card_terms.pop(index))
+            self.stats['removed'] += 1
+        self._apply(cards, len(cards) + 1, change)
+
+    def top(self, limit=VOCABULARY_CONTEXT_TERMS):
+        """The terms suggested most often (most recently among equals)"""
+        try:
+            with self.lock:
+                self._sync()
+                return self.ranked[:limit]
+        except Exception as e:
+            print(f"Error reading vocabulary index: {e}")
+            return []
 
-            print(f"[TRANSCRIBE] Whisper result: {len(result.get('segments', []))} segments")
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, terms=len(self.terms), cards=len(self.card_terms))
 
-            formatted_transcript = ""
-            word_count = 0
+vocabulary_index = VocabularySuggestionIndex(VOCABULARY_INDEX_FILE, VOCABULARY_FILE)
 
-            for segment in result["segments"]:
-                start_time = segment["start"]
-                text = segment["text"].strip()
-                word_count += len(text.split())
-                formatted_transcript += f"[{start_time:.1f}s] {text}\n"
+# ============================================================================
+# AI feedback (chat completion, returned whole or streamed as server-sent events)
+# ============================================================================
 
-            return jsonify({
-                'transcript': formatted_transcript,
-                'word_count': word_count
+EVALUATION_MODEL = "gpt-4o-mini"  # More affordable than gpt-4
+EVALUATION_TEMPERATURE = 0.7
+EVALUATION_MAX_TOKENS = 1500
+
+CODE_FENCE_START_PATTERN = re.compile(r'^```html\s*', re.MULTILINE)
+CODE_FENCE_END_PATTERN = re.compile(r'```\s*$', re.MULTILINE)
+EMOJI_PATTERN = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002702-\U000027B0\U000024C2-\U0001F251]+')
+
+def clean_feedback(feedback):
+    """Remove markdown code blocks and emojis from the model's HTML"""
+    feedback = CODE_FENCE_START_PATTERN.sub('', feedback)
+    feedback = CODE_FENCE_END_PATTERN.sub('', feedback)
+    return EMOJI_PATTERN.sub('', feedback)
+
+# Structured output (evaluation_format "json"): the model fills EVALUATION_SCHEMA,
+# the result is validated and rendered by templates/evaluation_feedback.html
+DEFAULT_EVALUATION_FORMAT = 'html'
+EVALUATION_OVERALL_TITLE = 'Overall Score'
+EVALUATION_VOCABULARY_TITLE = 'Language & Vocabulary'
+EVALUATION_MAX_SCORE = 5
+
+EVALUATION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'score': {'type': 'number'},
+        'percentage': {'type': ['integer', 'null']},
+        'score_explanation': {'type': 'string'},
+        'criteria': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'score': {'type': 'number'},
+                    'comment': {'type': 'string'}
+                },
+                'required': ['name', 'score', 'comment'],
+                'additionalProperties': False
+            }
+        },
+        'sections': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'title': {'type': 'string'},
+                    'paragraphs': {'type': 'array', 'items': {'type': 'string'}},
+                    'items': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['title', 'paragraphs', 'items'],
+                'additionalProperties': False
+            }
+        },
+        'vocabulary': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'instead_of': {'type': 'string'},
+                    'suggestions': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['instead_of', 'suggestions'],
+                'additionalProperties': False
+            }
+        }
+    },
+    'required': ['score', 'percentage', 'score_explanation', 'criteria', 'sections', 'vocabulary'],
+    'additionalProperties': False
+}
+EVALUATION_RESPONSE_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {'name': 'evaluation', 'strict': True, 'schema': EVALUATION_SCHEMA}
+}
+STRUCTURED_EVALUATION_INSTRUCTIONS = """
+
+**Output format:** return the evaluation as JSON matching the `evaluation` schema instead of HTML; the HTML formatting instructions above do not apply.
+- score: the TOEFL score (0-5); percentage: the percentage score (0-100); score_explanation: the brief explanation of both
+- criteria: a score (0-5) and a one-sentence comment for each TOEFL rubric criterion (Delivery or Organization, Language Use, Topic Development)
+- sections: every other section of the structure above, in the same order and with its title, as plain-text paragraphs and/or list items (no HTML, markdown or emojis)
+- vocabulary: each basic or repetitive word or phrase from the response (instead_of) with its 3-5 low-frequency alternatives (suggestions); they are shown under Language & Vocabulary, so do not list them again there"""
+
+structured_evaluation_stats = {'evaluations': 0, 'invalid': 0}
+structured_evaluation_stats_lock = threading.Lock()
+
+def structured_evaluations():
+    """True when evaluations are requested as JSON (config evaluation_format: "json")"""
+    return load_config().get('evaluation_format', DEFAULT_EVALUATION_FORMAT) == 'json'
+
+def structured_messages(messages):
+    """The evaluation prompt, asking for EVALUATION_SCHEMA JSON instead of HTML"""
+    system, user = messages
+    return [
+        {'role': 'system', 'content': system['content'].replace('Return only HTML content', 'Return only JSON')},
+        {'role': 'user', 'content': user['content'] + STRUCTURED_EVALUATION_INSTRUCTIONS}
+    ]
+
+def _evaluation_text(value, field, required=True):
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise ValueError(f"{field} must be a non-empty string")
+    return value.strip()
+
+def _evaluation_texts(value, field):
+    if not isinstance(value, list):
+        raise ValueError(f"{field} must be a list")
+    return [_evaluation_text(text, field) for text in value if not isinstance(text, str) or text.strip()]
+
+def _evaluation_score(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= EVALUATION_MAX_SCORE:
+        raise ValueError(f"{field} must be a number between 0 and {EVALUATION_MAX_SCORE}")
+    return value
+
+def _evaluation_objects(data, field):
+    value = data.get(field)
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise ValueError(f"{field} must be a list of objects")
+    return value
+
+def validate_evaluation(data):
+    """
+    The model's JSON evaluation checked against what EVALUATION_SCHEMA cannot
+    express (score ranges, empty strings, at least one section) and
+    normalized; raises ValueError when it is unusable.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("the evaluation must be a JSON object")
+    percentage = data.get('percentage')
+    if percentage is not None and (isinstance(percentage, bool) or not isinstance(percentage, int) or not 0 <= percentage <= 100):
+        raise ValueError("percentage must be null or an integer between 0 and 100")
+
+    sections = []
+    for section in _evaluation_objects(data, 'sections'):
+        sections.append({
+            'title': _evaluation_text(section.get('title'), 'sections.title'),
+            'paragraphs': _evaluation_texts(section.get('paragraphs'), 'sections.paragraphs'),
+            'items': _evaluation_texts(section.get('items'), 'sections.items')
+        })
+    if not sections:
+        raise ValueError("the evaluation has no sections")
+
+    vocabulary = []
+    for suggestion in _evaluation_objects(data, 'vocabulary'):
+        suggestions = _evaluation_texts(suggestion.get('suggestions'), 'vocabulary.suggestions')
+        if suggestions:
+            vocabulary.append({
+                'instead_of': _evaluation_text(suggestion.get('instead_of'), 'vocabulary.instead_of'),
+                'suggestions': suggestions
             })
 
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return {
+        'score': _evaluation_score(data.get('score'), 'score'),
+        'percentage': percentage,
+        'score_explanation': _evaluation_text(data.get('score_explanation'), 'score_explanation', required=False),
+        'criteria': [
+            {
+                'name': _evaluation_text(criterion.get('name'), 'criteria.name'),
+                'score': _evaluation_score(criterion.get('score'), 'criteria.score'),
+                'comment': _evaluation_text(criterion.get('comment'), 'criteria.comment', required=False)
+            }
+            for criterion in _evaluation_objects(data, 'criteria')
+        ],
+        'sections': sections,
+        'vocabulary': vocabulary
+    }
 
-@app.route('/evaluate', methods=['POST'])
-def evaluate():
-    """Evaluate speaking response using OpenAI GPT"""
+def parse_evaluation(content):
+    """validate_evaluation() of the model's reply, counted in structured_evaluation_stats"""
     try:
-        from openai import OpenAI
+        evaluation = validate_evaluation(json.loads(content))
+    except ValueError as e:
+        with structured_evaluation_stats_lock:
+            structured_evaluation_stats['invalid'] += 1
+        raise ValueError(f"The model returned an invalid evaluation: {e}") from e
+    with structured_evaluation_stats_lock:
+        structured_evaluation_stats['evaluations'] += 1
+    return evaluation
+
+def format_score(score):
+    """A score on the TOEFL scale, e.g. '4/5'"""
+    return f"{score:g}/5"
+
+def score_line(evaluation):
+    """The overall score as the HTML prompts write it: 'Score: X/5 (Y/100)'"""
+    line = f"Score: {format_score(evaluation['score'])}"
+    if evaluation['percentage'] is not None:
+        line += f" ({evaluation['percentage']}/100)"
+    return line
+
+def render_evaluation(evaluation):
+    """
+    The HTML feedback for a validated evaluation, with the <h4> sections the
+    pages expect. Vocabulary suggestions go in the vocabulary section, as
+    'Instead of "x", suggest: ...' so that vocabulary cards can be made from
+    them. Flask compiles the template once and keeps it in its cache.
+    """
+    sections = [dict(section, vocabulary=[]) for section in evaluation['sections']]
+    if evaluation['vocabulary']:
+        target = next((section for section in sections if 'vocabulary' in section['title'].lower()), None)
+        if target is None:
+            target = {'title': EVALUATION_VOCABULARY_TITLE, 'paragraphs': [], 'items': [], 'vocabulary': []}
+            sections.append(target)
+        target['vocabulary'] = evaluation['vocabulary']
+    return app.jinja_env.get_template('evaluation_feedback.html').render(
+        overall_title=EVALUATION_OVERALL_TITLE,
+        score_line=score_line(evaluation),
+        evaluation=evaluation,
+        sections=sections,
+        format_score=format_score
+    )
+
+def evaluation_cache_key(messages, response_format=None):
+    """Hash of the complete prompt plus the settings it is sent with"""
+    request = {
+        'model': EVALUATION_MODEL,
+        'temperature': EVALUATION_TEMPERATURE,
+        'max_tokens': EVALUATION_MAX_TOKENS,
+        'messages': messages
+    }
+    if response_format is not None:
+        request['response_format'] = response_format
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
 
-        data = request.get_json()
-        api_key = data.get('api_key', '')
-        question = data.get('question', '')
-        transcript = data.get('transcript', '')
-        word_count = data.get('word_count', 0)
-        speaking_time = data.get('speaking_time', 45)
+def request_evaluation(api_key, messages, response_format=None):
+    """
+    Ask the model for the feedback, in one piece: the cleaned HTML, or with
+    a response_format the validated evaluation as JSON text
+    """
+    request = {
+        'model': EVALUATION_MODEL,
+        'messages': messages,
+        'temperature': EVALUATION_TEMPERATURE,
+        'max_tokens': EVALUATION_MAX_TOKENS
+    }
+    if response_format is not None:
+        request['response_format'] = response_format
+    with rate_limiter.acquire(api_key):
+        response = openai_calls.completion(api_key, **request)
+    content = response.choices[0].message.content
+    if response_format is None:
+        return clean_feedback(content)
+    return json.dumps(parse_evaluation(content))
+
+def evaluation_result(value, structured):
+    """The response body for a computed or cached evaluation: feedback, plus the evaluation data in JSON mode"""
+    if not structured:
+        return {'feedback': value}
+    evaluation = json.loads(value)
+    return {'feedback': render_evaluation(evaluation), 'evaluation': evaluation}
+
+def run_evaluation(api_key, messages):
+    """The evaluation_result() for these messages, from the evaluation cache when possible"""
+    structured = structured_evaluations()
+    response_format = None
+    if structured:
+        messages = structured_messages(messages)
+        response_format = EVALUATION_RESPONSE_FORMAT
+
+    cache = get_evaluation_cache()
+    if cache is None:
+        value = request_evaluation(api_key, messages, response_format)
+    else:
+        value = cache.get_or_compute(evaluation_cache_key(messages, response_format),
+                                     lambda: request_evaluation(api_key, messages, response_format))
+    return evaluation_result(value, structured)
 
-        if not api_key:
-            return jsonify({'error': 'No API key provided'}), 400
+class FeedbackCleaner:
+    """
+    clean_feedback() applied to a completion as it streams in. Text is cleaned
+    line by line (an unfinished line is held back only if it contains a
+    backtick, since it may still become a code fence), and each <h4> section
+    is handed out as soon as the next <h4> starts.
+    """
+
+    def __init__(self):
+        self.pending = ''  # received, not cleaned yet
+        self.html = ''     # cleaned so far
+        self.sent = 0      # start of the first section not handed out
+        self.sections = 0
+
+    def _release(self, text):
+        self.html += clean_feedback(text)
+        sections = []
+        while True:
+            start = self.html.find('<h4', self.sent + 1)
+            if start == -1:
+                return sections
+            sections += self._section(start)
+
+    def _section(self, end):
+        html = self.html[self.sent:end]
+        self.sent = end
+        if not html.strip():
+            return []
+        self.sections += 1
+        return [{'index': self.sections - 1, 'html': html}]
+
+    def feed(self, text):
+        """Add streamed text; returns the sections it completed"""
+        self.pending += text
+        cut = self.pending.rfind('\n') + 1
+        if '`' not in self.pending[cut:]:
+            cut = len(self.pending)
+        released, self.pending = self.pending[:cut], self.pending[cut:]
+        return self._release(released) if released else []
+
+    def finish(self):
+        """End of the completion: the remaining text and the last section"""
+        sections = self._release(self.pending)
+        self.pending = ''
+        return sections + self._section(len(self.html))
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def replayed_evaluation(result):
+    """The events of a streamed evaluation, for an evaluation_result() that is already complete"""
+    cleaner = FeedbackCleaner()
+    for section in cleaner.feed(result['feedback']) + cleaner.finish():
+        yield sse_event('section', section)
+    yield sse_event('done', result)
+
+class EvaluationStream:
+    """
+    Server-sent events for a streamed completion. The result is stored in the
+    evaluation cache when the completion ends; close() (called by the WSGI
+    server, even if the client went away before the first event) stops the
+    upstream stream and releases requests waiting for this evaluation.
+    """
+
+    def __init__(self, stream, cache, cache_key, deadline, slot):
+        self.stream = stream
+        self.cache = cache
+        self.cache_key = cache_key
+        self.deadline = deadline
+        self.slot = slot
+        self.settled = cache is None
+        self.events = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.events)
+
+    def _settle(self, feedback=None, error=None):
+        if self.settled:
+            return
+        self.settled = True
+        if error is None:
+            self.cache.resolve(self.cache_key, feedback)
+        else:
+            self.cache.reject(self.cache_key, error)
 
-        # Load existing vocabulary cards to avoid repetition
-        vocab_context = ""
+    def _generate(self):
+        cleaner = FeedbackCleaner()
+        received = []
         try:
-            vocab_file = Path('vocabulary_cards.json')
-            if vocab_file.exists():
-                with open(vocab_file, 'r', encoding='utf-8') as f:
-                    vocab_cards = json.load(f)
-                    if vocab_cards:
-                        # Extract unique words/phrases that have been suggested before
-                        previous_suggestions = set()
-                        for card in vocab_cards:
-                            content = card.get('content', '')
-                            # Simple extraction - look for quoted words in "Instead of"
-                            import re
-                            matches = re.findall(r'Instead of ["\']([^"\']+)["\']', content)
-                            previous_suggestions.update(matches)
-
-                        if previous_suggestions:
-                            vocab_context = f"\n\n**IMPORTANT - Previous Vocabulary Work:**\nYou have already suggested alternatives for: {', '.join(list(previous_suggestions)[:15])}.\nIt's okay to mention them ONCE if they reappear, but PRIORITIZE NEW, DIFFERENT vocabulary. Focus on variety and progression to build a comprehensive vocabulary toolkit."
-        except:
-            pass
+            for chunk in self.stream:
+                if time.monotonic() > self.deadline:
+                    openai_calls.count('deadline_exceeded')
+                    raise TimeoutError('The evaluation took too long and was stopped')
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not text:
+                    continue
+                received.append(text)
+                for section in cleaner.feed(text):
+                    yield sse_event('section', section)
+            for section in cleaner.finish():
+                yield sse_event('section', section)
+            feedback = clean_feedback(''.join(received))
+            self._settle(feedback=feedback)
+            yield sse_event('done', {'feedback': feedback})
+        except Exception as e:
+            self._settle(error=e)
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            self.slot.release()
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+    def close(self):
+        self.events.close()
+        self.stream.close()
+        self.slot.release()
+        self._settle(error=RuntimeError('The evaluation was interrupted'))
 
-        # Create evaluation prompt
+def event_stream_response(events):
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def stream_evaluation(api_key, messages):
+    """
+    Streamed counterpart of run_evaluation(): a text/event-stream response
+    with a `section` event per <h4> section as soon as it is complete, then
+    `done` carrying the whole cleaned feedback, or `error`. Cached feedback
+    is replayed at once, and so is a JSON-mode evaluation once it is complete
+    (the JSON cannot be rendered before then).
+    """
+    if structured_evaluations():
+        return event_stream_response(replayed_evaluation(run_evaluation(api_key, messages)))
+
+    cache = get_evaluation_cache()
+    cache_key = evaluation_cache_key(messages)
+    if cache is not None:
+        feedback, running = cache.claim(cache_key)
+        if running is not None:
+            # The same evaluation is already being generated: share its result
+            feedback = running.result()
+        if feedback is not None:
+            return event_stream_response(replayed_evaluation({'feedback': feedback}))
+
+    deadline = time.monotonic() + openai_calls.deadline_seconds()
+    slot = None
+    try:
+        # Requested before the response starts, so that a rejected key still gets a JSON error
+        slot = rate_limiter.acquire(api_key, deadline)
+        stream = openai_calls.completion(
+            api_key,
+            deadline=deadline,
+            model=EVALUATION_MODEL,
+            messages=messages,
+            temperature=EVALUATION_TEMPERATURE,
+            max_tokens=EVALUATION_MAX_TOKENS,
+            stream=True
+        )
+    except Exception as e:
+        if slot is not None:
+            slot.release()
+        if cache is not None:
+            cache.reject(cache_key, e)
+        raise
+    return event_stream_response(EvaluationStream(stream, cache, cache_key, deadline, slot))
+
+def evaluation_messages(data):
+    """Chat messages asking for the evaluation of a Task 1 response"""
+    question = data.get('question', '')
+    transcript = data.get('transcript', '')
+    word_count = data.get('word_count', 0)
+    speaking_time = data.get('speaking_time', 45)
+
+    # Terms already covered by the vocabulary cards, to avoid repetition
+    vocab_context = ""
+    previous_suggestions = vocabulary_index.top(VOCABULARY_CONTEXT_TERMS)
+    if previous_suggestions:
+        vocab_context = f"\n\n**IMPORTANT - Previous Vocabulary Work:**\nYou have already suggested alternatives for: {', '.join(previous_suggestions)}.\nIt's okay to mention them ONCE if they reappear, but PRIORITIZE NEW, DIFFERENT vocabulary. Focus on variety and progression to build a comprehensive vocabulary toolkit."
+
+    # Timing comes from the server-side analysis of the recording when available
+    fluency = transcript_fluency(data.get('transcript_id'))
+    fluency_stats = ""
+    if fluency:
+        word_count = fluency['word_count']
+        wpm = fluency['speaking_rate_wpm']
+        fluency_stats = fluency_statistics(fluency)
+    else:
         wpm = (word_count / speaking_time * 60) if speaking_time > 0 else 0
 
-        prompt = f"""You are an experienced TOEFL speaking evaluator. Your MISSION: Help this student achieve the HIGHEST possible TOEFL score by teaching them HIGH-IMPACT vocabulary and expressions that IMPRESS graders.
+    prompt = f"""You are an experienced TOEFL speaking evaluator. Your MISSION: Help this student achieve the HIGHEST possible TOEFL score by teaching them HIGH-IMPACT vocabulary and expressions that IMPRESS graders.
 
 **CRITICAL FOCUS:** "Low-frequency words" - sophisticated, academic vocabulary that demonstrates advanced proficiency. These are the words that distinguish a score of 3 from a score of 5. Avoid common words - we want TOEFL power vocabulary!{vocab_context}
 
@@ -561,7 +4095,7 @@ def evaluate():
 
 **Statistics:**
 - Total words: {word_count}
-- Words per minute: {wpm:.1f}
+- Words per minute: {wpm:.1f}{fluency_stats}
 
 **Your task:**
 Provide a detailed evaluation following this structure:
@@ -618,29 +4152,46 @@ IMPORTANT:
 - MUST use <h4> for section titles
 - Return only pure HTML content"""
 
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # More affordable than gpt-4
-            messages=[
-                {"role": "system", "content": "You are an expert TOEFL speaking evaluator. Provide detailed, constructive feedback. Do not use any emojis. Return only HTML content without markdown code blocks."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
+    return [
+        {"role": "system", "content": "You are an expert TOEFL speaking evaluator. Provide detailed, constructive feedback. Do not use any emojis. Return only HTML content without markdown code blocks."},
+        {"role": "user", "content": prompt}
+    ]
+
+@app.route('/evaluate', methods=['POST'])
+def evaluate():
+    """Evaluate speaking response using OpenAI GPT"""
+    try:
+        data = request.get_json()
+        api_key = data.get('api_key', '')
+
+        if not api_key:
+            return jsonify({'error': 'No API key provided'}), 400
+
+        return jsonify(run_evaluation(api_key, evaluation_messages(data)))
+
+    except OpenAIUnavailableError as e:
+        return openai_unavailable_response(e)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        feedback = response.choices[0].message.content
+@app.route('/evaluate/stream', methods=['POST'])
+def evaluate_stream():
+    """Same evaluation as /evaluate, sent section by section as server-sent events"""
+    try:
+        data = request.get_json()
+        api_key = data.get('api_key', '')
 
-        # Clean up the feedback: remove markdown code blocks and emojis
-        import re
-        # Remove ```html and ``` markers
-        feedback = re.sub(r'^```html\s*', '', feedback, flags=re.MULTILINE)
-        feedback = re.sub(r'```\s*$', '', feedback, flags=re.MULTILINE)
-        # Remove emojis (basic emoji removal)
-        feedback = re.sub(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002702-\U000027B0\U000024C2-\U0001F251]+', '', feedback)
+        if not api_key:
+            return jsonify({'error': 'No API key provided'}), 400
 
-        return jsonify({'feedback': feedback})
+        return stream_evaluation(api_key, evaluation_messages(data))
 
+    except OpenAIUnavailableError as e:
+        return openai_unavailable_response(e)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -653,39 +4204,18 @@ def convert_to_mp3():
 
         audio_file = request.files['audio']
 
-        # Create temporary files
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_webm:
-            audio_file.save(temp_webm.name)
-            webm_path = temp_webm.name
-
-        mp3_path = webm_path.replace('.webm', '.mp3')
+        # Check if ffmpeg is available
+        if not FFMPEG_AVAILABLE or not FFMPEG_PATH:
+            return jsonify({'error': 'FFmpeg not installed. Please install FFmpeg to enable MP3 conversion.'}), 400
 
-        try:
-            # Check if ffmpeg is available
-            if not FFMPEG_AVAILABLE or not FFMPEG_PATH:
-                return jsonify({'error': 'FFmpeg not installed. Please install FFmpeg to enable MP3 conversion.'}), 400
-
-            # Convert using ffmpeg
-            subprocess.run([
-                FFMPEG_PATH, '-i', webm_path,
-                '-codec:a', 'libmp3lame',
-                '-qscale:a', '2',
-                mp3_path,
-                '-y'
-            ], check=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-            with open(mp3_path, 'rb') as f:
-                mp3_data = f.read()
-            mp3_b64 = base64.b64encode(mp3_data).decode()
-
-            return jsonify({'mp3': mp3_b64})
+        # Upload -> ffmpeg stdin, MP3 <- ffmpeg stdout, sent on to the client chunk by chunk
+        mp3_chunks = stream_mp3(audio_file.read(), os.path.splitext(audio_file.filename or '')[1] or '.webm')
 
-        finally:
-            # Clean up temporary files
-            if os.path.exists(webm_path):
-                os.unlink(webm_path)
-            if os.path.exists(mp3_path):
-                os.unlink(mp3_path)
+        return Response(mp3_chunks, mimetype='audio/mpeg',
+                        headers={'Content-Disposition': 'attachment; filename=recording.mp3'})
 
+    except FFmpegBusyError as e:
+        return ffmpeg_busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -780,6 +4310,7 @@ def list_prompts(task_num):
 
     try:
         data = load_task_prompts(task_num)
+        add_reference_transcripts(task_num, data.get('prompts', []))
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -794,7 +4325,7 @@ def get_prompt(task_num, prompt_id):
         data = load_task_prompts(task_num)
         for prompt in data.get('prompts', []):
             if prompt['id'] == prompt_id:
-                return jsonify(prompt)
+                return jsonify(add_reference_transcripts(task_num, [prompt])[0])
         return jsonify({'error': 'Prompt not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -992,13 +4523,16 @@ def upload_task_audio(task_num):
             saved_path = audio_dir / new_filename
             counter += 1
 
-        # Save the file
+        # Save the file, then make its compact copies (FLAC for Whisper, Opus for playback)
         audio_file.save(saved_path)
+        audio_info = normalize_uploaded_audio(saved_path)
+        reference_index.enqueue(saved_path)
 
         return jsonify({
             'success': True,
             'message': 'Audio uploaded successfully!',
-            'filename': saved_path.name
+            'filename': saved_path.name,
+            'audio_info': audio_info
         })
 
     except Exception as e:
@@ -1022,9 +4556,12 @@ def list_task_audio(task_num):
 
         for file_path in audio_dir.iterdir():
             if file_path.is_file() and file_path.suffix.lower() in audio_extensions:
+                meta = normalized_metadata(file_path) or {}
                 audio_files.append({
                     'filename': file_path.name,
-                    'size': file_path.stat().st_size
+                    'size': file_path.stat().st_size,
+                    'duration': meta.get('duration'),
+                    'rms_dbfs': meta.get('rms_dbfs')
                 })
 
         # Sort by filename
@@ -1084,118 +4621,104 @@ def serve_task_audio_file(task_num, filename):
         if not audio_path.exists():
             return jsonify({'error': 'Audio file not found'}), 404
 
-        return send_file(audio_path)
+        return send_stored_audio(audio_path)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/task/<int:task_num>/evaluate', methods=['POST'])
-def evaluate_task(task_num):
-    """Evaluate a task response using OpenAI"""
-    if task_num not in [2, 3, 4, 5, 6]:
-        return jsonify({'error': 'Invalid task number'}), 400
-
-    try:
-        from openai import OpenAI
-
-        data = request.get_json()
-        api_key = data.get('api_key')
-
-        if not api_key:
-            return jsonify({'error': 'API key is required'}), 400
-
-        # Load existing vocabulary cards to avoid repetition
-        vocab_context = ""
-        try:
-            vocab_file = Path('vocabulary_cards.json')
-            if vocab_file.exists():
-                with open(vocab_file, 'r', encoding='utf-8') as f:
-                    vocab_cards = json.load(f)
-                    if vocab_cards:
-                        # Extract unique words/phrases that have been suggested before
-                        previous_suggestions = set()
-                        for card in vocab_cards:
-                            content = card.get('content', '')
-                            # Simple extraction - look for quoted words in "Instead of"
-                            import re
-                            matches = re.findall(r'Instead of ["\']([^"\']+)["\']', content)
-                            previous_suggestions.update(matches)
-
-                        if previous_suggestions:
-                            vocab_context = f"\n\n**IMPORTANT - Previous Vocabulary Work:**\nYou have already suggested alternatives for: {', '.join(list(previous_suggestions)[:15])}.\nIt's okay to mention them ONCE if they reappear, but PRIORITIZE NEW, DIFFERENT vocabulary. Focus on variety and progression."
-        except:
-            pass
-
-        client = OpenAI(api_key=api_key)
+def task_evaluation_messages(task_num, data):
+    """Chat messages asking for the evaluation of a Task 2-6 response"""
+    # Terms already covered by the vocabulary cards, to avoid repetition
+    vocab_context = ""
+    previous_suggestions = vocabulary_index.top(VOCABULARY_CONTEXT_TERMS)
+    if previous_suggestions:
+        vocab_context = f"\n\n**IMPORTANT - Previous Vocabulary Work:**\nYou have already suggested alternatives for: {', '.join(previous_suggestions)}.\nIt's okay to mention them ONCE if they reappear, but PRIORITIZE NEW, DIFFERENT vocabulary. Focus on variety and progression."
 
-        # Handle writing tasks (5, 6) differently from speaking tasks (2, 3, 4)
-        is_writing_task = task_num in [5, 6]
+    # Handle writing tasks (5, 6) differently from speaking tasks (2, 3, 4)
+    is_writing_task = task_num in [5, 6]
 
-        if is_writing_task:
-            # Writing task data
-            text = data.get('text', '')
-            word_count = data.get('word_count', 0)
-            reading_text = data.get('reading_text', '')
-            discussion_data = data.get('discussion_data', {})
-            transcript = text  # Use same variable name for consistency
-            wpm = 0
-            has_audio = False
+    if is_writing_task:
+        # Writing task data
+        text = data.get('text', '')
+        word_count = data.get('word_count', 0)
+        reading_text = data.get('reading_text', '')
+        discussion_data = data.get('discussion_data', {})
+        transcript = text  # Use same variable name for consistency
+        wpm = 0
+        fluency_stats = ""
+        has_audio = False
+    else:
+        # Speaking task data
+        transcript = data.get('transcript', '')
+        word_count = data.get('word_count', 0)
+        speaking_time = data.get('speaking_time', 0)
+        reading_text = data.get('reading_text', '')
+        has_audio = data.get('has_audio', False)
+
+        # Timing comes from the server-side analysis of the recording when available
+        fluency = transcript_fluency(data.get('transcript_id'))
+        fluency_stats = ""
+        if fluency:
+            word_count = fluency['word_count']
+            wpm = fluency['speaking_rate_wpm']
+            fluency_stats = fluency_statistics(fluency)
         else:
-            # Speaking task data
-            transcript = data.get('transcript', '')
-            word_count = data.get('word_count', 0)
-            speaking_time = data.get('speaking_time', 0)
-            reading_text = data.get('reading_text', '')
-            has_audio = data.get('has_audio', False)
             wpm = (word_count / speaking_time * 60) if speaking_time > 0 else 0
 
-        # Task-specific prompts
-        if task_num == 2:
-            task_description = "Campus Announcement (Task 2)"
-            task_context = "In this task, you read a campus announcement and listened to students discussing it. You needed to explain the students' opinion and their reasons."
-        elif task_num == 3:
-            task_description = "Academic Concept (Task 3)"
-            task_context = "In this task, you read an academic article and listened to a lecture. You needed to explain how the lecture examples illustrate the concept from the reading."
-        elif task_num == 4:
-            task_description = "Lecture Summary (Task 4)"
-            task_context = "In this task, you listened to an academic lecture. You needed to summarize the main points presented."
-        elif task_num == 5:
-            task_description = "Integrated Writing (Task 5)"
-            task_context = "In this task, you read an academic passage and listened to a lecture that challenges it. You needed to write an essay (150-225 words) summarizing how the lecture counters the reading's points."
-        else:  # task_num == 6
-            task_description = "Academic Discussion (Task 6)"
-            task_context = f"In this task, you read a professor's question and two student responses. You needed to write your own contribution (at least 100 words) to the academic discussion."
-
-        audio_note = ""
-        if not is_writing_task and not has_audio:
-            audio_note = "\n\n**NOTE:** The student did not have access to the audio portion. Focus evaluation on language quality (vocabulary, grammar, phrasing) rather than content accuracy."
-
-        reading_context = ""
-        if reading_text:
-            reading_context = f"\n\n**Reading Passage:**\n{reading_text}"
-
-        discussion_context = ""
-        if task_num == 6 and discussion_data:
-            discussion_context = f"\n\n**Discussion Context:**\n"
-            discussion_context += f"Professor ({discussion_data.get('professor_name', 'Professor')}): {discussion_data.get('professor_question', '')}\n"
-            discussion_context += f"Student 1 ({discussion_data.get('student1_name', 'Student 1')}): {discussion_data.get('student1_response', '')}\n"
-            discussion_context += f"Student 2 ({discussion_data.get('student2_name', 'Student 2')}): {discussion_data.get('student2_response', '')}"
-
-        task_type = "writing" if is_writing_task else "speaking"
-        prompt = f"""You are an experienced TOEFL {task_type} evaluator. Your MISSION: Help this student achieve the HIGHEST possible TOEFL score by teaching them HIGH-IMPACT vocabulary and expressions that IMPRESS graders.
+    # Task-specific prompts
+    if task_num == 2:
+        task_description = "Campus Announcement (Task 2)"
+        task_context = "In this task, you read a campus announcement and listened to students discussing it. You needed to explain the students' opinion and their reasons."
+    elif task_num == 3:
+        task_description = "Academic Concept (Task 3)"
+        task_context = "In this task, you read an academic article and listened to a lecture. You needed to explain how the lecture examples illustrate the concept from the reading."
+    elif task_num == 4:
+        task_description = "Lecture Summary (Task 4)"
+        task_context = "In this task, you listened to an academic lecture. You needed to summarize the main points presented."
+    elif task_num == 5:
+        task_description = "Integrated Writing (Task 5)"
+        task_context = "In this task, you read an academic passage and listened to a lecture that challenges it. You needed to write an essay (150-225 words) summarizing how the lecture counters the reading's points."
+    else:  # task_num == 6
+        task_description = "Academic Discussion (Task 6)"
+        task_context = f"In this task, you read a professor's question and two student responses. You needed to write your own contribution (at least 100 words) to the academic discussion."
+
+    audio_note = ""
+    if not is_writing_task and not has_audio:
+        audio_note = "\n\n**NOTE:** The student did not have access to the audio portion. Focus evaluation on language quality (vocabulary, grammar, phrasing) rather than content accuracy."
+
+    reading_context = ""
+    if reading_text:
+        reading_context = f"\n\n**Reading Passage:**\n{reading_text}"
+
+    # What is said in the prompt's audio, from the reference index (no Whisper call here)
+    listening_context = ""
+    if is_writing_task or has_audio:
+        reference_transcript = prompt_reference_transcript(task_num, data.get('prompt_id'))
+        if reference_transcript:
+            listening_context = f"\n\n**Listening Transcript (reference):**\n{reference_transcript}"
+
+    discussion_context = ""
+    if task_num == 6 and discussion_data:
+        discussion_context = f"\n\n**Discussion Context:**\n"
+        discussion_context += f"Professor ({discussion_data.get('professor_name', 'Professor')}): {discussion_data.get('professor_question', '')}\n"
+        discussion_context += f"Student 1 ({discussion_data.get('student1_name', 'Student 1')}): {discussion_data.get('student1_response', '')}\n"
+        discussion_context += f"Student 2 ({discussion_data.get('student2_name', 'Student 2')}): {discussion_data.get('student2_response', '')}"
+
+    task_type = "writing" if is_writing_task else "speaking"
+    prompt = f"""You are an experienced TOEFL {task_type} evaluator. Your MISSION: Help this student achieve the HIGHEST possible TOEFL score by teaching them HIGH-IMPACT vocabulary and expressions that IMPRESS graders.
 
 **CRITICAL FOCUS:** "Low-frequency words" - sophisticated, academic vocabulary that demonstrates advanced proficiency. These are the words that distinguish a score of 3 from a score of 5.{vocab_context}
 
 Evaluate this TOEFL {task_description} response.
 
-**Task Context:** {task_context}{audio_note}{reading_context}{discussion_context}
+**Task Context:** {task_context}{audio_note}{reading_context}{listening_context}{discussion_context}
 
 **Student's Response{"" if is_writing_task else " (transcribed)"}:**
 {transcript}
 
 **Statistics:**
 - Total words: {word_count}
-{f"- Words per minute: {wpm:.1f}" if not is_writing_task else ""}
+{f"- Words per minute: {wpm:.1f}{fluency_stats}" if not is_writing_task else ""}
 
 **Your task:**
 Provide a detailed evaluation following this structure:
@@ -1252,31 +4775,375 @@ IMPORTANT:
 - MUST use <h4> for section titles
 - Return only pure HTML content"""
 
-        # Call OpenAI API
-        system_message = f"You are an expert TOEFL {task_type} evaluator. Provide detailed, constructive feedback. Do not use any emojis. Return only HTML content without markdown code blocks."
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
+    system_message = f"You are an expert TOEFL {task_type} evaluator. Provide detailed, constructive feedback. Do not use any emojis. Return only HTML content without markdown code blocks."
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt}
+    ]
+
+@app.route('/api/task/<int:task_num>/evaluate', methods=['POST'])
+def evaluate_task(task_num):
+    """Evaluate a task response using OpenAI"""
+    if task_num not in [2, 3, 4, 5, 6]:
+        return jsonify({'error': 'Invalid task number'}), 400
+
+    try:
+        data = request.get_json()
+        api_key = data.get('api_key')
+
+        if not api_key:
+            return jsonify({'error': 'API key is required'}), 400
+
+        return jsonify(run_evaluation(api_key, task_evaluation_messages(task_num, data)))
+
+    except OpenAIUnavailableError as e:
+        return openai_unavailable_response(e)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/task/<int:task_num>/evaluate/stream', methods=['POST'])
+def evaluate_task_stream(task_num):
+    """Same evaluation as /api/task/<n>/evaluate, sent section by section as server-sent events"""
+    if task_num not in [2, 3, 4, 5, 6]:
+        return jsonify({'error': 'Invalid task number'}), 400
+
+    try:
+        data = request.get_json()
+        api_key = data.get('api_key')
+
+        if not api_key:
+            return jsonify({'error': 'API key is required'}), 400
+
+        return stream_evaluation(api_key, task_evaluation_messages(task_num, data))
+
+    except OpenAIUnavailableError as e:
+        return openai_unavailable_response(e)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# Batch evaluation (every task of a test session evaluated concurrently)
+# ============================================================================
+
+DEFAULT_EVALUATION_BATCH_WORKERS = 6
+EVALUATION_BATCH_MAX_TASKS = 12
+_evaluation_executor = None
+_evaluation_executor_lock = threading.Lock()
+
+def get_evaluation_executor():
+    """Thread pool running the evaluations of batches; its threads mostly wait on OpenAI"""
+    global _evaluation_executor
+    with _evaluation_executor_lock:
+        if _evaluation_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            workers = int(load_config().get('evaluation_batch_workers', DEFAULT_EVALUATION_BATCH_WORKERS))
+            _evaluation_executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='evaluation')
+        return _evaluation_executor
+
+def batch_task_messages(task):
+    """Messages for one task of a batch: its 'task' number (1-6) and the fields of that task's endpoint"""
+    task_num = task.get('task')
+    if task_num == 1:
+        return evaluation_messages(task)
+    if task_num in [2, 3, 4, 5, 6]:
+        return task_evaluation_messages(task_num, task)
+    raise ValueError(f'Invalid task number: {task_num}')
+
+class BatchEvaluation:
+    """
+    Server-sent events for a batch: a `result` event per task as soon as its
+    evaluation finishes (so in completion order, with the task's index), then
+    `done`. close() cancels the evaluations that have not started yet, e.g.
+    when the client went away.
+    """
+
+    def __init__(self, futures):
+        self.futures = futures  # Future -> (index, id) of its task
+        self.events = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.events)
+
+    def _generate(self):
+        from concurrent.futures import as_completed
+
+        failed = 0
+        for future in as_completed(self.futures):
+            index, task_id = self.futures[future]
+            result = {'index': index, 'id': task_id}
+            try:
+                result.update(future.result())
+            except Exception as e:
+                failed += 1
+                result['error'] = str(e)
+            yield sse_event('result', result)
+        yield sse_event('done', {'completed': len(self.futures) - failed, 'failed': failed})
+
+    def close(self):
+        self.events.close()
+        for future in self.futures:
+            future.cancel()
+
+@app.route('/evaluate/batch', methods=['POST'])
+def evaluate_batch():
+    """
+    Evaluate all the responses of a test session at once. Takes {"api_key",
+    "tasks": [...]}, each task carrying what its own evaluate endpoint takes
+    plus an optional "id"; the evaluations run concurrently and each result
+    is sent as a server-sent event when it is ready.
+    """
+    try:
+        data = request.get_json()
+        api_key = data.get('api_key', '')
+        tasks = data.get('tasks')
+
+        if not api_key:
+            return jsonify({'error': 'No API key provided'}), 400
+        if not isinstance(tasks, list) or not tasks:
+            return jsonify({'error': 'No tasks provided'}), 400
+        if len(tasks) > EVALUATION_BATCH_MAX_TASKS:
+            return jsonify({'error': f'At most {EVALUATION_BATCH_MAX_TASKS} tasks per batch'}), 400
+        if not all(isinstance(task, dict) for task in tasks):
+            return jsonify({'error': 'Each task must be an object'}), 400
+
+        # Prompts are built up front so that an invalid task rejects the whole batch
+        try:
+            messages = [batch_task_messages(task) for task in tasks]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        executor = get_evaluation_executor()
+        futures = {
+            executor.submit(run_evaluation, api_key, task_messages): (index, tasks[index].get('id'))
+            for index, task_messages in enumerate(messages)
+        }
+        return event_stream_response(BatchEvaluation(futures))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# Test sessions (each task is transcribed and evaluated while the next one runs)
+# ============================================================================
+
+DEFAULT_TEST_SESSION_WORKERS = 2
+TEST_SESSION_RETENTION_SECONDS = 2 * 60 * 60
+WRITING_TASKS = [5, 6]
+
+test_sessions = {}
+test_sessions_lock = threading.Lock()
+_test_session_executor = None
+
+def get_test_session_executor():
+    """Thread pool transcribing the recordings of test sessions (size from config 'test_session_workers')"""
+    global _test_session_executor
+    with test_sessions_lock:
+        if _test_session_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            workers = int(load_config().get('test_session_workers', DEFAULT_TEST_SESSION_WORKERS))
+            _test_session_executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='test-session')
+        return _test_session_executor
+
+class TestSession:
+    """
+    The responses of one complete test. Each recording is transcribed as soon
+    as it is uploaded, with the same steps (and cache) as /transcribe, then
+    evaluated on the batch evaluation pool with the prompt of
+    /api/task/<n>/evaluate, while the student goes on with the next task.
+    """
+
+    def __init__(self, api_key, profile):
+        self.id = uuid.uuid4().hex
+        self.api_key = api_key
+        self.profile = profile
+        self.created = time.time()
+        self.lock = threading.Lock()
+        self.tasks = []    # Public state of each task, in upload order
+        self.futures = []  # Transcriptions and evaluations, cancelled by close()
+
+    def add_task(self, task_num, fields, audio_bytes=None, suffix='.webm'):
+        """Queue a recorded response (or the text of a writing task); returns its index"""
+        data = dict(fields, task=task_num)
+        with self.lock:
+            index = len(self.tasks)
+            self.tasks.append({'index': index, 'task': task_num, 'status': 'queued'})
+        if audio_bytes is None:
+            self._evaluate(index, data)
+        else:
+            self._track(get_test_session_executor().submit(self._transcribe, index, data, audio_bytes, suffix))
+        return index
+
+    def _track(self, future):
+        with self.lock:
+            self.futures.append(future)
+
+    def _update(self, index, **changes):
+        with self.lock:
+            self.tasks[index].update(changes)
+
+    def _transcribe(self, index, data, audio_bytes, suffix):
+        self._update(index, status='transcribing')
+        try:
+            vad = vad_settings()
+            cache_key, cached = cached_transcript(audio_bytes, transcription_settings(in_process_transcription_mode(), self.profile, vad))
+            if cached is not None:
+                response = dict(cached, transcript_id=cache_key)
+            else:
+                # Unlike /transcribe, which answers 503, a session waits for the model
+                while not whisper_ready.wait(1):
+                    if whisper_load_error:
+                        raise RuntimeError(f'Transcription model failed to load: {whisper_load_error}')
+                while True:
+                    try:
+                        response = transcribe_recording(audio_bytes, suffix, self.profile, vad, cache_key)
+                        break
+                    except FFmpegBusyError as e:
+                        time.sleep(e.retry_after)
+        except Exception as e:
+            self._update(index, status='error', error=f'Transcription failed: {e}')
+            return
+
+        transcribed = {
+            'transcript': response.get('transcript', ''),
+            'word_count': response.get('word_count', 0),
+            'transcript_id': response.get('transcript_id')
+        }
+        self._update(index, **transcribed)
+        self._evaluate(index, dict(data, **transcribed))
+
+    def _evaluate(self, index, data):
+        if not self.api_key:
+            self._update(index, status='done')
+            return
+        self._update(index, status='evaluating')
+        try:
+            messages = batch_task_messages(data)
+        except Exception as e:
+            self._update(index, status='error', error=f'Evaluation failed: {e}')
+            return
+        future = get_evaluation_executor().submit(run_evaluation, self.api_key, messages)
+        self._track(future)
+        future.add_done_callback(lambda done: self._evaluated(index, done))
+
+    def _evaluated(self, index, future):
+        if future.cancelled():
+            self._update(index, status='error', error='Evaluation was cancelled')
+        elif future.exception() is not None:
+            self._update(index, status='error', error=f'Evaluation failed: {future.exception()}')
+        else:
+            self._update(index, status='done', **future.result())
+
+    def status(self):
+        with self.lock:
+            tasks = [dict(task) for task in self.tasks]
+        finished = bool(tasks) and all(task['status'] in ('done', 'error') for task in tasks)
+        return {'session_id': self.id, 'status': 'done' if finished else 'running', 'tasks': tasks}
+
+    def close(self):
+        """Cancel the work that has not started yet"""
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+
+def _prune_test_sessions():
+    """Forget sessions older than TEST_SESSION_RETENTION_SECONDS"""
+    cutoff = time.time() - TEST_SESSION_RETENTION_SECONDS
+    with test_sessions_lock:
+        expired = [session_id for session_id, test_session in test_sessions.items() if test_session.created < cutoff]
+        expired_sessions = [test_sessions.pop(session_id) for session_id in expired]
+    for test_session in expired_sessions:
+        test_session.close()
+
+@app.route('/api/test_sessions', methods=['POST'])
+def create_test_session():
+    """Start a test session; its tasks are then uploaded one by one, as soon as they are recorded"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        try:
+            _, profile = resolve_whisper_profile(data.get('profile'), 'complete_test')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        _prune_test_sessions()
+        test_session = TestSession(data.get('api_key', ''), profile)
+        with test_sessions_lock:
+            test_sessions[test_session.id] = test_session
+
+        response = jsonify(test_session.status())
+        response.headers['Location'] = f'/api/test_sessions/{test_session.id}'
+        return response, 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/test_sessions/<session_id>/tasks', methods=['POST'])
+def add_test_session_task(session_id):
+    """
+    Add a task to a session: form fields 'task' (1-6) and 'data' (JSON with
+    the fields of its evaluate endpoint, e.g. question, reading_text), plus
+    the 'audio' recording for speaking tasks. Returns at once; the task is
+    processed in the background.
+    """
+    with test_sessions_lock:
+        test_session = test_sessions.get(session_id)
+    if test_session is None:
+        return jsonify({'error': 'Session not found'}), 404
+
+    try:
+        task_num = int(request.form.get('task', 0))
+        if task_num not in [1, 2, 3, 4, 5, 6]:
+            return jsonify({'error': 'Invalid task number'}), 400
 
-        feedback = response.choices[0].message.content
+        fields = json.loads(request.form.get('data') or '{}')
+        if not isinstance(fields, dict):
+            return jsonify({'error': "'data' must be a JSON object"}), 400
 
-        # Clean up the feedback
-        import re
-        feedback = re.sub(r'^```html\s*', '', feedback, flags=re.MULTILINE)
-        feedback = re.sub(r'```\s*$', '', feedback, flags=re.MULTILINE)
-        feedback = re.sub(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002702-\U000027B0\U000024C2-\U0001F251]+', '', feedback)
+        audio_file = request.files.get('audio')
+        if audio_file is None and task_num not in WRITING_TASKS:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        if audio_file is None:
+            index = test_session.add_task(task_num, fields)
+        else:
+            suffix = os.path.splitext(audio_file.filename or '')[1] or '.webm'
+            index = test_session.add_task(task_num, fields, audio_file.read(), suffix)
+        print(f"[TEST SESSION] Task {task_num} queued in session {session_id[:8]}")
 
-        return jsonify({'feedback': feedback})
+        return jsonify({'session_id': session_id, 'index': index, 'status': 'queued'}), 202
 
+    except json.JSONDecodeError as e:
+        return jsonify({'error': f"Invalid 'data': {e}"}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/test_sessions/<session_id>', methods=['GET'])
+def get_test_session(session_id):
+    """Status of every task of a session, with the transcripts and feedback produced so far"""
+    with test_sessions_lock:
+        test_session = test_sessions.get(session_id)
+    if test_session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(test_session.status())
+
+@app.route('/api/test_sessions/<session_id>', methods=['DELETE'])
+def delete_test_session(session_id):
+    """Drop a session (e.g. the test was restarted) and cancel its pending work"""
+    with test_sessions_lock:
+        test_session = test_sessions.pop(session_id, None)
+    if test_session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    test_session.close()
+    return jsonify({'success': True})
+
 if __name__ == '__main__':
     Path('templates').mkdir(exist_ok=True)
     Path('static').mkdir(exist_ok=True)
@@ -528,15 +528,24 @@ class CompleteTestManager {
         this.results = [];
         this.currentTaskIndex = 0;
 
+        // Recordings are uploaded to a server-side session that transcribes and evaluates them
+        // in the background while the next tasks run
+        this.sessionReady = this.createSession();
+
+        // Prompt used for each task, sent with its recording (the evaluation adds the prompt audio's transcript)
+        this.promptIds = {};
+
         // Select prompts for tasks 2, 3, 4 only if they are selected
         if (this.selectedTasks.includes(2)) {
             if (this.selectedTask2PromptId) {
                 const prompt = this.task2Prompts.find(p => p.id === this.selectedTask2PromptId);
+                this.promptIds[2] = prompt.id;
                 this.task2Reading = prompt.reading;
                 this.task2Audio = prompt.audio_file;
                 this.task2HasAudio = !!prompt.audio_file;
             } else {
                 const randomPrompt = this.task2Prompts[Math.floor(Math.random() * this.task2Prompts.length)];
+                this.promptIds[2] = randomPrompt.id;
                 this.task2Reading = randomPrompt.reading;
                 this.task2Audio = randomPrompt.audio_file;
                 this.task2HasAudio = !!randomPrompt.audio_file;
@@ -547,11 +556,13 @@ class CompleteTestManager {
         if (this.selectedTasks.includes(3)) {
             if (this.selectedTask3PromptId) {
                 const prompt = this.task3Prompts.find(p => p.id === this.selectedTask3PromptId);
+                this.promptIds[3] = prompt.id;
                 this.task3Reading = prompt.reading;
                 this.task3Audio = prompt.audio_file;
                 this.task3HasAudio = !!prompt.audio_file;
             } else {
                 const randomPrompt = this.task3Prompts[Math.floor(Math.random() * this.task3Prompts.length)];
+                this.promptIds[3] = randomPrompt.id;
                 this.task3Reading = randomPrompt.reading;
                 this.task3Audio = randomPrompt.audio_file;
                 this.task3HasAudio = !!randomPrompt.audio_file;
@@ -562,11 +573,13 @@ class CompleteTestManager {
         if (this.selectedTasks.includes(4)) {
             if (this.selectedTask4PromptId) {
                 const prompt = this.task4Prompts.find(p => p.id === this.selectedTask4PromptId);
+                this.promptIds[4] = prompt.id;
                 this.task4Notes = prompt.notes || '';
                 this.task4Audio = prompt.audio_file;
                 this.task4HasAudio = !!prompt.audio_file;
             } else {
                 const randomPrompt = this.task4Prompts[Math.floor(Math.random() * this.task4Prompts.length)];
+                this.promptIds[4] = randomPrompt.id;
                 this.task4Notes = randomPrompt.notes || '';
                 this.task4Audio = randomPrompt.audio_file;
                 this.task4HasAudio = !!randomPrompt.audio_file;
@@ -577,11 +590,13 @@ class CompleteTestManager {
         if (this.selectedTasks.includes(5)) {
             if (this.selectedTask5PromptId) {
                 const prompt = this.task5Prompts.find(p => p.id === this.selectedTask5PromptId);
+                this.promptIds[5] = prompt.id;
                 this.task5Reading = prompt.reading;
                 this.task5Audio = prompt.audio_file;
                 this.task5HasAudio = !!prompt.audio_file;
             } else {
                 const randomPrompt = this.task5Prompts[Math.floor(Math.random() * this.task5Prompts.length)];
+                this.promptIds[5] = randomPrompt.id;
                 this.task5Reading = randomPrompt.reading;
                 this.task5Audio = randomPrompt.audio_file;
                 this.task5HasAudio = !!randomPrompt.audio_file;
@@ -591,9 +606,11 @@ class CompleteTestManager {
         if (this.selectedTasks.includes(6)) {
             if (this.selectedTask6PromptId) {
                 const prompt = this.task6Prompts.find(p => p.id === this.selectedTask6PromptId);
+                this.promptIds[6] = prompt.id;
                 this.task6Discussion = prompt;
             } else {
                 const randomPrompt = this.task6Prompts[Math.floor(Math.random() * this.task6Prompts.length)];
+                this.promptIds[6] = randomPrompt.id;
                 this.task6Discussion = randomPrompt;
             }
         }
@@ -668,21 +685,28 @@ class CompleteTestManager {
 
     async createPromptAudio(text, callback) {
         try {
-            const response = await fetch('/create_audio', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text: text })
-            });
-
-            const data = await response.json();
-
-            const audioData = data.audio;
-            const audio = new Audio('data:audio/mp3;base64,' + audioData);
+            // Streamed MP3: playback starts while the rest is still being synthesized
+            const audio = new Audio('/create_audio?text=' + encodeURIComponent(text));
 
             document.getElementById('task1Status').textContent = 'Listen to the question...';
 
-            audio.play();
-            audio.onended = callback;
+            // Move on exactly once, whether the audio ends or fails
+            let finished = false;
+            const finish = () => {
+                if (!finished) {
+                    finished = true;
+                    callback();
+                }
+            };
+            audio.onended = finish;
+            audio.onerror = () => {
+                console.error('Error creating audio:', audio.error);
+                finish();
+            };
+            audio.play().catch(error => {
+                console.error('Error playing audio:', error);
+                finish();
+            });
 
         } catch (error) {
             console.error('Error creating audio:', error);
@@ -825,13 +849,26 @@ class CompleteTestManager {
         }
     }
 
+    async createSession() {
+        const response = await fetch('/api/test_sessions', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ api_key: this.apiKey })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        return data.session_id;
+    }
+
     async processTaskRecording(audioBlob, questionText, taskNum, totalTime) {
         const container = document.getElementById('taskContainer');
         container.innerHTML = `
-            <h3>Task ${taskNum} - Processing...</h3>
+            <h3>Task ${taskNum} - Saving your response...</h3>
             <div class="ai-loading">
                 <div class="ai-loading-content">
-                    <div class="ai-loading-text">Transcribing and evaluating...</div>
+                    <div class="ai-loading-text">Uploading...</div>
                     <div class="loading-dots">
                         <div class="loading-dot"></div>
                         <div class="loading-dot"></div>
@@ -841,142 +878,82 @@ class CompleteTestManager {
             </div>
         `;
 
+        const result = {
+            taskNum: taskNum,
+            question: questionText,
+            transcript: '',
+            wordCount: 0,
+            speakingTime: totalTime,
+            evaluation: null
+        };
+
         try {
-            // Transcribe
+            // Hand the recording to the session; transcription and evaluation happen in the background
+            const sessionId = await this.sessionReady;
+            const readingTexts = { 2: this.task2Reading, 3: this.task3Reading };
+            const hasAudio = { 2: this.task2HasAudio, 3: this.task3HasAudio, 4: this.task4HasAudio };
+
             const formData = new FormData();
             formData.append('audio', audioBlob);
+            formData.append('task', taskNum);
+            formData.append('data', JSON.stringify({
+                question: questionText,
+                speaking_time: totalTime,
+                reading_text: readingTexts[taskNum] || '',
+                has_audio: hasAudio[taskNum] || false,
+                prompt_id: this.promptIds[taskNum] || null
+            }));
 
-            const transcribeResponse = await fetch('/transcribe', {
+            const uploadResponse = await fetch(`/api/test_sessions/${sessionId}/tasks`, {
                 method: 'POST',
                 body: formData
             });
+            const uploadData = await uploadResponse.json();
 
-            if (!transcribeResponse.ok) {
-                throw new Error(`Transcription failed: ${transcribeResponse.statusText}`);
-            }
-
-            const transcribeData = await transcribeResponse.json();
-            console.log('Transcribe response:', transcribeData);
-
-            // Backend returns 'transcript', not 'text'
-            const transcript = transcribeData.transcript || '';
-            const wordCount = transcribeData.word_count || (transcript ? transcript.split(/\s+/).filter(w => w.length > 0).length : 0);
-
-            // Get AI evaluation if API key is available
-            let evaluation = null;
-            if (this.apiKey && !this.realTestConditions) {
-                try {
-                    container.innerHTML = `
-                        <h3>Task ${taskNum} - Getting AI feedback...</h3>
-                        <div class="ai-loading">
-                            <div class="ai-loading-content">
-                                <div class="ai-loading-text">Evaluating your response...</div>
-                                <div class="loading-dots">
-                                    <div class="loading-dot"></div>
-                                    <div class="loading-dot"></div>
-                                    <div class="loading-dot"></div>
-                                </div>
-                            </div>
-                        </div>
-                    `;
-
-                    const evalResponse = await fetch('/evaluate', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            api_key: this.apiKey,
-                            question: questionText,
-                            transcript: transcript,
-                            task_number: taskNum
-                        })
-                    });
-
-                    const evalData = await evalResponse.json();
-                    console.log('Evaluation response:', evalData);
-                    evaluation = evalData.feedback || evalData.evaluation || 'Evaluation not available';
-                } catch (error) {
-                    console.error('Error getting evaluation:', error);
-                    evaluation = 'Error getting evaluation: ' + error.message;
-                }
+            if (!uploadResponse.ok) {
+                throw new Error(uploadData.error || uploadResponse.statusText);
             }
 
-            // Store result with evaluation
-            this.results.push({
-                taskNum: taskNum,
-                question: questionText,
-                transcript: transcript,
-                wordCount: wordCount,
-                speakingTime: totalTime,
-                evaluation: evaluation
-            });
+            result.sessionIndex = uploadData.index;
+            this.results.push(result);
+        } catch (error) {
+            console.error('Error processing task:', error);
+            // Still move to next task even if the upload fails
+            result.transcript = '[Transcription failed]';
+            result.error = error.message;
+            this.results.push(result);
+        }
 
-            // Show intermediate results if not in real test conditions
-            if (!this.realTestConditions) {
-                container.innerHTML = `
-                    <div class="task-result-container">
-                        <h3>Task ${taskNum} Results</h3>
-
-                        <div class="result-section">
-                            <h4>Your Response</h4>
-                            <p><strong>Word count:</strong> ${wordCount} words | <strong>Speaking time:</strong> ${totalTime}s</p>
-                            <div class="transcription-box">
-                                ${transcript || 'No transcription available'}
-                            </div>
-                        </div>
+        this.currentTaskIndex++;
 
-                        ${evaluation ? `
-                            <div class="result-section">
-                                <h4>AI Evaluation</h4>
-                                <div class="evaluation-box">
-                                    ${evaluation}
-                                </div>
-                                <button id="saveVocabBtn" class="btn btn-success" style="margin-top: 15px; width: 100%;">
-                                    Save Vocabulary Section to Flashcards
-                                </button>
-                            </div>
-                        ` : ''}
-
-                        <div style="text-align: center; margin-top: 30px;">
-                            <button id="continueBtn" class="btn btn-primary btn-large">Continue to Next Task</button>
-                        </div>
+        // Show intermediate screen if not in real test conditions
+        if (!this.realTestConditions) {
+            container.innerHTML = `
+                <div class="task-result-container">
+                    <h3>Task ${taskNum} recorded</h3>
+
+                    <div class="result-section">
+                        <p><strong>Speaking time:</strong> ${totalTime}s</p>
+                        ${result.error ? `
+                            <div class="alert alert-warning">Your response could not be saved: ${result.error}</div>
+                        ` : `
+                            <p class="instruction-text">Your response is being transcribed${this.apiKey ? ' and evaluated' : ''} in the background. All results are shown at the end of the test.</p>
+                        `}
                     </div>
-                `;
-
-                // Wait for user to click continue
-                document.getElementById('continueBtn').addEventListener('click', () => {
-                    this.currentTaskIndex++;
-                    this.runNextTask();
-                });
 
-                // Add vocabulary save functionality if button exists
-                const saveVocabBtn = document.getElementById('saveVocabBtn');
-                if (saveVocabBtn) {
-                    saveVocabBtn.addEventListener('click', () => this.saveVocabularyCard(evaluation, taskNum));
-                }
-            } else {
-                // Real test conditions - move to next task automatically
-                this.currentTaskIndex++;
-                container.innerHTML = `<h3>Task ${taskNum} completed! Moving to next task...</h3>`;
-                setTimeout(() => {
-                    this.runNextTask();
-                }, 2000);
-            }
+                    <div style="text-align: center; margin-top: 30px;">
+                        <button id="continueBtn" class="btn btn-primary btn-large">Continue to Next Task</button>
+                    </div>
+                </div>
+            `;
 
-        } catch (error) {
-            console.error('Error processing task:', error);
-            // Still move to next task even if transcription fails
-            this.results.push({
-                taskNum: taskNum,
-                question: questionText,
-                transcript: '[Transcription failed]',
-                wordCount: 0,
-                speakingTime: totalTime,
-                error: error.message
+            // Wait for user to click continue
+            document.getElementById('continueBtn').addEventListener('click', () => {
+                this.runNextTask();
             });
-
-            this.currentTaskIndex++;
-            container.innerHTML = `<div class="alert alert-warning">Task ${taskNum} completed (transcription failed). Moving to next task...</div>`;
-
+        } else {
+            // Real test conditions - move to next task automatically
+            container.innerHTML = `<h3>Task ${taskNum} completed! Moving to next task...</h3>`;
             setTimeout(() => {
                 this.runNextTask();
             }, 2000);
@@ -1144,22 +1121,104 @@ class CompleteTestManager {
                 <div class="transcription-container" style="margin-bottom: 30px;">
                     <h3>Task ${result.taskNum}</h3>
                     <p><strong>Question:</strong> ${result.question.substring(0, 100)}...</p>
-                    <p><strong>Word count:</strong> ${result.wordCount} words</p>
-                    <div style="background: white; padding: 15px; border: 1px solid #ddd; margin-top: 10px;">
-                        ${result.transcript}
+                    <p><strong>Word count:</strong> <span id="taskWordCount${index}">${result.wordCount}</span> words</p>
+                    <div id="taskTranscript${index}" style="background: white; padding: 15px; border: 1px solid #ddd; margin-top: 10px;">
+                        ${result.transcript || 'Transcribing...'}
                     </div>
+                    <div id="taskEvaluation${index}"></div>
                 </div>
             `;
         });
 
         resultsDiv.innerHTML = resultsHtml;
 
-        // If API key is available, get combined evaluation
-        if (this.apiKey) {
-            resultsDiv.innerHTML += `
+        // Most tasks were processed while the test went on; wait for the ones still running
+        const pending = this.results.filter(result => !result.error);
+        if (pending.length > 0) {
+            await this.waitForSession();
+        }
+    }
+
+    async waitForSession() {
+        const shown = new Set();
+        try {
+            const sessionId = await this.sessionReady;
+            while (true) {
+                const response = await fetch(`/api/test_sessions/${sessionId}`);
+                const session = await response.json();
+                if (!response.ok) {
+                    throw new Error(session.error || response.statusText);
+                }
+
+                session.tasks.forEach(task => {
+                    const index = this.results.findIndex(result => result.sessionIndex === task.index);
+                    if (index !== -1) {
+                        this.showTaskStatus(index, task, shown);
+                    }
+                });
+
+                if (session.status === 'done') {
+                    return;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        } catch (error) {
+            console.error('Error getting results:', error);
+            this.results.forEach((result, index) => {
+                const container = document.getElementById(`taskEvaluation${index}`);
+                if (container && !shown.has(index)) {
+                    container.innerHTML = `<div class="alert alert-error">Error getting results: ${error.message}</div>`;
+                }
+            });
+        }
+    }
+
+    showTaskStatus(index, task, shown) {
+        const result = this.results[index];
+        const container = document.getElementById(`taskEvaluation${index}`);
+
+        if (task.transcript !== undefined && !result.transcript) {
+            result.transcript = task.transcript || 'No transcription available';
+            result.wordCount = task.word_count || 0;
+            document.getElementById(`taskTranscript${index}`).innerHTML = result.transcript;
+            document.getElementById(`taskWordCount${index}`).textContent = result.wordCount;
+        }
+
+        if (shown.has(index)) return;
+
+        if (task.status === 'error') {
+            shown.add(index);
+            result.error = task.error;
+            if (!result.transcript) {
+                document.getElementById(`taskTranscript${index}`).innerHTML = '[Transcription failed]';
+            }
+            container.innerHTML = `<div class="alert alert-error">${task.error}</div>`;
+        } else if (task.status === 'done') {
+            shown.add(index);
+            if (!task.feedback) {
+                container.innerHTML = '';
+                return;
+            }
+            result.evaluation = task.feedback;
+            container.innerHTML = `
+                <div class="result-section">
+                    <h4>AI Evaluation</h4>
+                    <div class="evaluation-box">
+                        ${result.evaluation}
+                    </div>
+                    <button class="btn btn-success save-vocab-btn" style="margin-top: 15px; width: 100%;">
+                        Save Vocabulary Section to Flashcards
+                    </button>
+                </div>
+            `;
+            container.querySelector('.save-vocab-btn').addEventListener('click', () => {
+                this.saveVocabularyCard(result.evaluation, result.taskNum);
+            });
+        } else if (!container.querySelector('.ai-loading')) {
+            container.innerHTML = `
                 <div class="ai-loading">
                     <div class="ai-loading-content">
-                        <div class="ai-loading-text">Getting comprehensive evaluation...</div>
+                        <div class="ai-loading-text">${task.status === 'evaluating' ? 'Evaluating' : 'Transcribing'} Task ${result.taskNum}...</div>
                         <div class="loading-dots">
                             <div class="loading-dot"></div>
                             <div class="loading-dot"></div>
@@ -1168,24 +1227,18 @@ class CompleteTestManager {
                     </div>
                 </div>
             `;
-
-            // Here you could implement a combined evaluation call
-            // For now, we'll just remove the loading indicator
-            setTimeout(() => {
-                const loadingIndicator = resultsDiv.querySelector('.ai-loading');
-                if (loadingIndicator) loadingIndicator.remove();
-
-                resultsDiv.innerHTML += `
-                    <div class="alert alert-error">
-                        Combined AI evaluation is coming soon. Individual task evaluations are available in the single task mode.
-                    </div>
-                `;
-            }, 1000);
+        } else {
+            container.querySelector('.ai-loading-text').textContent =
+                `${task.status === 'evaluating' ? 'Evaluating' : 'Transcribing'} Task ${result.taskNum}...`;
         }
     }
 
     restart() {
-        // Reset everything
+        // Reset everything; the previous session's pending work is cancelled
+        if (this.sessionReady) {
+            this.sessionReady.then(sessionId => fetch(`/api/test_sessions/${sessionId}`, { method: 'DELETE' })).catch(() => {});
+            this.sessionReady = null;
+        }
         this.currentTaskIndex = 0;
         this.results = [];
 
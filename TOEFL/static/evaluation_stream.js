@@ -0,0 +1,107 @@
+// Streamed AI feedback: the /stream variant of an evaluate endpoint sends the
+// report as server-sent events, one per <h4> section, while the model is still
+// writing it. onSection(html, index) is called for each of them, and the
+// promise resolves to the same { feedback } / { error } object as the plain
+// JSON endpoint (with `evaluation`, the scores and sections as data, when the
+// server is in JSON mode), so pages can keep their existing handling of the result.
+
+async function streamEvaluation(url, body, onSection = null) {
+    const response = await postEvaluation(url, body);
+
+    // Errors raised before the stream starts (missing key, rejected request) are plain JSON
+    if (!isEventStream(response)) {
+        return await response.json();
+    }
+
+    let result = { error: 'The evaluation stream ended before the feedback was complete' };
+    await readServerSentEvents(response, message => {
+        if (message.event === 'section') {
+            if (onSection) onSection(message.data.html, message.data.index);
+            return false;
+        }
+        if (message.event === 'done') {
+            result = message.data;
+        } else if (message.event === 'error') {
+            result = { error: message.data.error };
+        }
+        return true;
+    });
+    return result;
+}
+
+// Batch evaluation: /evaluate/batch takes { api_key, tasks: [...] } and
+// evaluates every task concurrently. onResult({ index, id, feedback | error })
+// is called as each one finishes, in completion order; the promise resolves
+// to { completed, failed } or { error }.
+async function streamBatchEvaluation(url, body, onResult) {
+    const response = await postEvaluation(url, body);
+
+    if (!isEventStream(response)) {
+        return await response.json();
+    }
+
+    let summary = { error: 'The evaluation stream ended before every task was evaluated' };
+    await readServerSentEvents(response, message => {
+        if (message.event === 'result') {
+            onResult(message.data);
+            return false;
+        }
+        if (message.event === 'done') {
+            summary = message.data;
+        }
+        return true;
+    });
+    return summary;
+}
+
+function postEvaluation(url, body) {
+    return fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+}
+
+function isEventStream(response) {
+    const contentType = response.headers.get('Content-Type') || '';
+    return contentType.startsWith('text/event-stream');
+}
+
+// Calls onMessage for each event until it returns true or the stream ends
+async function readServerSentEvents(response, onMessage) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            return;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = parseServerSentEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (onMessage(message)) {
+                reader.cancel();
+                return;
+            }
+        }
+    }
+}
+
+function parseServerSentEvent(text) {
+    let event = 'message';
+    const dataLines = [];
+    text.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trimStart());
+        }
+    });
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
@@ -8,6 +8,7 @@ class TOEFLPracticeTool {
         this.timerInterval = null;
         this.mediaRecorder = null;
         this.audioChunks = [];
+        this.streamingTranscriber = null;
         this.recording = false;
         this.apiKey = '';
         this.currentTranscript = '';
@@ -146,24 +147,11 @@ class TOEFLPracticeTool {
     }
 
     async createAudio(text) {
-        try {
-            const response = await fetch('/create_audio', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text: text })
-            });
-
-            const data = await response.json();
-            if (data.error) {
-                console.error('Error creating audio:', data.error);
-                return null;
-            }
-
-            return 'data:audio/mp3;base64,' + data.audio;
-        } catch (error) {
-            console.error('Error creating audio:', error);
+        if (!text) {
             return null;
         }
+        // The server streams the MP3, so the player can start before synthesis is over
+        return '/create_audio?text=' + encodeURIComponent(text);
     }
 
     playBeep() {
@@ -290,15 +278,20 @@ class TOEFLPracticeTool {
             this.mediaRecorder = new MediaRecorder(stream);
             this.audioChunks = [];
 
+            // Transcribe while recording so the transcript is ready when time is up
+            this.streamingTranscriber = new StreamingTranscriber('liveTranscript', 'task1');
+            this.streamingTranscriber.start();
+
             this.mediaRecorder.ondataavailable = (event) => {
                 this.audioChunks.push(event.data);
+                this.streamingTranscriber.push(event.data);
             };
 
             this.mediaRecorder.onstop = () => {
                 this.handleRecordingStopped();
             };
 
-            this.mediaRecorder.start();
+            this.mediaRecorder.start(1000); // Emit a chunk every second for streaming transcription
             this.recording = true;
             document.getElementById('recordingIndicator').classList.add('active');
 
@@ -352,8 +345,7 @@ class TOEFLPracticeTool {
         transcriptionDiv.className = 'progress-container';
         transcriptionDiv.innerHTML = '<div class="progress-status processing">Preparing audio for transcription...</div>';
 
-        // Convert to MP3 and transcribe
-        await this.convertToMP3(audioBlob);
+        // Transcribe and convert to MP3 (one upload for both when not streamed)
         await this.transcribeAudio(audioBlob);
     }
 
@@ -367,57 +359,83 @@ class TOEFLPracticeTool {
                 body: formData
             });
 
-            const data = await response.json();
-            if (data.error) {
-                document.getElementById('downloadSection').innerHTML =
-                    `<div style="color: red;">Error converting audio: ${data.error}</div>`;
+            if (!response.ok) {
+                const data = await response.json();
+                this.showConversionError(data.error || response.statusText);
                 return;
             }
 
-            // Create download button
-            const downloadBtn = document.createElement('button');
-            downloadBtn.className = 'download-btn';
-            downloadBtn.textContent = 'Download MP3';
-            downloadBtn.onclick = () => {
-                const link = document.createElement('a');
-                link.href = 'data:audio/mp3;base64,' + data.mp3;
-                link.download = 'recording.mp3';
-                document.body.appendChild(link);
-                link.click();
-                document.body.removeChild(link);
-            };
-
-            document.getElementById('downloadSection').innerHTML = '';
-            document.getElementById('downloadSection').appendChild(downloadBtn);
+            // The MP3 comes back as a binary body (no base64 to decode)
+            const mp3Blob = await response.blob();
+            this.showDownloadButton(URL.createObjectURL(mp3Blob));
 
         } catch (error) {
             console.error('Error converting to MP3:', error);
-            document.getElementById('downloadSection').innerHTML =
-                `<div style="color: red;">Error converting audio: ${error}</div>`;
+            this.showConversionError(error);
         }
     }
 
+    showDownloadButton(href) {
+        const downloadBtn = document.createElement('button');
+        downloadBtn.className = 'download-btn';
+        downloadBtn.textContent = 'Download MP3';
+        downloadBtn.onclick = () => {
+            const link = document.createElement('a');
+            link.href = href;
+            link.download = 'recording.mp3';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+        };
+
+        document.getElementById('downloadSection').innerHTML = '';
+        document.getElementById('downloadSection').appendChild(downloadBtn);
+    }
+
+    showConversionError(error) {
+        document.getElementById('downloadSection').innerHTML =
+            `<div style="color: red;">Error converting audio: ${error}</div>`;
+    }
+
     async transcribeAudio(audioBlob) {
         try {
             const transcriptionDiv = document.getElementById('transcriptionResults');
             transcriptionDiv.innerHTML = '<div class="progress-status processing">Performing transcription in English...</div>';
 
-            const formData = new FormData();
-            formData.append('audio', audioBlob);
+            // Use the streamed transcript if available (then only the MP3 is left to convert),
+            // otherwise upload the recording once for both the transcript and the MP3
+            let data = this.streamingTranscriber ? await this.streamingTranscriber.finish() : null;
 
-            const response = await fetch('/transcribe', {
-                method: 'POST',
-                body: formData
-            });
+            if (data) {
+                await this.convertToMP3(audioBlob);
+            } else {
+                const formData = new FormData();
+                formData.append('audio', audioBlob);
+                formData.append('task', 'task1');
+
+                const response = await fetch('/transcribe_with_mp3', {
+                    method: 'POST',
+                    body: formData
+                });
+
+                data = await response.json();
+                if (data.mp3_url) {
+                    this.showDownloadButton(data.mp3_url);
+                } else {
+                    this.showConversionError(data.error || response.statusText);
+                }
+            }
 
-            const data = await response.json();
             if (data.error) {
                 transcriptionDiv.innerHTML =
                     `<div class="transcription-container"><p style="color: red;">Error during transcription: ${data.error}</p></div>`;
                 return;
             }
 
-            const wpm = (data.word_count / this.speakingTime * 60).toFixed(1);
+            // Prefer the server's timing (word timestamps) over the timer length
+            const wpm = data.fluency && data.fluency.speaking_rate_wpm
+                ? data.fluency.speaking_rate_wpm.toFixed(1)
+                : (data.word_count / this.speakingTime * 60).toFixed(1);
 
             // Store transcript for LLM evaluation
             this.currentTranscript = data.transcript;
@@ -436,7 +454,7 @@ class TOEFLPracticeTool {
 
             // If API key is provided, request AI feedback
             if (this.apiKey) {
-                await this.getAIFeedback(this.currentPromptText, data.transcript, data.word_count);
+                await this.getAIFeedback(this.currentPromptText, data.transcript, data.word_count, data.transcript_id);
             }
 
         } catch (error) {
@@ -546,7 +564,7 @@ class TOEFLPracticeTool {
         }
     }
 
-    async getAIFeedback(question, transcript, wordCount) {
+    async getAIFeedback(question, transcript, wordCount, transcriptId = null) {
         try {
             const transcriptionDiv = document.getElementById('transcriptionResults');
 
@@ -564,19 +582,33 @@ class TOEFLPracticeTool {
                 </div>
             `;
 
-            const response = await fetch('/evaluate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    api_key: this.apiKey,
-                    question: question,
-                    transcript: transcript,
-                    word_count: wordCount,
-                    speaking_time: this.speakingTime
-                })
-            });
+            // Cards appear one by one while the feedback is streamed
+            let feedbackContent = null;
+            const showFeedback = () => {
+                if (!feedbackContent) {
+                    const loadingIndicator = transcriptionDiv.querySelector('.ai-loading');
+                    if (loadingIndicator) loadingIndicator.remove();
+                    transcriptionDiv.insertAdjacentHTML('beforeend', `
+                        <div class="ai-feedback">
+                            <h3>AI Feedback & Evaluation</h3>
+                            <div class="ai-feedback-content"></div>
+                        </div>
+                    `);
+                    feedbackContent = transcriptionDiv.lastElementChild.querySelector('.ai-feedback-content');
+                }
+                return feedbackContent;
+            };
 
-            const data = await response.json();
+            const data = await streamEvaluation('/evaluate/stream', {
+                api_key: this.apiKey,
+                question: question,
+                transcript: transcript,
+                word_count: wordCount,
+                speaking_time: this.speakingTime,
+                transcript_id: transcriptId
+            }, section => {
+                showFeedback().insertAdjacentHTML('beforeend', this.formatFeedbackIntoCards(section));
+            });
 
             if (data.error) {
                 transcriptionDiv.innerHTML += `<div class="ai-feedback"><p style="color: red;">AI Feedback Error: ${data.error}</p></div>`;
@@ -587,20 +619,11 @@ class TOEFLPracticeTool {
             const loadingIndicator = transcriptionDiv.querySelector('.ai-loading');
             if (loadingIndicator) loadingIndicator.remove();
 
-            // Parse the feedback and wrap sections in cards
-            const formattedFeedback = this.formatFeedbackIntoCards(data.feedback);
-
-            transcriptionDiv.innerHTML += `
-                <div class="ai-feedback">
-                    <h3>AI Feedback & Evaluation</h3>
-                    <div class="ai-feedback-content">
-                        ${formattedFeedback}
-                    </div>
-                </div>
-            `;
+            // Render the complete feedback again so that the cards are numbered in order
+            showFeedback().innerHTML = this.formatFeedbackIntoCards(data.feedback);
 
             // Add event listeners to save vocabulary buttons
-            const saveButtons = transcriptionDiv.querySelectorAll('.save-vocab-btn');
+            const saveButtons = feedbackContent.querySelectorAll('.save-vocab-btn');
             saveButtons.forEach(button => {
                 button.addEventListener('click', () => {
                     const card = button.closest('.feedback-card');
@@ -665,6 +688,7 @@ class TOEFLPracticeTool {
         // Reset recorder
         this.mediaRecorder = null;
         this.audioChunks = [];
+        this.streamingTranscriber = null;
         this.recording = false;
     }
 }
@@ -0,0 +1,131 @@
+// Streaming transcription: recorder chunks are uploaded while the student is
+// still speaking, so the transcript is (almost) ready when recording stops.
+// If streaming is unavailable, finish() returns null and the page falls back
+// to uploading the whole recording to /transcribe; the server-side session is
+// then cancelled, as it is when the page is left before finish().
+// The task name lets the server pick the transcription profile configured for it.
+
+class StreamingTranscriber {
+    constructor(liveElementId = null, task = null) {
+        this.task = task;
+        this.sessionId = null;
+        this.failed = false;
+        this.result = null;
+        this.segments = [];
+        this.liveElement = liveElementId ? document.getElementById(liveElementId) : null;
+
+        // Every request is chained on this promise so chunks arrive in order
+        this.uploads = Promise.resolve();
+        this.onPageHide = () => this.cancel();
+    }
+
+    start() {
+        this.uploads = this.uploads.then(async () => {
+            try {
+                const query = this.task ? `?task=${encodeURIComponent(this.task)}` : '';
+                const response = await fetch(`/transcribe/stream${query}`, { method: 'POST' });
+                const data = await response.json();
+                if (!response.ok || data.error) {
+                    throw new Error(data.error || response.statusText);
+                }
+                this.sessionId = data.session_id;
+                window.addEventListener('pagehide', this.onPageHide);
+            } catch (error) {
+                console.warn('Streaming transcription unavailable:', error);
+                this.failed = true;
+            }
+        });
+        this.renderLive();
+    }
+
+    push(chunk) {
+        if (this.failed || !chunk || chunk.size === 0) {
+            return;
+        }
+
+        this.uploads = this.uploads.then(async () => {
+            if (this.failed || !this.sessionId) {
+                return;
+            }
+            try {
+                const response = await fetch(`/transcribe/stream/${this.sessionId}/chunk?since=${this.segments.length}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: chunk
+                });
+                const data = await response.json();
+                if (!response.ok || data.error) {
+                    throw new Error(data.error || response.statusText);
+                }
+                this.addSegments(data.segments);
+            } catch (error) {
+                console.warn('Streaming transcription failed:', error);
+                this.failed = true;
+                this.cancel();
+            }
+        });
+    }
+
+    async finish() {
+        await this.uploads;
+        if (this.result) {
+            return this.result;
+        }
+        if (this.failed || !this.sessionId) {
+            this.cancel();
+            return null;
+        }
+
+        try {
+            const response = await fetch(`/transcribe/stream/${this.sessionId}/finish`, { method: 'POST' });
+            const data = await response.json();
+            if (!response.ok || data.error) {
+                throw new Error(data.error || response.statusText);
+            }
+            this.result = data;
+            this.release();
+            return data;
+        } catch (error) {
+            console.warn('Streaming transcription failed:', error);
+            this.failed = true;
+            this.cancel();
+            return null;
+        } finally {
+            this.clearLive();
+        }
+    }
+
+    // Drop the server-side session and its decoder (keepalive lets it outlive the page)
+    cancel() {
+        const sessionId = this.sessionId;
+        this.release();
+        if (sessionId) {
+            fetch(`/transcribe/stream/${sessionId}`, { method: 'DELETE', keepalive: true }).catch(() => {});
+        }
+    }
+
+    release() {
+        this.sessionId = null;
+        window.removeEventListener('pagehide', this.onPageHide);
+    }
+
+    addSegments(segments) {
+        if (!segments || segments.length === 0) {
+            return;
+        }
+        this.segments.push(...segments);
+        this.renderLive();
+    }
+
+    renderLive() {
+        if (this.liveElement) {
+            this.liveElement.textContent = this.segments.join('\n');
+        }
+    }
+
+    clearLive() {
+        if (this.liveElement) {
+            this.liveElement.textContent = '';
+        }
+    }
+}
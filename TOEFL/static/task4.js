@@ -9,6 +9,7 @@ class Task4Manager {
         this.mediaRecorder = null;
         this.audioChunks = [];
         this.recordedBlob = null;
+        this.streamingTranscriber = null;
         this.currentPhase = 'setup';
         this.prepTimeLeft = 30;
         this.speakingTimeLeft = 60;
@@ -538,8 +539,13 @@ class Task4Manager {
             this.mediaRecorder = new MediaRecorder(stream);
             this.audioChunks = [];
 
+            // Transcribe while recording so the transcript is ready when time is up
+            this.streamingTranscriber = new StreamingTranscriber('liveTranscript', 'task4');
+            this.streamingTranscriber.start();
+
             this.mediaRecorder.ondataavailable = (event) => {
                 this.audioChunks.push(event.data);
+                this.streamingTranscriber.push(event.data);
             };
 
             this.mediaRecorder.onstop = () => {
@@ -547,7 +553,7 @@ class Task4Manager {
                 this.processRecording();
             };
 
-            this.mediaRecorder.start();
+            this.mediaRecorder.start(1000); // Emit a chunk every second for streaming transcription
 
             // Start speaking timer
             const speakingTimerSpan = document.getElementById('speakingTimer');
@@ -606,23 +612,29 @@ class Task4Manager {
         resultsDiv.innerHTML = '<h3>Transcribing your response...</h3>';
 
         try {
-            const formData = new FormData();
-            formData.append('audio', this.recordedBlob);
+            // Use the streamed transcript if available, otherwise upload the whole recording
+            let data = this.streamingTranscriber ? await this.streamingTranscriber.finish() : null;
 
-            const response = await fetch('/transcribe', {
-                method: 'POST',
-                body: formData
-            });
+            if (!data) {
+                const formData = new FormData();
+                formData.append('audio', this.recordedBlob);
+                formData.append('task', 'task4');
 
-            const data = await response.json();
+                const response = await fetch('/transcribe', {
+                    method: 'POST',
+                    body: formData
+                });
+
+                data = await response.json();
+            }
 
             if (data.error) {
                 resultsDiv.innerHTML = `<div class="alert alert-error">Transcription error: ${data.error}</div>`;
                 return;
             }
 
-            const transcript = data.text;
-            const wordCount = transcript.split(/\s+/).filter(w => w.length > 0).length;
+            const transcript = data.transcript;
+            const wordCount = data.word_count;
             const speakingTime = 60 - this.speakingTimeLeft;
 
             // Display transcript
@@ -639,7 +651,7 @@ class Task4Manager {
 
             // Get AI evaluation if API key is provided
             if (this.apiKey) {
-                await this.getAIEvaluation(transcript, wordCount, speakingTime);
+                await this.getAIEvaluation(transcript, wordCount, speakingTime, data.transcript_id);
             } else {
                 resultsDiv.innerHTML += `
                     <div class="alert alert-error">
@@ -653,7 +665,7 @@ class Task4Manager {
         }
     }
 
-    async getAIEvaluation(transcript, wordCount, speakingTime) {
+    async getAIEvaluation(transcript, wordCount, speakingTime, transcriptId = null) {
         const resultsDiv = document.getElementById('transcriptionResults');
 
         // Add loading indicator
@@ -671,20 +683,35 @@ class Task4Manager {
         `;
 
         try {
-            const response = await fetch(`/api/task/${this.taskNumber}/evaluate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    api_key: this.apiKey,
-                    transcript: transcript,
-                    word_count: wordCount,
-                    speaking_time: speakingTime,
-                    notes: this.notes,
-                    has_audio: this.hasAudio
-                })
-            });
+            // Cards appear one by one while the feedback is streamed
+            let feedbackContent = null;
+            const showFeedback = () => {
+                if (!feedbackContent) {
+                    const loadingIndicator = resultsDiv.querySelector('.ai-loading');
+                    if (loadingIndicator) loadingIndicator.remove();
+                    resultsDiv.insertAdjacentHTML('beforeend', `
+                        <div class="ai-feedback">
+                            <h3>AI Feedback & Evaluation</h3>
+                            <div class="ai-feedback-content"></div>
+                        </div>
+                    `);
+                    feedbackContent = resultsDiv.lastElementChild.querySelector('.ai-feedback-content');
+                }
+                return feedbackContent;
+            };
 
-            const data = await response.json();
+            const data = await streamEvaluation(`/api/task/${this.taskNumber}/evaluate/stream`, {
+                api_key: this.apiKey,
+                transcript: transcript,
+                word_count: wordCount,
+                speaking_time: speakingTime,
+                transcript_id: transcriptId,
+                notes: this.notes,
+                has_audio: this.hasAudio,
+                prompt_id: this.currentPromptId
+            }, section => {
+                showFeedback().insertAdjacentHTML('beforeend', this.formatFeedbackIntoCards(section));
+            });
 
             // Remove loading indicator
             const loadingIndicator = resultsDiv.querySelector('.ai-loading');
@@ -695,19 +722,11 @@ class Task4Manager {
                 return;
             }
 
-            // Format and display feedback in cards
-            const formattedFeedback = this.formatFeedbackIntoCards(data.feedback);
-            resultsDiv.innerHTML += `
-                <div class="ai-feedback">
-                    <h3>AI Feedback & Evaluation</h3>
-                    <div class="ai-feedback-content">
-                        ${formattedFeedback}
-                    </div>
-                </div>
-            `;
+            // Render the complete feedback again so that the cards are numbered in order
+            showFeedback().innerHTML = this.formatFeedbackIntoCards(data.feedback);
 
             // Add event listeners to save vocabulary buttons
-            const saveButtons = resultsDiv.querySelectorAll('.save-vocab-btn');
+            const saveButtons = feedbackContent.querySelectorAll('.save-vocab-btn');
             saveButtons.forEach(button => {
                 button.addEventListener('click', () => {
                     const card = button.closest('.feedback-card');
@@ -820,6 +839,7 @@ class Task4Manager {
         this.currentPhase = 'setup';
         this.audioChunks = [];
         this.recordedBlob = null;
+        this.streamingTranscriber = null;
 
         // Hide practice screen, show setup screen
         document.getElementById('practiceScreen').style.display = 'none';
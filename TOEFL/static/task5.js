@@ -620,6 +620,7 @@ class Task5Manager {
                     text: this.writtenText,
                     word_count: wordCount,
                     reading_text: this.readingText,
+                    prompt_id: this.currentPromptId,
                     api_key: this.apiKey
                 })
             });
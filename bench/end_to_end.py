@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end latency and throughput benchmark of the practice flows, offline.
+
+Each app is served on a local port with OpenAI replaced by the mock server
+and gTTS by the stand-in from bench/stand_ins.py (Whisper and ffmpeg are the
+real ones). Every session then goes through what a student does:
+
+    TOEFL: prompt audio (/create_audio) -> record + transcribe (/transcribe_with_mp3)
+           -> evaluate (/api/task/2/evaluate/stream, or /api/task/2/evaluate with --plain)
+    IELTS: prompt audio (/create_audio) -> record + transcribe (/transcribe)
+           -> evaluate (/evaluate/stream, or /evaluate with --plain)
+
+The "recordings" are the bundled TOEFL/data/task*/audio/*.mp3 files (--audio
+for others). The report gives p50/p95/p99 per step (plus time to the first
+feedback section when streaming) and sessions and requests per second.
+
+Usage:
+    python bench/end_to_end.py [--app TOEFL|IELTS|both] [--sessions 20] [--concurrency 4]
+                               [--latency 0.4] [--tokens-per-second 80] [--failure-rate 0]
+
+The transcript and evaluation caches are disabled unless --warm-caches is
+given, so every session pays for the full pipeline, and the rate limits on
+model calls are lifted. data/config.json is read but never written.
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import multiprocessing
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from stand_ins import MockOpenAIServer, StandInTTS
+
+ROOT = Path(__file__).resolve().parent.parent
+AUDIO_GLOB = 'TOEFL/data/task*/audio/*.mp3'
+APPS = ('TOEFL', 'IELTS')
+QUESTION = ("Some people prefer to study alone, while others prefer to study in groups. "
+            "Which do you prefer and why? Use specific reasons and examples to support your answer.")
+
+def load_app(name, overrides):
+    """Import <name>/app.py with config.json overridden in memory and gTTS replaced by the stand-in"""
+    spec = importlib.util.spec_from_file_location(f'{name.lower()}_bench_app', ROOT / name / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    # Registered first, so that Flask finds the app's root path (templates/, static/) from its module
+    sys.modules[spec.name] = module
+
+    # Imported outside the main process the app starts no background work, so the
+    # Whisper loader below reads the overridden config and no reference indexing runs
+    process = multiprocessing.current_process()
+    process_name, process.name = process.name, 'bench-import'
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        process.name = process_name
+
+    load_config = module.load_config
+    module.load_config = lambda: dict(load_config(), **overrides)
+    module.gTTS = StandInTTS
+    module.start_whisper_loader()
+    return module
+
+def serve(module):
+    """Serve the Flask app on a free local port; returns (server, base URL)"""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def wait_until_ready(base_url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f'{base_url}/readyz', timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        if response.json().get('status') == 'error':
+            raise SystemExit(f"Whisper failed to load: {response.json().get('error')}")
+        time.sleep(1)
+    raise SystemExit(f"Whisper was not ready after {timeout:.0f} s")
+
+def timed(results, step, call):
+    """Run call(), record its latency under `step`; returns its result or None on failure"""
+    start = time.perf_counter()
+    try:
+        result = call()
+    except Exception as e:
+        results['errors'].setdefault(step, []).append(str(e))
+        return None
+    results['latency'].setdefault(step, []).append(time.perf_counter() - start)
+    return result
+
+def checked(response):
+    if response.status_code >= 400:
+        try:
+            message = response.json().get('error', response.text)
+        except ValueError:
+            message = response.text
+        raise RuntimeError(f"HTTP {response.status_code}: {message}")
+    return response
+
+def read_evaluation_stream(response, results, start):
+    """Consume a server-sent event stream, recording the time to the first section"""
+    checked(response)
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event:'):
+            event = line[6:].strip()
+            if event == 'section' and 'first' not in results:
+                results['first'] = time.perf_counter() - start
+        elif line.startswith('data:') and event in ('done', 'error'):
+            data = json.loads(line[5:])
+            if event == 'error':
+                raise RuntimeError(data['error'])
+            return data['feedback']
+    raise RuntimeError('Stream ended without a result')
+
+def run_session(app_name, base_url, audio_path, plain, results):
+    """One prompt -> record -> transcribe -> evaluate flow"""
+    session = requests.Session()
+
+    timed(results, 'prompt audio', lambda: checked(
+        session.get(f'{base_url}/create_audio', params={'text': QUESTION}, timeout=120)).content)
+
+    upload = '/transcribe_with_mp3' if app_name == 'TOEFL' else '/transcribe'
+    transcription = timed(results, 'transcribe', lambda: checked(session.post(
+        f'{base_url}{upload}', files={'audio': ('recording.mp3', audio_path.read_bytes(), 'audio/mpeg')}, timeout=600
+    )).json())
+    if transcription is None:
+        return False
+
+    if app_name == 'TOEFL':
+        url = f'{base_url}/api/task/2/evaluate'
+        body = {'reading_text': QUESTION, 'has_audio': True}
+    else:
+        url = f'{base_url}/evaluate'
+        body = {'task_type': 'speaking', 'part': 2, 'question': QUESTION}
+    body.update({
+        'api_key': 'sk-bench',
+        'transcript': transcription['transcript'],
+        'word_count': transcription['word_count'],
+        'speaking_time': 60,
+        'transcript_id': transcription.get('transcript_id')
+    })
+
+    if plain:
+        feedback = timed(results, 'evaluate', lambda: checked(session.post(url, json=body, timeout=300)).json()['feedback'])
+    else:
+        stream_timing = {}
+        start = time.perf_counter()
+        feedback = timed(results, 'evaluate', lambda: read_evaluation_stream(
+            session.post(f'{url}/stream', json=body, stream=True, timeout=300), stream_timing, start))
+        if 'first' in stream_timing:
+            results['latency'].setdefault('evaluate: first section', []).append(stream_timing['first'])
+    return feedback is not None
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def benchmark(app_name, args, base_url_openai, files):
+    overrides = {
+        'openai_base_url': base_url_openai,
+        'transcript_cache_max_entries': None if args.warm_caches else 0,
+        'evaluation_cache_max_entries': None if args.warm_caches else 0,
+        # Every session uses the same API key: the rate limiter would measure itself
+        'rate_limit_per_minute': 0,
+        'rate_limit_concurrency': 0,
+        'rate_limit_global_per_minute': 0,
+        'rate_limit_global_concurrency': 0
+    }
+    if args.profile:
+        overrides['default_whisper_profile'] = args.profile
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+
+    print(f"\n{app_name}: loading the app and Whisper...")
+    module = load_app(app_name, overrides)
+    server, base_url = serve(module)
+    try:
+        ready = wait_until_ready(base_url, args.ready_timeout)
+        print(f"{app_name}: Whisper '{ready.get('model')}' ready, {args.sessions} session(s), concurrency {args.concurrency}")
+
+        results = {'latency': {}, 'errors': {}}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(
+                lambda index: run_session(app_name, base_url, files[index % len(files)], args.plain, results),
+                range(args.sessions)
+            ))
+        elapsed = time.perf_counter() - start
+        metrics = requests.get(f'{base_url}/metrics', timeout=10).json()
+    finally:
+        server.shutdown()
+
+    requests_done = sum(len(values) for step, values in results['latency'].items() if not step.startswith('evaluate:'))
+    return {
+        'elapsed': elapsed,
+        'sessions': args.sessions,
+        'completed': sum(outcomes),
+        'sessions_per_second': sum(outcomes) / elapsed,
+        'requests_per_second': requests_done / elapsed,
+        'steps': {
+            step: {
+                'count': len(values),
+                'errors': len(results['errors'].get(step, [])),
+                'mean': statistics.mean(values) if values else None,
+                'p50': percentile(values, 0.50) if values else None,
+                'p95': percentile(values, 0.95) if values else None,
+                'p99': percentile(values, 0.99) if values else None
+            }
+            for step, values in ((step, results['latency'].get(step, []))
+                                 for step in dict.fromkeys(list(results['latency']) + list(results['errors'])))
+        },
+        'first_errors': {step: messages[0] for step, messages in results['errors'].items()},
+        'metrics': {key: metrics.get(key) for key in ('ffmpeg', 'openai_clients', 'transcript_cache', 'evaluation_cache')}
+    }
+
+def print_report(app_name, report):
+    print(f"\n{app_name}: {report['completed']}/{report['sessions']} session(s) in {report['elapsed']:.1f} s, "
+          f"{report['sessions_per_second']:.2f} sessions/s, {report['requests_per_second']:.2f} requests/s")
+    print(f"  {'step':<26} {'count':>6} {'mean (s)':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'errors':>7}")
+    for step, stats in report['steps'].items():
+        timings = ' '.join(f"{'-' if stats[key] is None else format(stats[key], '.3f'):>{width}}"
+                           for key, width in (('mean', 9), ('p50', 8), ('p95', 8), ('p99', 8)))
+        print(f"  {step:<26} {stats['count']:>6} {timings} {stats['errors']:>7}")
+    for step, message in report['first_errors'].items():
+        print(f"  first {step} error: {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=APPS + ('both',), default='both', help='App(s) to benchmark (default: both)')
+    parser.add_argument('--sessions', type=int, default=20, help='Sessions per app (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Sessions running at the same time (default: 4)')
+    parser.add_argument('--audio', default=AUDIO_GLOB, help=f'Recordings to upload, relative to the repository root (default: {AUDIO_GLOB})')
+    parser.add_argument('--plain', action='store_true', help='Use the plain JSON evaluate endpoints instead of /stream')
+    parser.add_argument('--profile', default=None, help="Whisper profile to transcribe with, e.g. 'fast' (default: the configured one)")
+    parser.add_argument('--warm-caches', action='store_true', help='Keep the transcript and evaluation caches enabled')
+    parser.add_argument('--latency', type=float, default=0.4, help='Mock OpenAI: seconds to the first token (default: 0.4)')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help='Mock OpenAI: generation speed (default: 80)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Mock OpenAI: share of failed requests (default: 0)')
+    parser.add_argument('--failure-status', type=int, default=500, help='Mock OpenAI: status of failed requests (default: 500)')
+    parser.add_argument('--tts-latency', type=float, default=0.15, help='gTTS stand-in: seconds per 100-character part (default: 0.15)')
+    parser.add_argument('--ready-timeout', type=float, default=600, help='Seconds to wait for Whisper to load (default: 600)')
+    parser.add_argument('--json', metavar='FILE', help='Also write the raw results to FILE')
+    args = parser.parse_args()
+
+    files = sorted(ROOT.glob(args.audio))
+    if not files:
+        raise SystemExit(f"No audio files found ({args.audio})")
+
+    StandInTTS.latency = args.tts_latency
+    mock = MockOpenAIServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            failure_rate=args.failure_rate, failure_status=args.failure_status, seed=0).start()
+    print(f"Mock OpenAI API on {mock.base_url} ({args.latency:.2f} s to first token, "
+          f"{args.tokens_per_second:.0f} tokens/s, {args.failure_rate:.0%} failures)")
+
+    reports = {}
+    for app_name in (APPS if args.app == 'both' else (args.app,)):
+        reports[app_name] = benchmark(app_name, args, mock.base_url, files)
+        print_report(app_name, reports[app_name])
+    mock.shutdown()
+    print(f"\nMock OpenAI API: {mock.stats['requests']} request(s), {mock.stats['failures']} injected failure(s)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
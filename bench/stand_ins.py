@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-ins for the network services the apps call, for offline benchmarks.
+
+MockOpenAIServer speaks the OpenAI chat-completions protocol (plain and
+`stream: true`) and answers with a canned HTML evaluation in the format the
+prompts ask for (or its JSON counterpart when the request has a `json_schema`
+response_format), with a configurable time to first token, token rate and
+failure injection. Point an app at it with `"openai_base_url":
+"http://127.0.0.1:<port>/v1"` in data/config.json; any API key is accepted.
+
+StandInTTS is a drop-in for gtts.gTTS (same constructor, stream(),
+write_to_fp() and save()) that returns silent MP3 frames after a configurable
+delay per text part, like the requests gTTS makes to Google Translate.
+
+Usage (mock OpenAI server only):
+    python bench/stand_ins.py [--port 8765] [--latency 0.4] [--tokens-per-second 80] [--failure-rate 0.05]
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEEDBACK = """<h4>Overall Score</h4>
+<p>Score: 3/5 (68/100). The response answers the question directly and stays on topic, but the reasons are developed unevenly and the vocabulary is mostly basic.</p>
+<h4>Strengths</h4>
+<ul><li>Clear opening statement that takes a position.</li><li>Two relevant reasons with a personal example.</li><li>Steady pace with few long pauses.</li></ul>
+<h4>Areas for Improvement</h4>
+<ul><li>The second reason is stated but not explained.</li><li>Several sentences repeat "very important" and "a lot of".</li></ul>
+<h4>Content &amp; Development</h4>
+<p>The question is answered, but the example would be stronger with a concrete outcome. Consider adding a brief contrast with the opposite view.</p>
+<h4>Language &amp; Vocabulary</h4>
+<ul><li>Instead of "important", suggest: pivotal, instrumental, paramount, consequential</li><li>Instead of "a lot of", suggest: a wealth of, numerous, a substantial number of</li><li>You said: 'it is very good for students' &rarr; Better: 'it is remarkably beneficial for students'</li></ul>
+<h4>Grammar &amp; Fluency</h4>
+<p>Mostly accurate, with one subject-verb agreement error ("the library have"). Try a conditional sentence next time: "If I had more time, I would...".</p>
+<h4>Recommendations</h4>
+<ul><li>Spend the preparation time choosing one detailed example.</li><li>Use a transition before each reason.</li><li>End with a one-sentence summary.</li></ul>
+"""
+
+# The same evaluation as structured output (the apps' EVALUATION_SCHEMA)
+EVALUATION = {
+    'score': 3,
+    'percentage': 68,
+    'score_explanation': 'The response answers the question directly and stays on topic, but the reasons are developed unevenly and the vocabulary is mostly basic.',
+    'criteria': [
+        {'name': 'Delivery', 'score': 3, 'comment': 'Steady pace with few long pauses.'},
+        {'name': 'Language Use', 'score': 3, 'comment': 'Mostly accurate, with basic and repeated vocabulary.'},
+        {'name': 'Topic Development', 'score': 3, 'comment': 'The second reason is stated but not explained.'}
+    ],
+    'sections': [
+        {'title': 'Strengths', 'paragraphs': [], 'items': [
+            'Clear opening statement that takes a position.', 'Two relevant reasons with a personal example.', 'Steady pace with few long pauses.'
+        ]},
+        {'title': 'Areas for Improvement', 'paragraphs': [], 'items': [
+            'The second reason is stated but not explained.', 'Several sentences repeat "very important" and "a lot of".'
+        ]},
+        {'title': 'Content & Development', 'paragraphs': [
+            'The question is answered, but the example would be stronger with a concrete outcome. Consider adding a brief contrast with the opposite view.'
+        ], 'items': []},
+        {'title': 'Language & Vocabulary', 'paragraphs': [], 'items': [
+            "You said: 'it is very good for students' -> Better: 'it is remarkably beneficial for students'"
+        ]},
+        {'title': 'Grammar & Fluency', 'paragraphs': [
+            'Mostly accurate, with one subject-verb agreement error ("the library have"). Try a conditional sentence next time: "If I had more time, I would...".'
+        ], 'items': []},
+        {'title': 'Recommendations', 'paragraphs': [], 'items': [
+            'Spend the preparation time choosing one detailed example.', 'Use a transition before each reason.', 'End with a one-sentence summary.'
+        ]}
+    ],
+    'vocabulary': [
+        {'instead_of': 'important', 'suggestions': ['pivotal', 'instrumental', 'paramount', 'consequential']},
+        {'instead_of': 'a lot of', 'suggestions': ['a wealth of', 'numerous', 'a substantial number of']}
+    ]
+}
+
+# About four characters per token, as for English text
+TOKEN_PATTERN = re.compile(r'\s*\S{1,4}|\s+')
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, 26 ms)
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x64' + bytes(413)
+TTS_PART_CHARS = 100
+TTS_FRAMES_PER_PART = 100
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown endpoint {self.path}', 'type': 'invalid_request_error'}})
+            return
+
+        server.count('requests')
+        if server.random.random() < server.failure_rate:
+            server.count('failures')
+            self._send_json(server.failure_status, {'error': {
+                'message': 'Injected failure', 'type': 'server_error', 'code': server.failure_status
+            }})
+            return
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        model = request.get('model', 'gpt-4o-mini')
+        structured = (request.get('response_format') or {}).get('type') == 'json_schema'
+        content = json.dumps(EVALUATION) if structured else FEEDBACK
+        tokens = TOKEN_PATTERN.findall(content)
+        time.sleep(server.latency)
+
+        if not request.get('stream'):
+            time.sleep(len(tokens) / server.tokens_per_second)
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': 1000, 'completion_tokens': len(tokens), 'total_tokens': 1000 + len(tokens)}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(1 / server.tokens_per_second)
+            chunk = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]
+            }
+            self._send_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+        self._send_chunk(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Chat-completions server with `latency` seconds to the first token, then `tokens_per_second`"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.4, tokens_per_second=80.0,
+                 failure_rate=0.0, failure_status=500, seed=None):
+        super().__init__(address, MockOpenAIHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'failures': 0}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+    def handle_error(self, request, client_address):
+        # Clients closing kept-alive connections or leaving in the middle of a stream are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        threading.Thread(target=self.serve_forever, name='mock-openai', daemon=True).start()
+        return self
+
+class StandInTTS:
+    """Offline gtts.gTTS: `latency` seconds and a few seconds of silent MP3 per 100-character part"""
+
+    latency = 0.15
+
+    def __init__(self, text, lang='en', **kwargs):
+        self.text = text
+        self.lang = lang
+
+    def stream(self):
+        for _ in range(0, max(len(self.text), 1), TTS_PART_CHARS):
+            time.sleep(self.latency)
+            yield SILENT_MP3_FRAME * TTS_FRAMES_PER_PART
+
+    def write_to_fp(self, fp):
+        for chunk in self.stream():
+            fp.write(chunk)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            self.write_to_fp(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.4, help='Seconds before the first token (default: 0.4)')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help='Generation speed (default: 80)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with an error (default: 0)')
+    parser.add_argument('--failure-status', type=int, default=500, help='HTTP status of injected failures, e.g. 429 (default: 500)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the failure injection')
+    args = parser.parse_args()
+
+    server = MockOpenAIServer((args.host, args.port), args.latency, args.tokens_per_second,
+                              args.failure_rate, args.failure_status, args.seed)
+    print(f"Mock OpenAI API on {server.base_url} (set \"openai_base_url\" to this in data/config.json)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{server.stats['requests']} request(s), {server.stats['failures']} injected failure(s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark of the in-process transcription batcher.
+
+Sends concurrent transcribe_audio() calls (the path /transcribe takes in the
+'direct' and 'batched' modes) on the bundled TOEFL/data/task*/audio/*.mp3
+files, once per 'transcription_batch_size', and reports wall time, requests
+and audio seconds transcribed per second, p50/p95 latency and how much the
+transcripts differ from the first batch size (word error rate).
+
+Usage:
+    python bench/transcription_batching.py [--model base] [--requests 20] [--batch-sizes 1 8]
+                                           [--wait-ms 150] [--seconds N] [--greedy]
+
+Each batch size runs in its own process, so that no batcher or torch state
+is shared between runs.
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / 'TOEFL' / 'app.py'
+AUDIO_GLOB = 'TOEFL/data/task*/audio/*.mp3'
+
+def load_app(overrides):
+    """Import TOEFL/app.py (in a child process it does not start the model loader) with config.json overridden"""
+    spec = importlib.util.spec_from_file_location('toefl_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first, so that Flask finds the app's root path (templates/, static/) from its module
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    load_config = module.load_config
+    module.load_config = lambda: dict(load_config(), **overrides)
+    return module
+
+def run_batch_size(model_name, batch_size, wait_ms, files, requests, seconds, greedy):
+    """Transcribe `requests` recordings at once through transcribe_audio() with one batch size"""
+    app = load_app({'transcription_batch_size': batch_size, 'transcription_batch_wait_ms': wait_ms})
+    profile = {'model': model_name, 'beam_size': None, 'temperature_fallback': not greedy, 'quantization': None}
+    clips = [app.decode_audio_bytes(Path(path).read_bytes(), '.mp3') for path in files]
+    if seconds:
+        clips = [audio[:int(seconds * app.WHISPER_SAMPLE_RATE)] for audio in clips]
+    audios = [clips[i % len(clips)] for i in range(requests)]
+
+    app.transcribe_audio(clips[0][:app.WHISPER_SAMPLE_RATE * 5], profile)  # load the model, start the batcher
+
+    def transcribe(audio):
+        start = time.perf_counter()
+        result = app.transcribe_audio(audio, profile)
+        return time.perf_counter() - start, result['text'].strip()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as executor:
+        outcomes = list(executor.map(transcribe, audios))
+    wall_seconds = time.perf_counter() - start
+
+    batcher = app.get_transcription_batcher(profile)
+    return {
+        'wall_seconds': wall_seconds,
+        'audio_seconds': sum(len(audio) for audio in audios) / app.WHISPER_SAMPLE_RATE,
+        'latencies': [latency for latency, _ in outcomes],
+        'texts': [text for _, text in outcomes],
+        'batcher': dict(batcher.stats) if batcher is not None else None
+    }
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='base', help='Whisper checkpoint (default: base)')
+    parser.add_argument('--requests', type=int, default=20, help='Concurrent transcriptions (default: 20)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8],
+                        help="'transcription_batch_size' values to compare; 1 is the direct path (default: 1 8)")
+    parser.add_argument('--wait-ms', type=int, default=150, help="'transcription_batch_wait_ms' (default: 150)")
+    parser.add_argument('--seconds', type=float, default=None, help='Cut every recording to its first N seconds')
+    parser.add_argument('--greedy', action='store_true',
+                        help='No temperature fallback: a retry samples, so two runs can differ')
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N audio files')
+    parser.add_argument('--json', metavar='FILE', help='Also write the raw results to FILE')
+    args = parser.parse_args()
+
+    files = sorted(str(path) for path in ROOT.glob(AUDIO_GLOB))[:args.limit]
+    if not files:
+        raise SystemExit(f"No audio files found ({AUDIO_GLOB})")
+    print(f"Whisper '{args.model}', {args.requests} concurrent request(s) over {len(files)} file(s)\n")
+
+    # 'spawn' so each batch size starts from a fresh process
+    context = multiprocessing.get_context('spawn')
+    reports = {}
+    for batch_size in args.batch_sizes:
+        print(f"Running batch size {batch_size}...")
+        with context.Pool(1) as pool:
+            reports[batch_size] = pool.apply(
+                run_batch_size, (args.model, batch_size, args.wait_ms, files, args.requests, args.seconds, args.greedy)
+            )
+
+    baseline = reports[args.batch_sizes[0]]
+    print(f"\n{'batch':>5} {'wall (s)':>9} {'req/s':>7} {'x realtime':>11} {'p50 (s)':>8} {'p95 (s)':>8} "
+          f"{'speedup':>8} {'windows/batch':>14} {f'WER vs {args.batch_sizes[0]}':>10}")
+    for batch_size, report in reports.items():
+        stats = report['batcher']
+        windows_per_batch = f"{stats['windows'] / max(stats['batches'], 1):.1f}" if stats else '-'
+        wer = statistics.mean(
+            word_error_rate(reference, text) for reference, text in zip(baseline['texts'], report['texts'])
+        )
+        print(f"{batch_size:>5} {report['wall_seconds']:>9.1f} {args.requests / report['wall_seconds']:>7.2f} "
+              f"{report['audio_seconds'] / report['wall_seconds']:>11.1f} {percentile(report['latencies'], 0.5):>8.1f} "
+              f"{percentile(report['latencies'], 0.95):>8.1f} {baseline['wall_seconds'] / report['wall_seconds']:>7.2f}x "
+              f"{windows_per_batch:>14} {wer:>9.1%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
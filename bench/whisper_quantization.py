@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the Whisper CPU inference modes (fp32 vs dynamic int8).
+
+Transcribes the bundled TOEFL/data/task*/audio/*.mp3 files with each mode and
+reports load time, transcription latency, peak RSS and how much the int8
+transcripts differ from the fp32 ones (word error rate against fp32).
+
+Usage:
+    python bench/whisper_quantization.py [--model base] [--runs 2] [--limit N]
+
+Each mode runs in its own process so that the RSS figures are not mixed up.
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / 'TOEFL' / 'app.py'
+AUDIO_GLOB = 'TOEFL/data/task*/audio/*.mp3'
+MODES = (None, 'int8')
+
+def load_app():
+    """Import TOEFL/app.py (in a child process it does not start the model loader)"""
+    spec = importlib.util.spec_from_file_location('toefl_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first, so that Flask finds the app's root path (templates/, static/) from its module
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def current_rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(model_name, quantization, files, runs):
+    """Load one model in the given mode and transcribe every file `runs` times"""
+    app = load_app()
+    profile = {'model': model_name, 'beam_size': None, 'temperature_fallback': True, 'quantization': quantization}
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    model = app.whisper_models.get(model_name, quantization)
+    load_seconds = time.perf_counter() - start
+
+    results = {}
+    for path in files:
+        audio = app.decode_audio_bytes(Path(path).read_bytes(), '.mp3')
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = app.run_whisper(model, audio, profile)
+            latencies.append(time.perf_counter() - start)
+        results[path] = {
+            'duration': len(audio) / app.WHISPER_SAMPLE_RATE,
+            'latency': min(latencies),
+            'text': result['text'].strip()
+        }
+
+    return {
+        'load_seconds': load_seconds,
+        'model_mb': app.model_size_mb(model),
+        'rss_model_mb': current_rss_mb() - rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+        'files': results
+    }
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='base', help='Whisper checkpoint (default: base)')
+    parser.add_argument('--runs', type=int, default=2, help='Transcriptions per file; the fastest is kept (default: 2)')
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N audio files')
+    parser.add_argument('--json', metavar='FILE', help='Also write the raw results to FILE')
+    args = parser.parse_args()
+
+    files = sorted(str(path) for path in ROOT.glob(AUDIO_GLOB))[:args.limit]
+    if not files:
+        raise SystemExit(f"No audio files found ({AUDIO_GLOB})")
+    print(f"Whisper '{args.model}', {len(files)} file(s), {args.runs} run(s) per file\n")
+
+    # 'spawn' so each mode starts from a fresh process (fair RSS, no shared torch state)
+    context = multiprocessing.get_context('spawn')
+    reports = {}
+    for quantization in MODES:
+        label = quantization or 'fp32'
+        print(f"Running {label}...")
+        with context.Pool(1) as pool:
+            reports[label] = pool.apply(run_mode, (args.model, quantization, files, args.runs))
+
+    baseline = reports['fp32']
+    print(f"\n{'mode':<6} {'load (s)':>9} {'weights (MB)':>13} {'RSS +model (MB)':>16} {'peak RSS (MB)':>14} "
+          f"{'total (s)':>10} {'x realtime':>11} {'speedup':>8} {'WER vs fp32':>12}")
+    for label, report in reports.items():
+        total = sum(item['latency'] for item in report['files'].values())
+        audio_seconds = sum(item['duration'] for item in report['files'].values())
+        baseline_total = sum(item['latency'] for item in baseline['files'].values())
+        wer = statistics.mean(
+            word_error_rate(baseline['files'][path]['text'], item['text']) for path, item in report['files'].items()
+        )
+        print(f"{label:<6} {report['load_seconds']:>9.1f} {report['model_mb']:>13.0f} {report['rss_model_mb']:>16.0f} "
+              f"{report['peak_rss_mb']:>14.0f} {total:>10.1f} {audio_seconds / total:>11.1f} "
+              f"{baseline_total / total:>7.2f}x {wer:>11.1%}")
+
+    print("\nPer file (latency in seconds, WER of int8 against fp32):")
+    for path in files:
+        fp32, int8 = baseline['files'][path], reports['int8']['files'][path]
+        print(f"  {Path(path).relative_to(ROOT)}: {fp32['latency']:.1f} -> {int8['latency']:.1f}, "
+              f"WER {word_error_rate(fp32['text'], int8['text']):.1%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Micro-batched transcription against whisper.transcribe.
+
+Needs Whisper and its tiny.en weights (downloaded on first use); skipped
+when they are not available. Run with `python -m pytest tests` from the
+repository root.
+"""
+
+import importlib.util
+import multiprocessing
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+whisper = pytest.importorskip('whisper')
+
+ROOT = Path(__file__).resolve().parent.parent
+AUDIO_FILES = sorted(ROOT.glob('TOEFL/data/task*/audio/*.mp3'))
+MODEL = 'tiny.en'
+# Greedy decoding: with temperature fallback a retry samples, and two runs can differ
+PROFILE = {'model': MODEL, 'beam_size': None, 'temperature_fallback': False, 'quantization': None}
+SAMPLE_RATE = 16000
+MAX_WORD_ERROR_RATE = 0.1
+
+def load_app(name, overrides):
+    """Import <name>/app.py with config.json overridden in memory and no background work"""
+    spec = importlib.util.spec_from_file_location(f'{name.lower()}_test_app', ROOT / name / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+
+    process = multiprocessing.current_process()
+    process_name, process.name = process.name, 'test-import'
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        process.name = process_name
+
+    load_config = module.load_config
+    module.load_config = lambda: dict(load_config(), **overrides)
+    return module
+
+def words(text):
+    return [word.strip('.,!?;:"\'()-').lower() for word in text.split() if word.strip('.,!?;:"\'()-')]
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    reference, hypothesis = words(reference), words(hypothesis)
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(len(reference), 1)
+
+@pytest.fixture(scope='module', params=('TOEFL', 'IELTS'))
+def app(request):
+    if len(AUDIO_FILES) < 2:
+        pytest.skip('Needs at least two bundled recordings')
+    module = load_app(request.param, {'transcription_batch_size': 4, 'transcription_batch_wait_ms': 500})
+    try:
+        module.profile_model(PROFILE)
+    except Exception as e:
+        pytest.skip(f'Whisper model {MODEL} unavailable: {e}')
+    return module
+
+def clip(app, path, seconds):
+    return app.decode_audio_bytes(path.read_bytes(), '.mp3')[:int(seconds * SAMPLE_RATE)]
+
+def test_batched_windows_match_direct_transcription(app):
+    clips = [clip(app, path, 25) for path in AUDIO_FILES[:2]]
+    direct = [app.run_whisper(app.profile_model(PROFILE), audio, PROFILE) for audio in clips]
+
+    # Concurrent calls, so that both windows are decoded in one batch
+    batched = [None] * len(clips)
+
+    def transcribe(index):
+        batched[index] = app.transcribe_audio(clips[index], PROFILE)
+
+    threads = [threading.Thread(target=transcribe, args=(index,)) for index in range(len(clips))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    batcher = app.get_transcription_batcher(PROFILE)
+    assert batcher is not None and batcher.stats['windows'] >= len(clips)
+    for expected, result in zip(direct, batched):
+        assert word_error_rate(expected['text'], result['text']) <= MAX_WORD_ERROR_RATE
+        assert all('words' in segment for segment in result['segments'])
+
+def test_long_recordings_continue_from_one_batch_to_the_next(app):
+    clips = [clip(app, path, 45) for path in AUDIO_FILES[:2]]
+    if min(len(audio) for audio in clips) <= 30 * SAMPLE_RATE:
+        pytest.skip('Needs recordings longer than 30 seconds')
+    direct = [app.run_whisper(app.profile_model(PROFILE), audio, PROFILE) for audio in clips]
+
+    batcher = app.get_transcription_batcher(PROFILE)
+    windows = batcher.stats['windows']
+    batched = [None] * len(clips)
+
+    def transcribe(index):
+        batched[index] = app.transcribe_audio(clips[index], PROFILE)
+
+    threads = [threading.Thread(target=transcribe, args=(index,)) for index in range(len(clips))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert batcher.stats['windows'] - windows >= 2 * len(clips)
+    for expected, result in zip(direct, batched):
+        assert word_error_rate(expected['text'], result['text']) <= MAX_WORD_ERROR_RATE
+        assert [segment['id'] for segment in result['segments']] == list(range(len(result['segments'])))
+        assert result['segments'][-1]['seek'] > 0  # decoded from a later window